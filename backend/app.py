@@ -12,9 +12,15 @@ from components.submission import student_submission_bp
 from components.milestones import milestone_bp
 from components.student import student_bp
 from components.commit_history import commit_history_bp
-from components.llm import llm_bp
+from components.llm import llm_bp, generate_milestones_command, milestone_batch_queue
 from components.github_url import assignment_bp
 from components.admin_stats import admin_dashboard_bp
+from components.statistics import init_statistics, rebuild_statistics_command
+from components.embedding import embedding_service
+from components.ingestion import ingestion_queue
+from components.commit_scheduler import commit_scheduler, sync_commits_command
+from utils.helpers import create_missing_indexes
+from components.migrations import run_migrations
 
 def create_app():
     app = Flask(__name__)
@@ -34,6 +40,21 @@ def create_app():
     app.register_blueprint(llm_bp)
     app.register_blueprint(assignment_bp)
     app.register_blueprint(admin_dashboard_bp)
+    app.cli.add_command(rebuild_statistics_command)
+    app.cli.add_command(generate_milestones_command)
+    app.cli.add_command(sync_commits_command)
+    
+    with app.app_context():
+        run_migrations()
+        init_statistics()
+        db.create_all()
+        create_missing_indexes(db)
+    ingestion_queue.init_app(app)
+    milestone_batch_queue.init_app(app)
+    commit_scheduler.init_app(app)
+    
+    if app.config['EMBEDDING_WARMUP']:
+        embedding_service.warm_up_in_background()
     
     @login_manager.user_loader
     def load_user(user_id):
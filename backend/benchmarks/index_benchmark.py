@@ -0,0 +1,52 @@
+"""Memory, build time, query latency and recall of the FAISS index modes.
+
+Uses clustered random vectors shaped like sentence embeddings, recall@k is
+measured against the exact flat index:
+
+    python benchmarks/index_benchmark.py --sizes 10000,100000 --dimension 384
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from components.index_builder import INDEX_MODES, build_index, choose_mode, factory_string, index_bytes
+
+def corpus(count, dimension, seed=0):
+    generator = np.random.default_rng(seed)
+    centers = generator.normal(size=(max(1, count // 100), dimension))
+    vectors = centers[generator.integers(len(centers), size=count)] + 0.3 * generator.normal(size=(count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[10000, 50000])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'vectors':>8} {'mode':<7} {'factory':<18} {'MB':>8} {'build s':>8} {'query ms':>9} {'recall':>7}")
+    for count in args.sizes:
+        vectors = corpus(count, args.dimension)
+        queries = vectors[np.random.default_rng(1).integers(count, size=args.queries)] + 0.05
+        exact = None
+        for mode in INDEX_MODES:
+            start = time.perf_counter()
+            index = build_index(vectors, mode)
+            build_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            _, found = index.search(queries, args.k)
+            query_ms = (time.perf_counter() - start) * 1000 / args.queries
+            if exact is None: exact = found
+            recall = np.mean([len(set(row) & set(truth)) / args.k for row, truth in zip(found, exact)])
+            marker = "*" if choose_mode(count, "auto") == mode else " "
+            print(f"{count:>8} {mode + marker:<7} {factory_string(mode, count, args.dimension):<18} "
+                  f"{index_bytes(index) / 2**20:>8.1f} {build_seconds:>8.2f} {query_ms:>9.3f} {recall:>7.3f}")
+    print("* chosen automatically for that corpus size")
+
+if __name__ == "__main__":
+    main()
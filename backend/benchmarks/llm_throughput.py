@@ -0,0 +1,51 @@
+"""Question answering throughput with shared or per request LLM chains.
+
+Runs offline against the local stand in backend by default:
+
+    python benchmarks/llm_throughput.py --requests 200 --concurrency 8 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from components.chains import ChainFactory, LocalLLM, LLM_BACKENDS
+
+TEMPLATE = """Given the following user question answer the question. 
+    Context: {context}
+    Question: {question}
+    """
+
+def run(label, make_chain, vector_store, requests, concurrency):
+    def ask(number):
+        return make_chain(vector_store).run(f"Question {number}?")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(ask, range(requests)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {requests} requests in {elapsed:.2f}s, {requests / elapsed:.1f} requests/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", default="local")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per answer of the local backend")
+    args = parser.parse_args()
+
+    LLM_BACKENDS["local"] = lambda **kwargs: LocalLLM(latency=args.latency)
+    vector_store = FAISS.from_texts([f"Part {number} of the project. It has a deadline." for number in range(100)],
+                                    DeterministicFakeEmbedding(size=64))
+    shared = ChainFactory(backend=args.backend)
+    run("shared", lambda store: shared.chain(store, TEMPLATE), vector_store, args.requests, args.concurrency)
+    run("per request", lambda store: ChainFactory(backend=args.backend).chain(store, TEMPLATE),
+        vector_store, args.requests, args.concurrency)
+    print(shared.stats())
+
+if __name__ == "__main__":
+    main()
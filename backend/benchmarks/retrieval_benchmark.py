@@ -0,0 +1,84 @@
+"""Retrieval latency and recall for chunking and search settings.
+
+A question counts as recalled when its expected phrase appears in the
+retrieved chunks. Runs offline on the PDFs and questions listed in
+fixtures/retrieval_questions.json:
+
+    python benchmarks/retrieval_benchmark.py --chunk-sizes 500,1000,2000 --search-types similarity,mmr,hybrid --k 2,4
+
+--fake-embeddings skips the sentence transformer, which only leaves the
+keyword side of the recall meaningful but still measures latency.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from components.embedding import embedding_service
+from components.pdf_extraction import iter_pages, iter_chunks
+from components.retrieval import DEFAULT_RETRIEVAL_SETTINGS, make_retriever
+from components.vector_store import VectorIndexStore
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "retrieval_questions.json")
+
+def normalize(text):
+    return re.sub(r"\s+", " ", text).lower()
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def csv(cast):
+    return lambda value: [cast(item) for item in value.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--chunk-sizes", type=csv(int), default=[500, 1000, 2000])
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_RETRIEVAL_SETTINGS["chunk_overlap"])
+    parser.add_argument("--search-types", type=csv(str), default=["similarity", "mmr", "hybrid"])
+    parser.add_argument("--k", type=csv(int), default=[2, 4])
+    parser.add_argument("--fake-embeddings", action="store_true")
+    args = parser.parse_args()
+
+    embedding = DeterministicFakeEmbedding(size=384) if args.fake_embeddings else embedding_service
+    with open(args.fixtures) as file:
+        fixtures = json.load(file)
+    pages = {fixture["pdf"]: list(iter_pages(os.path.join(BACKEND, fixture["pdf"]))) for fixture in fixtures}
+
+    print(f"{'chunk':>6} {'search':<10} {'k':>3} {'recall':>7} {'mean ms':>8} {'p95 ms':>8} {'build s':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        store = VectorIndexStore(folder=folder)
+        for chunk_size in args.chunk_sizes:
+            overlap = min(args.chunk_overlap, chunk_size // 2)
+            start = time.perf_counter()
+            vector_stores = {
+                pdf: store.build(f"{position}-{chunk_size}", list(iter_chunks(iter(pdf_pages), chunk_size, overlap)), embedding)
+                for position, (pdf, pdf_pages) in enumerate(pages.items())
+            }
+            build_seconds = time.perf_counter() - start
+            for search_type in args.search_types:
+                for k in args.k:
+                    settings = dict(DEFAULT_RETRIEVAL_SETTINGS, search_type=search_type, k=k, fetch_k=max(20, k))
+                    latencies, recalled, total = [], 0, 0
+                    for fixture in fixtures:
+                        retriever = make_retriever(vector_stores[fixture["pdf"]], settings)
+                        for item in fixture["questions"]:
+                            began = time.perf_counter()
+                            documents = retriever.invoke(item["question"])
+                            latencies.append((time.perf_counter() - began) * 1000)
+                            context = normalize(" ".join(document.page_content for document in documents))
+                            recalled += normalize(item["expected"]) in context
+                            total += 1
+                    print(f"{chunk_size:>6} {search_type:<10} {k:>3} {recalled / total:>7.2f} "
+                          f"{sum(latencies) / total:>8.2f} {percentile(latencies, 0.95):>8.2f} {build_seconds:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from components.embedding import embedding_service
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 512))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 3600))  # Seconds an answer stays valid
+# Cosine similarity above which a different question reuses an answer, 0 turns the lookup off
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95))
+
+def normalize_question(question):
+    """Lower case, single spaced and without trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.! ").lower()
+
+class AnswerCache:
+    """LRU cache of LLM answers keyed by (document hash, normalized question).
+
+    With a similarity threshold, a question missing from the cache reuses the
+    answer of the most similar cached question on the same document if their
+    embeddings are close enough. Entries expire after ttl seconds.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, similarity=ANSWER_CACHE_SIMILARITY,
+                 embedding=embedding_service, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.embedding = embedding
+        self.clock = clock
+        self.entries = OrderedDict()  # (content_hash, question) -> (answer, stored_at, unit vector or None)
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def vector(self, question):
+        vector = np.asarray(self.embedding.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def expired(self, stored_at):
+        return self.clock() - stored_at > self.ttl
+
+    def get(self, content_hash, question):
+        key = (content_hash, normalize_question(question))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and self.expired(entry[1]):
+                del self.entries[key]
+                self.counters["expirations"] += 1
+                entry = None
+            if entry:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[0]
+            candidates = [(cached_key, entry) for cached_key, entry in self.entries.items()
+                          if cached_key[0] == content_hash and entry[2] is not None and not self.expired(entry[1])]
+        if self.similarity and candidates:
+            # Embed outside the lock, encoding is the slow part
+            vector = self.vector(key[1])
+            cached_key, entry = max(candidates, key=lambda candidate: float(candidate[1][2] @ vector))
+            if float(entry[2] @ vector) >= self.similarity:
+                with self.lock:
+                    if cached_key in self.entries: self.entries.move_to_end(cached_key)
+                    self.counters["similar_hits"] += 1
+                return entry[0]
+        with self.lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, content_hash, question, answer):
+        key = (content_hash, normalize_question(question))
+        vector = self.vector(key[1]) if self.similarity else None
+        with self.lock:
+            self.entries[key] = (answer, self.clock(), vector)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self.entries)
+        lookups = stats["hits"] + stats["similar_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["similar_hits"]) / lookups if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["ttl"] = self.ttl
+        stats["similarity"] = self.similarity
+        return stats
+
+answer_cache = AnswerCache()
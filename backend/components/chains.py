@@ -0,0 +1,136 @@
+import os
+import re
+import threading
+import time
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+from langchain.chains import RetrievalQA
+from langchain.prompts import PromptTemplate
+from langchain.memory import ConversationBufferMemory
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "huggingface")  # "local" answers offline, for development and benchmarks
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 16))  # Keep-alive connections to the inference endpoint
+LOCAL_LLM_LATENCY = float(os.getenv("LOCAL_LLM_LATENCY", 0))  # Seconds the local backend waits per answer
+
+def configure_http_pool(size=LLM_POOL_SIZE):
+    """Give the Hugging Face client one shared keep-alive pool of size connections."""
+    import huggingface_hub
+    if hasattr(huggingface_hub, "configure_http_backend"):
+        # requests based releases
+        import requests
+        from requests.adapters import HTTPAdapter
+        def backend_factory():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            return session
+        huggingface_hub.configure_http_backend(backend_factory=backend_factory)
+    else:
+        # httpx based releases
+        import httpx
+        from huggingface_hub.utils import _http
+        hooks = [_http.hf_request_event_hook] if hasattr(_http, "hf_request_event_hook") else []
+        huggingface_hub.set_client_factory(lambda: httpx.Client(
+            limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+            event_hooks={"request": hooks}, follow_redirects=True, timeout=None
+        ))
+
+def huggingface_llm(repo_id, api_key, **kwargs):
+    from langchain_huggingface import HuggingFaceEndpoint
+    llm = HuggingFaceEndpoint(repo_id=repo_id, api_key=api_key, **kwargs)
+    llm.client.headers = {"Authorization": f"Bearer {api_key}"}
+    return llm
+
+class LocalLLM(LLM):
+    """Offline stand in for the inference endpoint.
+
+    Answers with the first sentence of the retrieved context, or with the
+    requested number of milestones in the format the milestone prompt asks for.
+    """
+
+    latency: float = LOCAL_LLM_LATENCY
+
+    @property
+    def _llm_type(self):
+        return "local"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        if self.latency: time.sleep(self.latency)
+        count = re.search(r"Number of Milestones : (\d+)", prompt)
+        if count:
+            return "".join(
+                f"*** Title: Milestone {number}\n*** Description: Deliver part {number} of the project\nEND\n"
+                for number in range(1, int(count.group(1)) + 1)
+            )
+        context = re.search(r"Context: (.*?)(?:\n\s*Question:|$)", prompt, re.S)
+        sentence = context.group(1).strip().split(". ")[0] if context else ""
+        return f"Answer: {sentence}"
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        for token in re.findall(r"\S+\s*", self._call(prompt, stop)):
+            chunk = GenerationChunk(text=token)
+            if run_manager: run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+LLM_BACKENDS = {"huggingface": huggingface_llm, "local": lambda **kwargs: LocalLLM()}
+
+class ChainFactory:
+    """Builds question answering chains around shared LLM clients.
+
+    A client is created once per backend and settings and reused by every
+    request, while the retriever and memory of each chain are new since they
+    hold per request state.
+    """
+
+    def __init__(self, backend=LLM_BACKEND, **defaults):
+        self.backend = backend
+        self.defaults = defaults
+        self.clients = {}
+        self.prompts = {}
+        self.lock = threading.Lock()
+        self.counters = {"clients_created": 0, "chains_built": 0}
+        if backend == "huggingface": configure_http_pool()
+
+    def llm(self, **kwargs):
+        key = tuple(sorted(kwargs.items()))
+        client = self.clients.get(key)
+        if client is None:
+            with self.lock:
+                client = self.clients.get(key)
+                if client is None:
+                    client = LLM_BACKENDS[self.backend](**self.defaults, **kwargs)
+                    self.clients[key] = client
+                    self.counters["clients_created"] += 1
+        return client
+
+    def prompt(self, template):
+        if template not in self.prompts:
+            self.prompts[template] = PromptTemplate.from_template(template)
+        return self.prompts[template]
+
+    def chain(self, vectorstore, template, k=2, retriever=None, variables=None, **llm_kwargs):
+        """A chain over retriever, or over the k nearest chunks of vectorstore when none is given.
+
+        variables fills the fields of template other than context and question.
+        """
+        prompt = self.prompt(template)
+        if variables: prompt = prompt.partial(**variables)
+        memory = ConversationBufferMemory(memory_key='chat_history', return_messages=True)
+        chain = RetrievalQA.from_chain_type(
+            llm=self.llm(**llm_kwargs),
+            chain_type="stuff",
+            retriever=retriever or vectorstore.as_retriever(search_kwargs={"k": k}),
+            chain_type_kwargs={"prompt": prompt},
+            memory=memory,
+        )
+        with self.lock:
+            self.counters["chains_built"] += 1
+        return chain
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats["backend"] = self.backend
+        stats["clients"] = len(self.clients)
+        return stats
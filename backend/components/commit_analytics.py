@@ -0,0 +1,127 @@
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import func, case, and_, inspect
+from components.models import (
+    db, Commit, CommitDailyCount, CommitStatistics, Milestone, ProjectStudentAssignment, User
+)
+
+def streaks(days):
+    """(latest, longest) runs of consecutive days in a sorted list of days."""
+    latest = longest = 0
+    previous = None
+    for day in days:
+        latest = latest + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, latest)
+        previous = day
+    return latest, longest
+
+def current_streak(statistics, today):
+    # A streak is still going when the student committed today or yesterday
+    if not statistics or not statistics.last_active_date: return 0
+    return statistics.latest_streak if statistics.last_active_date >= today - timedelta(days=1) else 0
+
+# The rollups are refreshed inside the caller's transaction, so they commit
+# (or roll back) together with the commits they are computed from.
+
+def refresh_commit_analytics(project_id, student_ids=None):
+    """Recompute daily commit counts and streaks of a project's students (all of them when student_ids is None)."""
+    day = func.date(Commit.timestamp, type_=db.Date)
+    daily = db.session.query(Commit.student_id, day, func.count()).filter(Commit.project_id == project_id)
+    totals = db.session.query(Commit.student_id, func.count(), func.min(Commit.timestamp), func.max(Commit.timestamp)).filter(
+        Commit.project_id == project_id)
+    existing_days = CommitDailyCount.query.filter_by(project_id=project_id)
+    existing_statistics = CommitStatistics.query.filter_by(project_id=project_id)
+    if student_ids is not None:
+        daily = daily.filter(Commit.student_id.in_(student_ids))
+        totals = totals.filter(Commit.student_id.in_(student_ids))
+        existing_days = existing_days.filter(CommitDailyCount.student_id.in_(student_ids))
+        existing_statistics = existing_statistics.filter(CommitStatistics.student_id.in_(student_ids))
+
+    counts = defaultdict(dict)
+    for student_id, date, commits in daily.group_by(Commit.student_id, day):
+        counts[student_id][date] = commits
+    existing_days.delete(synchronize_session=False)
+    existing_statistics.delete(synchronize_session=False)
+
+    db.session.bulk_insert_mappings(CommitDailyCount, [
+        {"project_id": project_id, "student_id": student_id, "date": date, "commits": commits}
+        for student_id, days in counts.items() for date, commits in days.items()
+    ])
+    rows = []
+    for student_id, total, first_commit_at, last_commit_at in totals.group_by(Commit.student_id):
+        days = sorted(counts[student_id])
+        latest, longest = streaks(days)
+        rows.append({
+            "project_id": project_id, "student_id": student_id, "total_commits": total, "active_days": len(days),
+            "first_commit_at": first_commit_at, "last_commit_at": last_commit_at, "last_active_date": days[-1],
+            "latest_streak": latest, "longest_streak": longest,
+        })
+    db.session.bulk_insert_mappings(CommitStatistics, rows)
+
+def rebuild_commit_analytics():
+    """Reconstruct the commit rollups of every project from scratch."""
+    if not inspect(db.engine).has_table(Commit.__tablename__): return
+    CommitDailyCount.query.delete()
+    CommitStatistics.query.delete()
+    for (project_id,) in db.session.query(Commit.project_id).distinct():
+        refresh_commit_analytics(project_id)
+
+def milestone_commit_counts(project_id):
+    """{(milestone_id, student_id): (commits by the deadline, commits between start and deadline)} from the daily counts.
+
+    Summed from the rollup at read time, so edited deadlines count at once.
+    """
+    before = case((CommitDailyCount.date <= Milestone.end_date, CommitDailyCount.commits), else_=0)
+    during = case((and_(CommitDailyCount.date >= Milestone.start_date, CommitDailyCount.date <= Milestone.end_date),
+                   CommitDailyCount.commits), else_=0)
+    rows = db.session.query(
+        Milestone.milestone_id, CommitDailyCount.student_id, func.sum(before), func.sum(during)
+    ).join(
+        CommitDailyCount, CommitDailyCount.project_id == Milestone.project_id
+    ).filter(Milestone.project_id == project_id).group_by(Milestone.milestone_id, CommitDailyCount.student_id)
+    return {(milestone_id, student_id): (before, during) for milestone_id, student_id, before, during in rows}
+
+def project_commit_analytics(project_id, today, days):
+    """Commit activity of every student of a project in a fixed number of queries, whatever their number."""
+    students = db.session.query(ProjectStudentAssignment.student_id, User.username).join(
+        User, User.user_id == ProjectStudentAssignment.student_id
+    ).filter(ProjectStudentAssignment.project_id == project_id).distinct().all()
+    statistics = {row.student_id: row for row in CommitStatistics.query.filter_by(project_id=project_id)}
+    window_start = today - timedelta(days=days - 1)
+    daily = defaultdict(dict)
+    for row in CommitDailyCount.query.filter(CommitDailyCount.project_id == project_id, CommitDailyCount.date >= window_start):
+        daily[row.student_id][row.date.isoformat()] = row.commits
+    milestones = Milestone.query.filter_by(project_id=project_id).order_by(Milestone.end_date, Milestone.milestone_id).all()
+    milestone_counts = milestone_commit_counts(project_id)
+
+    def student_analytics(student_id, username):
+        row = statistics.get(student_id)
+        return {
+            "student_id": student_id,
+            "username": username,
+            "total_commits": row.total_commits if row else 0,
+            "active_days": row.active_days if row else 0,
+            "current_streak": current_streak(row, today),
+            "longest_streak": row.longest_streak if row else 0,
+            "first_commit_at": row.first_commit_at if row else None,
+            "last_commit_at": row.last_commit_at if row else None,
+            "daily_commits": daily.get(student_id, {}),
+            "milestones": [{
+                "milestone_id": milestone.milestone_id,
+                "commits_before_deadline": milestone_counts.get((milestone.milestone_id, student_id), (0, 0))[0],
+                "commits_during": milestone_counts.get((milestone.milestone_id, student_id), (0, 0))[1],
+            } for milestone in milestones],
+        }
+
+    return {
+        "project_id": project_id,
+        "window_start": window_start.isoformat(),
+        "window_end": today.isoformat(),
+        "milestones": [{
+            "milestone_id": milestone.milestone_id,
+            "title": milestone.title,
+            "start_date": milestone.start_date.isoformat(),
+            "end_date": milestone.end_date.isoformat(),
+        } for milestone in milestones],
+        "students": [student_analytics(student_id, username) for student_id, username in students],
+    }
@@ -1,66 +1,27 @@
-from flask import Blueprint, request, jsonify, abort
-from flask_security import auth_required, current_user
-from components.models import ProjectStudentAssignment, User, db
-import requests
-import os
+from flask import Blueprint, request, jsonify, abort, current_app
+from datetime import datetime
+from flask_security import auth_required, roles_accepted, current_user
+from collections import defaultdict
+from sqlalchemy import func
+from components.models import ProjectStudentAssignment, User, Project, Commit, CommitSyncState, CommitSyncRun, CommitStatistics, db
+from components.commit_sync import commit_sync, commit_summary
+from components.github_cache import repository_key
+from components.commit_scheduler import commit_scheduler, run_report, BulkCommitSync
+from components.commit_analytics import project_commit_analytics, current_streak
+from components.pagination import page_limit, keyset_page
 
 # Create Blueprint
 commit_history_bp = Blueprint('commit_history', __name__)
 
-# GitHub API base URL
-GITHUB_API_BASE_URL = 'https://api.github.com/repos'
-
-# Fetch the GitHub token from environment variables (ensure you set this in your environment)
-GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
-
-# Helper function to fetch commit history from GitHub
-def fetch_commit_history(github_url):
-    # if not GITHUB_TOKEN:
-    #     print("Error: GitHub token is not set in the environment variables.")
-    #     return None
-
-    # Extract username and repo name from GitHub URL
-    try:
-        parts = github_url.strip('/').split('/')
-        owner, repo = parts[-2], parts[-1]
-        print(f"Extracted Owner: {owner}, Repo: {repo}")
-    except IndexError as e:
-        print(f"Error parsing GitHub URL: {github_url} | Error: {e}")
-        return None
-
-    api_url = f'{GITHUB_API_BASE_URL}/{owner}/{repo}/commits'
-    print(f"GitHub API URL: {api_url}")
-
-    # Make the API request
-    response = requests.get(api_url)
-    print(f"GitHub API Response Status Code: {response.status_code}")
-
-    if response.status_code == 200:
-        try:
-            commits = response.json()
-            print(f"Fetched {len(commits)} commits from GitHub.")
-            return [
-                {
-                    "author_name": commit["commit"]["committer"]["name"],
-                    "timestamp": commit["commit"]["committer"]["date"],
-                    "commit_url": commit["html_url"],
-                }
-                for commit in commits
-            ]
-        except Exception as e:
-            print(f"Error processing commits data: {e}")
-            return None
-    else:
-        print(f"Error fetching commit history: {response.text}")
-        return None
+COMMIT_PAGE_SIZE = 100  # Commits returned by the commit history endpoint
+MAX_COMMIT_PAGE_SIZE = 500
+MAX_PROJECT_COMMITS = 100  # Newest commits per student in the project commit history
 
 # API to get commit history for the current student
 @commit_history_bp.route('/commit_history/<int:student_id>/<int:project_id>', methods=['GET'])
 @auth_required('token')  # Ensures the user is authenticated
 def get_commit_history(student_id, project_id):
     try:
-        print(f"Fetching project for Student ID: {student_id}")
-
         # Fetch project ID and GitHub URL for the given student_id
         project = ProjectStudentAssignment.query.filter_by(student_id=student_id, project_id=project_id).first()
         if not project: return jsonify({"error": "Project not found"}), 404
@@ -70,20 +31,26 @@ def get_commit_history(student_id, project_id):
             print(f"No GitHub URL found for Student ID: {student_id}")
             return jsonify({"error": "GitHub URL is missing for this student"}), 400
 
-        print(f"Fetching commit history for GitHub URL: {github_url}")
+        limit = page_limit(request.args.get('limit'), COMMIT_PAGE_SIZE, MAX_COMMIT_PAGE_SIZE)
+        if limit is None: return jsonify({"error": f"limit must be between 1 and {MAX_COMMIT_PAGE_SIZE}"}), 400
 
-        # Fetch commit history using a helper function
-        commit_history = fetch_commit_history(github_url)
-        if commit_history is None:
+        # Served from the commits table, GitHub is only asked for new commits when the last sync is old
+        if not commit_sync.ensure_synced(project_id, student_id, github_url):
             return jsonify({"error": "Failed to fetch commit history from GitHub"}), 500
 
-        print(f"Commit history fetched successfully for Student ID: {student_id}, Project ID: {project_id}")
+        query = Commit.query.filter_by(project_id=project_id, student_id=student_id)
+        try:
+            commits, next_before = keyset_page(query, Commit.timestamp, Commit.commit_id, limit, request.args.get('before'))
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
 
-        # Return the commit history
+        # Return the commit history, newest first
         return jsonify({
             "student_id": student_id,
             "project_id": project_id,
-            "commit_history": commit_history
+            "commit_history": [commit_summary(commit) for commit in commits],
+            "total_commits": query.count(),
+            "next_before": next_before
         }), 200
 
     except Exception as e:
@@ -91,6 +58,120 @@ def get_commit_history(student_id, project_id):
         return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
 
 
+def sync_project_repositories(project_id, assignments):
+    """Bring the repositories of a project's students up to date, returns {student_id: (sync status, error)}.
+
+    Stale histories are synced in the background, missing and expired ones
+    concurrently before answering, each repository once however many students
+    link it, without retries or rate limit waits.
+    """
+    states = {state.student_id: state for state in CommitSyncState.query.filter_by(project_id=project_id)}
+    statuses, blocking = {}, defaultdict(list)
+    for student_id, username, github_url in assignments:
+        if not github_url:
+            statuses[student_id] = ("no_repository", None)
+            continue
+        freshness = commit_sync.freshness(states.get(student_id), github_url)
+        if freshness == "stale":
+            commit_sync.sync_in_background(github_url)
+            statuses[student_id] = ("refreshing", None)
+        elif freshness == "fresh":
+            statuses[student_id] = ("fresh", None)
+        else:
+            blocking[repository_key(github_url)].append((student_id, github_url))
+            statuses[student_id] = ("synced", None)
+    if blocking:
+        bulk = BulkCommitSync(sync=commit_sync, retries=0, max_wait=0, reserve=0)
+        report = bulk.run(current_app._get_current_object(), [students[0][1] for students in blocking.values()])
+        for failure in report["failures"]:
+            for student_id, github_url in blocking[repository_key(failure["github_url"])]:
+                statuses[student_id] = (failure["status"], failure["error"])
+    return statuses
+
+def recent_commits(project_id, limit):
+    """{student_id: [commit, ...]} with the limit newest commits of every student of a project, in one query."""
+    rank = func.row_number().over(
+        partition_by=Commit.student_id, order_by=(Commit.timestamp.desc(), Commit.commit_id.desc())
+    ).label('rank')
+    ranked = db.session.query(Commit.commit_id, rank).filter(Commit.project_id == project_id).subquery()
+    commits = defaultdict(list)
+    for commit in Commit.query.join(ranked, ranked.c.commit_id == Commit.commit_id).filter(
+        ranked.c.rank <= limit).order_by(Commit.student_id, ranked.c.rank):
+        commits[commit.student_id].append(commit_summary(commit))
+    return commits
+
+@commit_history_bp.route('/commit_history/project/<int:project_id>', methods=['GET'])
+@auth_required('token')
+@roles_accepted('Admin', 'Instructor')
+def get_project_commit_history(project_id):
+    """Commit summaries of every student of a project, and their ?commits= newest commits, in one round trip."""
+    if not db.session.get(Project, project_id): return jsonify({"error": "Project not found"}), 404
+    limit = request.args.get('commits', '0')
+    if not limit.isdigit() or int(limit) > MAX_PROJECT_COMMITS:
+        return jsonify({"error": f"commits must be between 0 and {MAX_PROJECT_COMMITS}"}), 400
+    limit = int(limit)
+
+    assignments = db.session.query(
+        ProjectStudentAssignment.student_id, User.username, ProjectStudentAssignment.github_url
+    ).join(User, User.user_id == ProjectStudentAssignment.student_id).filter(
+        ProjectStudentAssignment.project_id == project_id
+    ).order_by(ProjectStudentAssignment.student_id).all()
+    statuses = sync_project_repositories(project_id, assignments)
+
+    statistics = {row.student_id: row for row in CommitStatistics.query.filter_by(project_id=project_id)}
+    commits = recent_commits(project_id, limit) if limit else {}
+    today = datetime.utcnow().date()
+    students = []
+    for student_id, username, github_url in assignments:
+        row = statistics.get(student_id)
+        status, error = statuses[student_id]
+        student = {
+            "student_id": student_id,
+            "username": username,
+            "github_url": github_url,
+            "sync": status,
+            "total_commits": row.total_commits if row else 0,
+            "active_days": row.active_days if row else 0,
+            "current_streak": current_streak(row, today),
+            "longest_streak": row.longest_streak if row else 0,
+            "last_commit_at": row.last_commit_at if row else None,
+        }
+        if error: student["error"] = error
+        if limit: student["commits"] = commits.get(student_id, [])
+        students.append(student)
+    return jsonify({"project_id": project_id, "students": students}), 200
+
+@commit_history_bp.route('/commit_history/project/<int:project_id>/analytics', methods=['GET'])
+@auth_required('token')
+@roles_accepted('Admin', 'Instructor')
+def get_project_commit_analytics(project_id):
+    """Commit activity of every student of a project, daily counts over the last ?days= days."""
+    if not db.session.get(Project, project_id): return jsonify({"error": "Project not found"}), 404
+    days = str(request.args.get('days', current_app.config['COMMIT_ANALYTICS_WINDOW_DAYS']))
+    max_days = current_app.config['DASHBOARD_MAX_WINDOW_DAYS']
+    if not days.isdigit() or not 1 <= int(days) <= max_days:
+        return jsonify({"error": f"days must be between 1 and {max_days}"}), 400
+    # Read from the rollups refreshed by every sync, GitHub is not asked
+    return jsonify(project_commit_analytics(project_id, datetime.utcnow().date(), int(days))), 200
+
+@commit_history_bp.route('/commit_history/sync', methods=['POST'])
+@auth_required('token')
+@roles_accepted('Admin', 'Instructor')
+def start_commit_sync():
+    # Syncs every student repository in the background, the scheduler does the same every COMMIT_SYNC_INTERVAL
+    run_id = commit_scheduler.start()
+    if run_id is None: return jsonify({"error": "A commit sync is running already"}), 409
+    return jsonify({"message": "Commit sync started", "run_id": run_id}), 202
+
+@commit_history_bp.route('/commit_history/sync/report', methods=['GET'])
+@auth_required('token')
+@roles_accepted('Admin', 'Instructor')
+def get_commit_sync_report():
+    run = CommitSyncRun.query.filter(CommitSyncRun.status != 'running').order_by(CommitSyncRun.run_id.desc()).first()
+    if not run: return jsonify({"error": "No commit sync has finished yet"}), 404
+    return jsonify(run_report(run)), 200
+
+
 @commit_history_bp.route('/commit_history/<int:student_id>/<int:project_id>', methods=['POST'])
 @auth_required('token')
 def uploadURL(student_id, project_id):
@@ -0,0 +1,194 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import insert, select, exists, literal, and_, or_, DateTime
+from flask.cli import with_appcontext
+from components.models import db, ProjectStudentAssignment, CommitSyncRun
+from components.commit_sync import commit_sync
+from components.github_cache import GitHubError, repository_key
+
+COMMIT_SYNC_INTERVAL = int(os.getenv("COMMIT_SYNC_INTERVAL", 3600))  # Seconds between syncs of every repository, 0 turns them off
+COMMIT_SYNC_WORKERS = int(os.getenv("COMMIT_SYNC_WORKERS", 4))  # Repositories synced at once
+COMMIT_SYNC_RETRIES = 3
+COMMIT_SYNC_BACKOFF = 2.0  # Seconds, doubled on every retry and jittered
+MAX_RATE_LIMIT_WAIT = 60  # Longer rate limit waits defer the rest of a run to the next one
+SYNC_RATE_RESERVE = int(os.getenv("SYNC_RATE_RESERVE", 10))  # Requests a run leaves to page views
+RUN_LEASE = 3600  # Seconds after which a run still marked running is taken to be interrupted
+
+def student_repositories():
+    """The GitHub URL of every repository linked by a student, one per repository however many link it."""
+    urls = db.session.query(ProjectStudentAssignment.github_url).filter(
+        ProjectStudentAssignment.github_url.isnot(None), ProjectStudentAssignment.github_url != '').distinct()
+    repositories = {}
+    for github_url, in urls:
+        repositories.setdefault(repository_key(github_url), github_url)
+    return list(repositories.values())
+
+def retryable(error):
+    # Network errors, server errors and rate limits pass, a missing repository does not
+    return error.status is None or error.status >= 500 or error.retry_after is not None
+
+def sync_report(results):
+    counts = Counter(result["status"] for result in results)
+    return {
+        "repositories": len(results),
+        "synced": counts["synced"],
+        "failed": counts["failed"],
+        "deferred": counts["deferred"],
+        "new_commits": sum(result.get("new_commits", 0) for result in results),
+        "failures": [result for result in results if result["status"] != "synced"],
+    }
+
+class BulkCommitSync:
+    """Syncs many student repositories on a bounded pool of threads.
+
+    Failed syncs are retried with exponential backoff and full jitter. Before
+    each sync the rate limit left by GitHub is checked: short waits are slept
+    through, and once a wait is longer than max_wait, or fewer than reserve
+    requests are left, the remaining repositories are deferred to the next run.
+    """
+
+    def __init__(self, sync=commit_sync, workers=COMMIT_SYNC_WORKERS, retries=COMMIT_SYNC_RETRIES,
+                 backoff=COMMIT_SYNC_BACKOFF, max_wait=MAX_RATE_LIMIT_WAIT, reserve=SYNC_RATE_RESERVE,
+                 sleep=time.sleep, rng=None):
+        self.sync = sync
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.reserve = reserve
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+    def run(self, app, repositories):
+        """Sync the repository of every GitHub URL, returns the report of the run."""
+        stop = threading.Event()
+
+        def sync_one(github_url):
+            result = {"repository": repository_key(github_url), "github_url": github_url}
+            error = None
+            for attempt in range(self.retries + 1):
+                wait = self.sync.rate_limit_wait(self.reserve)
+                if stop.is_set() or wait > self.max_wait:
+                    stop.set()
+                    return {**result, "status": "deferred", "error": "GitHub rate limit exhausted"}
+                if wait: self.sleep(wait + self.rng.uniform(0, self.backoff))
+                try:
+                    with app.app_context():
+                        return {**result, "status": "synced", "new_commits": self.sync.sync(github_url)}
+                except GitHubError as e:
+                    error = e
+                    if e.retry_after is not None and e.retry_after > self.max_wait:
+                        stop.set()
+                        return {**result, "status": "deferred", "error": str(e)}
+                    if not retryable(e) or attempt == self.retries: break
+                    if e.retry_after is not None: self.sleep(e.retry_after + self.rng.uniform(0, self.backoff))
+                    else: self.sleep(self.rng.uniform(0, self.backoff * 2 ** attempt))
+                except Exception as e:
+                    error = e
+                    break
+            return {**result, "status": "failed", "error": str(error)}
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="commit-sync-run") as executor:
+            return sync_report(list(executor.map(sync_one, repositories)))
+
+def run_report(run):
+    return {
+        "run_id": run.run_id,
+        "status": run.status,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        **json.loads(run.report or "{}"),
+    }
+
+class CommitSyncScheduler:
+    """Syncs every student repository every interval seconds from a background thread.
+
+    Runs are rows of commit_sync_runs, so with several web workers only the
+    first to find the last run old enough starts a new one, and the report of
+    the last run is visible to all of them.
+    """
+
+    def __init__(self, interval=COMMIT_SYNC_INTERVAL, bulk=None):
+        self.interval = interval
+        self.bulk = bulk or BulkCommitSync()
+        self.app = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        if self.interval > 0 and self.thread is None:
+            self.thread = threading.Thread(target=self.loop, name="commit-sync-scheduler", daemon=True)
+            self.thread.start()
+
+    def loop(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Commit sync failed: {e}")
+
+    def claim(self, force=False):
+        """Start a run, None when one is running or, unless forced, the last one is recent.
+
+        The check and the insert are one INSERT ... SELECT, which SQLite runs
+        under its write lock, so of several workers claiming at the same time
+        exactly one gets the run.
+        """
+        now = datetime.utcnow()
+        busy = and_(CommitSyncRun.status == 'running', CommitSyncRun.started_at > now - timedelta(seconds=RUN_LEASE))
+        if not force: busy = or_(busy, CommitSyncRun.finished_at > now - timedelta(seconds=self.interval / 2))
+        claimed = db.session.execute(insert(CommitSyncRun).from_select(
+            ['status', 'started_at'], select(literal('running'), literal(now, DateTime)).where(~exists().where(busy))))
+        run_id = claimed.lastrowid if claimed.rowcount == 1 else None
+        db.session.commit()
+        return db.session.get(CommitSyncRun, run_id) if run_id else None
+
+    def execute(self, run_id, repositories=None):
+        with self.app.app_context():
+            if repositories is None: repositories = student_repositories()
+        try:
+            report, status = self.bulk.run(self.app, repositories), 'completed'
+        except Exception as e:
+            report, status = {"error": str(e)}, 'failed'
+        with self.app.app_context():
+            run = db.session.get(CommitSyncRun, run_id)
+            run.status, run.finished_at, run.report = status, datetime.utcnow(), json.dumps(report)
+            db.session.commit()
+            return run_report(run)
+
+    def run_once(self, force=False, repositories=None):
+        """Sync now and return the report, None when a run is not due."""
+        with self.app.app_context():
+            run = self.claim(force)
+            if run is None: return None
+            run_id = run.run_id
+        return self.execute(run_id, repositories)
+
+    def start(self):
+        """Start a run in the background, its run_id or None when one is running already."""
+        run = self.claim(force=True)
+        if run is None: return None
+        threading.Thread(target=self.execute, args=(run.run_id,), name="commit-sync-run", daemon=True).start()
+        return run.run_id
+
+commit_scheduler = CommitSyncScheduler()
+
+@click.command('sync-commits')
+@with_appcontext
+def sync_commits_command():
+    """Sync the commits of every student repository now and print the report."""
+    report = commit_scheduler.run_once(force=True)
+    if report is None: raise click.ClickException("A commit sync is running already")
+    if report['status'] == 'failed': raise click.ClickException(f"Commit sync failed: {report['error']}")
+    click.echo(f"Synced {report['synced']} of {report['repositories']} repositories, "
+               f"{report['new_commits']} new commits, {report['failed']} failed, {report['deferred']} deferred")
+    for failure in report['failures']:
+        click.echo(f"{failure['github_url']}: {failure['status']}, {failure['error']}")
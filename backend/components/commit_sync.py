@@ -0,0 +1,177 @@
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, literal
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+from components.models import db, Commit, CommitSyncState, ProjectStudentAssignment
+from components.commit_analytics import refresh_commit_analytics
+from components.github_cache import (
+    CommitHistoryCache, GitHubError, parse_repository, parse_timestamp, repository_key, commit_cache,
+    GITHUB_API_URL, COMMIT_CACHE_TTL, COMMIT_CACHE_STALE
+)
+
+SHA_BATCH = 500  # Shas per IN query when checking for stored commits
+
+def commit_summary(commit):
+    return {
+        "sha": commit.sha,
+        "author_name": commit.author_name,
+        "timestamp": commit.timestamp.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "commit_url": commit.commit_url,
+    }
+
+def linked_assignments(repository):
+    """(project_id, student_id) of every assignment whose GitHub URL points at owner/repo."""
+    candidates = db.session.query(
+        ProjectStudentAssignment.project_id, ProjectStudentAssignment.student_id, ProjectStudentAssignment.github_url
+    ).filter(ProjectStudentAssignment.github_url.ilike(f"%{repository}%"))
+    return sorted({(project_id, student_id) for project_id, student_id, github_url in candidates
+                   if repository_key(github_url) == repository.lower()})
+
+class CommitSync:
+    """Copies students' GitHub commit histories into the commits table.
+
+    Repositories are fetched through the CommitHistoryCache, once however many
+    students link them, and their new commits are fanned out to the rows of
+    every linked student. A student who links a repository that is stored for
+    someone else already gets a copy of those rows, without asking GitHub for
+    the whole history again.
+
+    Histories fetched less than ttl seconds ago are served as they are. For
+    stale seconds after that they are still served, while one background sync
+    per repository brings them up to date.
+    """
+
+    def __init__(self, api_url=GITHUB_API_URL, session=None, ttl=COMMIT_CACHE_TTL, stale=COMMIT_CACHE_STALE,
+                 workers=2, clock=datetime.utcnow, cache=None):
+        self.cache = cache or CommitHistoryCache(api_url=api_url, session=session, ttl=ttl, stale=stale, clock=clock)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="commit-sync")
+        self.syncing = set()
+        self.syncing_locks = {}
+        self.lock = threading.Lock()
+
+    def rate_limit_wait(self, reserve=0):
+        return self.cache.rate_limit_wait(reserve)
+
+    def repository_lock(self, key):
+        with self.lock:
+            return self.syncing_locks.setdefault(key, threading.Lock())
+
+    def sync(self, github_url):
+        """Fetch the repository of github_url and store its new commits for every linked student, returns their number."""
+        repository = parse_repository(github_url or "")
+        if repository is None: raise GitHubError(f"Not a GitHub repository URL: {github_url}")
+        key = repository.lower()
+        # Scheduled and on-demand syncs of a repository take turns, the later one asks only for what is new since
+        with self.repository_lock(key):
+            linked = linked_assignments(repository)
+            states = {(state.project_id, state.student_id): state for state in CommitSyncState.query.filter_by(repository=key)}
+            mirrors = [assignment for assignment in linked if assignment in states]
+            try:
+                # Without a stored copy to extend, the whole history is fetched again
+                new = self.cache.fetch(repository, full=not mirrors)
+                changed = defaultdict(list)
+                for project_id, student_id in linked:
+                    state = states.get((project_id, student_id)) or db.session.get(CommitSyncState, (project_id, student_id))
+                    relinked = False
+                    if state is None or state.repository != key:
+                        if state is not None:
+                            # The student moved to another repository, its history replaces the old one
+                            Commit.query.filter_by(project_id=project_id, student_id=student_id).delete()
+                        if mirrors: self.copy(mirrors[0], (project_id, student_id))
+                        state = state or CommitSyncState(project_id=project_id, student_id=student_id)
+                        state.repository = key
+                        relinked = True
+                    state.synced_at = self.cache.clock()
+                    db.session.add(state)
+                    if self.store(project_id, student_id, new) or relinked: changed[project_id].append(student_id)
+                db.session.flush()
+                for project_id, student_ids in changed.items():
+                    refresh_commit_analytics(project_id, student_ids)
+                db.session.commit()
+            except IntegrityError:
+                # Another sync of the repository linked the same students first, its rows stand
+                db.session.rollback()
+                return 0
+            except (ValueError, KeyError, TypeError) as e:
+                db.session.rollback()
+                raise GitHubError(f"Unexpected commits from GitHub: {e}") from e
+            except GitHubError:
+                db.session.rollback()
+                raise
+            return len(new)
+
+    def copy(self, source, target):
+        # One INSERT ... SELECT duplicates the stored history of another student of the repository,
+        # rows a concurrent sync stored already are skipped
+        columns = [Commit.sha, Commit.author_name, Commit.timestamp, Commit.commit_url]
+        db.session.execute(insert(Commit).from_select(
+            ['project_id', 'student_id', 'sha', 'author_name', 'timestamp', 'commit_url'],
+            select(literal(target[0]), literal(target[1]), *columns).where(
+                Commit.project_id == source[0], Commit.student_id == source[1])).on_conflict_do_nothing())
+
+    def store(self, project_id, student_id, items):
+        # Commits dated exactly at the since time, or seen again after a force push, are already stored
+        shas = list({item["sha"]: item for item in items})
+        stored = set()
+        for start in range(0, len(shas), SHA_BATCH):
+            stored.update(sha for sha, in db.session.query(Commit.sha).filter(
+                Commit.project_id == project_id, Commit.student_id == student_id, Commit.sha.in_(shas[start:start + SHA_BATCH])))
+        rows, seen = [], set(stored)
+        for item in items:
+            if item["sha"] in seen: continue
+            seen.add(item["sha"])
+            rows.append({
+                "project_id": project_id,
+                "student_id": student_id,
+                "sha": item["sha"],
+                "author_name": item["commit"]["committer"]["name"],
+                "timestamp": parse_timestamp(item["commit"]["committer"]["date"]),
+                "commit_url": item["html_url"],
+            })
+        if not rows: return 0
+        # A concurrent sync of the repository may store the same commits between the check and the insert
+        return db.session.execute(insert(Commit.__table__).on_conflict_do_nothing(), rows).rowcount
+
+    def freshness(self, state, github_url):
+        """fresh, stale (served while synced in the background), expired or missing (synced before serving)."""
+        repository = parse_repository(github_url or "")
+        if state is None or repository is None or state.repository != repository.lower(): return "missing"
+        return self.cache.freshness(repository)
+
+    def ensure_synced(self, project_id, student_id, github_url):
+        """Whether the stored commits of the student's repository can be served, syncing them first when too old."""
+        freshness = self.freshness(db.session.get(CommitSyncState, (project_id, student_id)), github_url)
+        if freshness == "fresh": return True
+        if freshness == "stale":
+            self.sync_in_background(github_url)
+            return True
+        try:
+            self.sync(github_url)
+            return True
+        except GitHubError as e:
+            print(f"Error syncing commits of {github_url}: {e}")
+            # An expired history is still served when GitHub fails
+            return freshness == "expired"
+
+    def sync_in_background(self, github_url):
+        key = repository_key(github_url)
+        with self.lock:
+            if key in self.syncing: return None
+            self.syncing.add(key)
+        app = current_app._get_current_object()
+        def run():
+            try:
+                with app.app_context():
+                    self.sync(github_url)
+            except GitHubError as e:
+                print(f"Error syncing commits of {github_url}: {e}")
+            finally:
+                with self.lock:
+                    self.syncing.discard(key)
+        return self.executor.submit(run)
+
+commit_sync = CommitSync(cache=commit_cache)
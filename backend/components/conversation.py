@@ -0,0 +1,66 @@
+import os
+from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.sqlite import insert
+from components.models import db, ChatHistory, ConversationSummary
+
+CONVERSATION_TURNS = int(os.getenv("CONVERSATION_TURNS", 4))  # Fewest recent turns quoted word for word
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", 1500))
+TURN_MAX_CHARS = int(os.getenv("TURN_MAX_CHARS", 1000))  # Longer questions and answers are cut in the prompt
+
+def clip(text, limit):
+    return text if len(text) <= limit else text[:limit].rstrip() + "..."
+
+def format_turns(turns):
+    return "\n".join(f"Instructor: {clip(turn.question, TURN_MAX_CHARS)}\nAssistant: {clip(turn.answer, TURN_MAX_CHARS)}"
+                     for turn in turns)
+
+def format_history(summary, turns):
+    parts = []
+    if summary: parts.append(f"Summary of the earlier conversation: {summary}")
+    if turns: parts.append(format_turns(turns))
+    return "\n".join(parts)
+
+def unsummarized_turns(project_id, instructor_id, row, limit):
+    """The latest limit turns after the ones in the summary row, oldest first."""
+    query = ChatHistory.query.filter_by(project_id=project_id, instructor_id=instructor_id)
+    if row:
+        query = query.filter(tuple_(ChatHistory.message_timestamp, ChatHistory.chat_id)
+                             > tuple_(row.summarized_timestamp, row.summarized_chat_id))
+    return query.order_by(ChatHistory.message_timestamp.desc(), ChatHistory.chat_id.desc()).limit(limit).all()[::-1]
+
+def conversation_history(project_id, instructor_id, summarize, turns=CONVERSATION_TURNS):
+    """Prompt text with the conversation so far, bounded whatever its length.
+
+    Between turns and 2 * turns - 1 of the latest turns are quoted, the ones
+    before them are folded into a summary kept in the database. Once the
+    quoted window fills up, its oldest half is passed to summarize(summary,
+    turns) together with the current summary, so the LLM summarizes once every
+    turns questions and only ever reads a bounded amount of text. History older
+    than the window when the first summary is made is left out.
+    """
+    if turns < 1: return ""
+    row = db.session.get(ConversationSummary, (project_id, instructor_id))
+    recent = unsummarized_turns(project_id, instructor_id, row, 2 * turns)
+    if len(recent) == 2 * turns:
+        folded, recent = recent[:turns], recent[turns:]
+        try:
+            summary = clip(summarize(row.summary if row else "", folded).strip(), SUMMARY_MAX_CHARS)
+        except Exception as e:
+            # Quote the whole window this time, the summary is retried with the next question
+            print(f"Conversation summary failed: {e}")
+            return format_history(row.summary if row else "", folded + recent)
+        save_summary(project_id, instructor_id, summary, folded[-1])
+        return format_history(summary, recent)
+    return format_history(row.summary if row else "", recent)
+
+def save_summary(project_id, instructor_id, summary, last_turn):
+    # Upserted, a concurrent question may have saved a summary meanwhile, the one reaching furthest stands
+    values = {"summary": summary, "summarized_timestamp": last_turn.message_timestamp,
+              "summarized_chat_id": last_turn.chat_id, "updated_at": datetime.utcnow()}
+    table = ConversationSummary.__table__
+    db.session.execute(insert(table).values(project_id=project_id, instructor_id=instructor_id, **values).on_conflict_do_update(
+        index_elements=[table.c.project_id, table.c.instructor_id], set_=values,
+        where=tuple_(table.c.summarized_timestamp, table.c.summarized_chat_id)
+        < tuple_(last_turn.message_timestamp, last_turn.chat_id)))
+    db.session.commit()
@@ -0,0 +1,56 @@
+import os
+import uuid
+from components.models import db, ProjectDocument, IngestionJob
+from components.vector_store import index_store, document_hash
+from components.embedding import embedding_service
+from components.ingestion import ingestion_queue
+from components.retrieval import project_settings, index_key
+
+UPLOAD_FOLDER = "./uploads"  # Folder to store uploaded PDFs
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)  # Create folder if it doesn't exist
+
+def register_document(project_id, file, filename):
+    """Store an uploaded PDF for a project and queue its ingestion unless it is already indexed.
+
+    Files are stored by content hash, so the same PDF uploaded to several
+    projects is saved, parsed and embedded only once.
+    """
+    temporary_path = os.path.join(UPLOAD_FOLDER, f".{uuid.uuid4().hex}.tmp")
+    file.save(temporary_path)
+    content_hash = document_hash(temporary_path)
+    file_path = os.path.join(UPLOAD_FOLDER, f"{content_hash}.pdf")
+    os.replace(temporary_path, file_path)
+
+    document = ProjectDocument(project_id=project_id, filename=filename, file_path=file_path, content_hash=content_hash)
+    # Reuse what an earlier upload of the same content already extracted
+    previous = ProjectDocument.query.filter(ProjectDocument.content_hash == content_hash, ProjectDocument.text.isnot(None)).first()
+    if previous:
+        document.text, document.chunk_count, document.chunk_metadata = previous.text, previous.chunk_count, previous.chunk_metadata
+    db.session.add(document)
+    db.session.commit()
+
+    return document, queue_missing_index(document)
+
+def queue_missing_index(document, settings=None):
+    """Queue ingestion when the document has no index for its project's chunking yet."""
+    if index_store.has_index(document_index_key(document, settings)): return None
+    return ingestion_queue.enqueue(document.file_path, document.content_hash)
+
+def document_index_key(document, settings=None):
+    """Key of the index built with the chunking settings of the document's project."""
+    settings = settings or project_settings(document.project_id)
+    return index_key(document.content_hash, settings["chunk_size"], settings["chunk_overlap"])
+
+def latest_document(project_id):
+    """The most recently uploaded document of a project."""
+    return ProjectDocument.query.filter_by(project_id=project_id).order_by(ProjectDocument.document_id.desc()).first()
+
+def document_vector_store(document, settings=None):
+    """The saved index of a project document, or the ingestion job still building it."""
+    vector_store = index_store.load(document_index_key(document, settings), embedding_service)
+    if vector_store is not None: return vector_store, None
+    # Never build the index inside a request, queue it if nothing is building it
+    job = IngestionJob.query.filter_by(content_hash=document.content_hash).order_by(IngestionJob.job_id.desc()).first()
+    if not job or job.status == 'completed':
+        job = ingestion_queue.enqueue(document.file_path, document.content_hash)
+    return None, job
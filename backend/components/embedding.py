@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L12-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+
+def load_sentence_transformer(model_name):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, trust_remote_code=True)
+
+class EmbeddingService(Embeddings):
+    """Sentence transformer shared by the whole process.
+
+    The model is loaded once, on warm up or lazily on first use behind a lock,
+    and text is encoded in batches of batch_size.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH_SIZE, loader=load_sentence_transformer):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.loader = loader
+        self.model = None
+        self.load_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.counters = {
+            "model_loads": 0,
+            "model_load_seconds": 0.0,
+            "batches": 0,
+            "texts_encoded": 0,
+            "queries": 0,
+            "encode_seconds": 0.0,
+        }
+
+    def get_model(self):
+        if self.model is None:
+            with self.load_lock:
+                if self.model is None:
+                    start = time.perf_counter()
+                    model = self.loader(self.model_name)
+                    self.record(model_loads=1, model_load_seconds=time.perf_counter() - start)
+                    self.model = model
+        return self.model
+
+    def warm_up(self):
+        """Load the model and run one encode so the first request does not pay for it."""
+        self.embed_query("warm up")
+
+    def warm_up_in_background(self):
+        def run():
+            try:
+                self.warm_up()
+            except Exception as e:
+                print(f"Embedding model warm up failed: {e}")
+        thread = threading.Thread(target=run, name="embedding-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def record(self, **amounts):
+        with self.stats_lock:
+            for name, amount in amounts.items():
+                self.counters[name] += amount
+
+    def embed_documents(self, texts):
+        model = self.get_model()
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = list(texts[start:start + self.batch_size])
+            began = time.perf_counter()
+            encoded = model.encode(batch, batch_size=self.batch_size, convert_to_numpy=True)
+            self.record(batches=1, texts_encoded=len(batch), encode_seconds=time.perf_counter() - began)
+            vectors.extend(encoded.tolist())
+        return vectors
+
+    def embed_query(self, text):
+        self.record(queries=1)
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        """Counters plus derived latency and throughput figures."""
+        with self.stats_lock:
+            stats = dict(self.counters)
+        stats["model_name"] = self.model_name
+        stats["batch_size"] = self.batch_size
+        stats["model_loaded"] = self.model is not None
+        stats["average_batch_seconds"] = stats["encode_seconds"] / stats["batches"] if stats["batches"] else 0.0
+        stats["texts_per_second"] = stats["texts_encoded"] / stats["encode_seconds"] if stats["encode_seconds"] else 0.0
+        return stats
+
+embedding_service = EmbeddingService()
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from datetime import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy.dialects.sqlite import insert
+from components.models import db, RepositoryCache
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")  # Optional, raises the rate limit from 60 to 5000 requests an hour
+GITHUB_POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", 8))  # Keep-alive connections to the API
+GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", 10))
+COMMIT_CACHE_TTL = int(os.getenv("COMMIT_CACHE_TTL", 300))  # Seconds commits are served without asking GitHub
+COMMIT_CACHE_STALE = int(os.getenv("COMMIT_CACHE_STALE", 86400))  # Seconds after that they are served while synced in the background
+COMMITS_PER_PAGE = 100  # Largest page the commits API returns
+MAX_SYNC_PAGES = int(os.getenv("MAX_SYNC_PAGES", 100))  # Pages read by the first sync, older commits are left out
+
+class GitHubError(Exception):
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after  # Seconds until GitHub accepts requests again, for rate limits
+
+def github_session(token=GITHUB_TOKEN, size=GITHUB_POOL_SIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/vnd.github+json", "X-GitHub-Api-Version": "2022-11-28"})
+    if token: session.headers["Authorization"] = f"Bearer {token}"
+    return session
+
+def parse_repository(github_url):
+    """owner/repo of a GitHub URL, None when it has no owner and repository."""
+    parts = github_url.strip().strip('/').removesuffix('.git').split('/')
+    if len(parts) < 2 or not parts[-2] or not parts[-1]: return None
+    return f"{parts[-2]}/{parts[-1]}"
+
+def repository_key(github_url):
+    """owner/repo of a GitHub URL in lower case, what repositories are keyed by, the URL itself when it has none."""
+    return (parse_repository(github_url or "") or github_url or "").lower()
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+class CommitHistoryCache:
+    """What GitHub last said about each repository, kept in repository_cache.
+
+    A row per owner/repo holds the ETag of the last first page and the newest
+    commit seen, so however many students link a repository it is fetched
+    once: the first fetch walks every page through the Link headers, later
+    ones ask only for commits since the newest one and stop at its sha, with
+    If-None-Match, so an unchanged repository costs one 304, which does not
+    count against the rate limit.
+
+    Rows fetched less than ttl seconds ago are fresh, for stale seconds after
+    that they may be served while refreshed in the background.
+    """
+
+    def __init__(self, api_url=GITHUB_API_URL, session=None, ttl=COMMIT_CACHE_TTL, stale=COMMIT_CACHE_STALE,
+                 clock=datetime.utcnow):
+        self.api_url = api_url
+        self.session = session or github_session()
+        self.ttl = ttl
+        self.stale = stale
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.rate_remaining = None  # From the rate limit headers of the last response
+        self.rate_reset = 0.0
+
+    def rate_limit_wait(self, reserve=0):
+        """Seconds until the rate limit resets when at most reserve requests are left, 0 otherwise."""
+        with self.lock:
+            if self.rate_remaining is None or self.rate_remaining > reserve: return 0
+            return max(0.0, self.rate_reset - time.time())
+
+    def request(self, url, params=None, headers=None):
+        wait = self.rate_limit_wait()
+        if wait: raise GitHubError("GitHub rate limit exhausted", 429, wait)
+        try:
+            response = self.session.get(url, params=params, headers=headers, timeout=GITHUB_TIMEOUT)
+        except requests.RequestException as e:
+            raise GitHubError(f"GitHub request failed: {e}") from e
+        remaining, reset = response.headers.get("X-RateLimit-Remaining"), response.headers.get("X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            with self.lock:
+                self.rate_remaining, self.rate_reset = int(remaining), float(reset)
+        if response.status_code in (403, 429) and (response.headers.get("Retry-After") or remaining == "0"):
+            retry_after = response.headers.get("Retry-After")
+            retry_after = float(retry_after) if retry_after else max(0.0, float(reset or 0) - time.time())
+            raise GitHubError("GitHub rate limit exceeded", response.status_code, retry_after)
+        if response.status_code not in (200, 304):
+            raise GitHubError(f"GitHub answered {response.status_code}: {response.text[:200]}", response.status_code)
+        return response
+
+    def freshness(self, repository):
+        """fresh, stale, expired or missing, from the time of the last fetch of owner/repo."""
+        row = db.session.get(RepositoryCache, repository.lower())
+        if row is None: return "missing"
+        age = (self.clock() - row.fetched_at).total_seconds()
+        if age < self.ttl: return "fresh"
+        if age < self.ttl + self.stale: return "stale"
+        return "expired"
+
+    def fetch(self, repository, full=False):
+        """Commits of owner/repo pushed since the last fetch, newest first, every one when full.
+
+        The row is updated in the session, the caller commits it together with
+        what it stores from the commits.
+        """
+        row = db.session.get(RepositoryCache, repository.lower())
+        stored = row is not None
+        if row is None or full:
+            row = row or RepositoryCache(repository=repository.lower())
+            row.etag = row.last_sha = row.last_commit_at = None
+
+        params = {"per_page": COMMITS_PER_PAGE}
+        if row.last_commit_at: params["since"] = row.last_commit_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+        headers = {"If-None-Match": row.etag} if row.etag else {}
+        response = self.request(f"{self.api_url}/repos/{repository}/commits", params, headers)
+        etag = response.headers.get("ETag")
+
+        new = []
+        pages = 0
+        try:
+            while response.status_code == 200:
+                reached = False
+                for item in response.json():
+                    if item["sha"] == row.last_sha:
+                        reached = True
+                        break
+                    new.append(item)
+                pages += 1
+                next_url = response.links.get("next", {}).get("url")
+                if reached or not next_url or pages >= MAX_SYNC_PAGES: break
+                response = self.request(next_url)
+            if new:
+                newest = max(new, key=lambda item: item["commit"]["committer"]["date"])
+                newest_at = parse_timestamp(newest["commit"]["committer"]["date"])
+                if row.last_commit_at is None or newest_at >= row.last_commit_at:
+                    # The ETag is of a request with the old since, the next one asks for a new since
+                    if newest_at != row.last_commit_at: etag = None
+                    row.last_sha, row.last_commit_at = newest["sha"], newest_at
+        except (ValueError, KeyError, TypeError) as e:
+            raise GitHubError(f"Unexpected commits from GitHub: {e}") from e
+        row.etag = etag
+        row.fetched_at = self.clock()
+        if not stored:
+            # Upserted, a concurrent first fetch of the repository may have inserted its row meanwhile
+            values = {"etag": row.etag, "last_sha": row.last_sha, "last_commit_at": row.last_commit_at, "fetched_at": row.fetched_at}
+            db.session.execute(insert(RepositoryCache).values(repository=row.repository, **values).on_conflict_do_update(
+                index_elements=[RepositoryCache.repository], set_=values))
+        return new
+
+commit_cache = CommitHistoryCache()
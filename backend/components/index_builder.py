@@ -0,0 +1,83 @@
+import math
+import os
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+INDEX_MODE = os.getenv("INDEX_MODE", "auto")  # auto, flat, hnsw, ivfsq8 or ivfpq
+FLAT_MAX_VECTORS = int(os.getenv("FLAT_MAX_VECTORS", 20000))  # Exact search below this many chunks
+HNSW_MAX_VECTORS = int(os.getenv("HNSW_MAX_VECTORS", 500000))  # HNSW below this many chunks, IVF-PQ above
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 16))  # Inverted lists visited per query
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 64))  # Candidates kept while walking the graph
+INDEX_MODES = ("flat", "hnsw", "ivfsq8", "ivfpq")
+MIN_POINTS_PER_CENTROID = 39  # Fewer training points than this per centroid gives poor clusters
+TRAINING_SAMPLE = 50000  # Quantizers are trained on a random sample of at most this many vectors
+EMBEDDING_BATCH = int(os.getenv("EMBEDDING_BATCH", 256))  # Chunks embedded at once while building an index
+
+def choose_mode(count, mode=INDEX_MODE):
+    if mode != "auto": return mode
+    if count < FLAT_MAX_VECTORS: return "flat"
+    if count < HNSW_MAX_VECTORS: return "hnsw"
+    return "ivfpq"
+
+def factory_string(mode, count, dimension):
+    """faiss.index_factory description of an index for count vectors."""
+    if mode == "flat": return "Flat"
+    if mode == "hnsw": return "HNSW32_SQfp16"  # Graph search over float16 vectors
+    nlist = max(1, min(int(4 * math.sqrt(count)), count // MIN_POINTS_PER_CENTROID))
+    if mode == "ivfsq8": return f"IVF{nlist},SQ8"  # One int8 per dimension
+    if mode == "ivfpq":
+        # About one byte code per 8 dimensions, with fewer bits when there is little to train on
+        subquantizers = max(divisor for divisor in range(1, dimension // 8 + 1) if dimension % divisor == 0)
+        bits = max(1, min(8, int(math.log2(max(count // MIN_POINTS_PER_CENTROID, 2)))))
+        return f"IVF{nlist},PQ{subquantizers}x{bits}"
+    raise ValueError(f"Unknown index mode {mode}, expected one of {', '.join(INDEX_MODES)}")
+
+def tune(index):
+    """Set search time parameters, which are not stored with an index."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(IVF_NPROBE, ivf.nlist)
+        # Maximal marginal relevance search reconstructs vectors by id
+        if ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.set_direct_map_type(faiss.DirectMap.Array)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+def build_index(vectors, mode=INDEX_MODE):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    index = faiss.index_factory(dimension, factory_string(choose_mode(count, mode), count, dimension))
+    if not index.is_trained:
+        sample = vectors
+        if count > TRAINING_SAMPLE:
+            sample = vectors[np.random.default_rng(0).choice(count, TRAINING_SAMPLE, replace=False)]
+        index.train(sample)
+    tune(index)
+    index.add(vectors)
+    return index
+
+def build_vector_store(documents, embedding, mode=INDEX_MODE, batch_size=EMBEDDING_BATCH):
+    """A FAISS vector store over documents with an index chosen by their number.
+
+    documents may be any iterable, it is read and embedded batch_size chunks
+    at a time, and the vectors are kept as float32 arrays.
+    """
+    stored, vectors, batch = [], [], []
+    for document in documents:
+        batch.append(document)
+        if len(batch) < batch_size: continue
+        vectors.append(np.asarray(embedding.embed_documents([document.page_content for document in batch]), dtype=np.float32))
+        stored.extend(batch)
+        batch = []
+    if batch:
+        vectors.append(np.asarray(embedding.embed_documents([document.page_content for document in batch]), dtype=np.float32))
+        stored.extend(batch)
+    index = build_index(np.concatenate(vectors) if vectors else [], mode)
+    docstore = InMemoryDocstore({str(position): document for position, document in enumerate(stored)})
+    return FAISS(embedding, index, docstore, {position: str(position) for position in range(len(stored))})
+
+def index_bytes(index):
+    return faiss.serialize_index(index).nbytes
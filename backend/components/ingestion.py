@@ -0,0 +1,132 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from components.models import db, IngestionJob, ProjectDocument, RetrievalSettings
+from components.vector_store import index_store
+from components.embedding import embedding_service
+from components.pdf_extraction import page_count, iter_pages, iter_chunks
+from components.retrieval import DEFAULT_RETRIEVAL_SETTINGS, index_key
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", 2))
+PROGRESS_EVERY_PAGES = 10  # Commit progress every N extracted pages
+
+def load_pdf(file_path):
+    return ''.join(page + '\n' for page in iter_pages(file_path))
+
+def chunking(document_text):
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100, add_start_index=True)
+    documents = text_splitter.create_documents([document_text])
+    return documents
+
+def job_status(job):
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "pages_total": job.pages_total,
+        "pages_done": job.pages_done,
+        "chunks": job.chunks,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }
+
+class IngestionQueue:
+    """Extracts, chunks, embeds and indexes uploaded PDFs on a local worker pool.
+
+    Jobs are rows of ingestion_jobs, so progress is visible to every web worker
+    and jobs left unfinished by a restart are picked up again by init_app.
+    """
+
+    def __init__(self, workers=INGESTION_WORKERS, store=index_store, embedding=embedding_service):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingestion")
+        self.store = store
+        self.embedding = embedding
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        with app.app_context():
+            # Jobs interrupted mid run are started over
+            IngestionJob.query.filter_by(status='running').update({IngestionJob.status: 'queued'})
+            db.session.commit()
+            for (job_id,) in db.session.query(IngestionJob.job_id).filter_by(status='queued'):
+                self.executor.submit(self.run, job_id)
+
+    def enqueue(self, file_path, content_hash):
+        """Queue a document for ingestion, reusing a pending job for the same content."""
+        job = IngestionJob.query.filter(
+            IngestionJob.content_hash == content_hash, IngestionJob.status.in_(['queued', 'running'])
+        ).first()
+        if job: return job
+        job = IngestionJob(file_path=file_path, content_hash=content_hash)
+        db.session.add(job)
+        db.session.commit()
+        self.executor.submit(self.run, job.job_id)
+        return job
+
+    def run(self, job_id):
+        with self.app.app_context():
+            # Claim the job, another worker may have taken it already
+            claimed = IngestionJob.query.filter_by(job_id=job_id, status='queued').update({IngestionJob.status: 'running'})
+            db.session.commit()
+            if not claimed: return
+            job = db.session.get(IngestionJob, job_id)
+            try:
+                self.ingest(job)
+                job.status = 'completed'
+            except Exception as e:
+                db.session.rollback()
+                job = db.session.get(IngestionJob, job_id)
+                job.status = 'failed'
+                job.error = str(e)
+            db.session.commit()
+
+    def ingest(self, job):
+        job.pages_total = page_count(job.file_path)
+        db.session.commit()
+        text, chunk_metadata = io.StringIO(), []
+
+        def extracted_pages():
+            # Pages are chunked as they are extracted, progress is committed along the way
+            for number, page in enumerate(iter_pages(job.file_path), start=1):
+                text.write(page + '\n')
+                if number % PROGRESS_EVERY_PAGES == 0 or number == job.pages_total:
+                    job.pages_done = number
+                    db.session.commit()
+                yield page
+
+        def recorded(documents):
+            # Chunks go on to the index builder batch by batch, only their offsets are kept here
+            for document in documents:
+                chunk_metadata.append({"start_index": document.metadata["start_index"], "length": len(document.page_content)})
+                yield document
+
+        documents = recorded(iter_chunks(extracted_pages()))
+        if not self.store.has_index(job.content_hash):
+            self.store.build(job.content_hash, documents, self.embedding)
+        else:
+            deque(documents, maxlen=0)
+        # Projects sharing this document may chunk it differently, their chunks come from the pages extracted again
+        for chunk_size, chunk_overlap in self.chunk_settings(job.content_hash):
+            key = index_key(job.content_hash, chunk_size, chunk_overlap)
+            if not self.store.has_index(key):
+                self.store.build(key, iter_chunks(iter_pages(job.file_path), chunk_size, chunk_overlap), self.embedding)
+        job.chunks = len(chunk_metadata)
+        # Every project document with this content shares the extracted text and chunks
+        ProjectDocument.query.filter_by(content_hash=job.content_hash).update({
+            ProjectDocument.text: text.getvalue(),
+            ProjectDocument.chunk_count: len(chunk_metadata),
+            ProjectDocument.chunk_metadata: chunk_metadata
+        })
+
+    def chunk_settings(self, content_hash):
+        default = (DEFAULT_RETRIEVAL_SETTINGS["chunk_size"], DEFAULT_RETRIEVAL_SETTINGS["chunk_overlap"])
+        return {
+            tuple(settings) for settings in db.session.query(RetrievalSettings.chunk_size, RetrievalSettings.chunk_overlap).join(
+                ProjectDocument, ProjectDocument.project_id == RetrievalSettings.project_id
+            ).filter(ProjectDocument.content_hash == content_hash).distinct()
+        } - {default}
+
+ingestion_queue = IngestionQueue()
@@ -1,16 +1,27 @@
-from flask import request, jsonify, Blueprint,redirect
+from flask import request, jsonify, Blueprint,redirect, Response, stream_with_context
+from flask_security import auth_required, roles_required, roles_accepted
 from dotenv import load_dotenv
 import os
+import json
+import hashlib
+import time
+import click
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask.cli import with_appcontext
 from datetime import datetime
-from components.models import Milestone, db, Project, ChatHistory, ProjectInstructorAssignment
-from langchain_huggingface import HuggingFaceEndpoint
-from PyPDF2 import PdfReader
-from langchain.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationBufferMemory
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from components.models import Milestone, db, Project, ChatHistory, ProjectInstructorAssignment, IngestionJob, RetrievalSettings, MilestoneBatchJob
+from components.statistics import record_daily_activity
+from components.embedding import embedding_service
+from components.answer_cache import answer_cache
+from components.chains import ChainFactory
+from components.llm_executor import llm_executor, LLMUnavailable, LLMBusy
+from components.milestone_parser import MilestoneParser, parse_milestones
+from components.retrieval import DEFAULT_RETRIEVAL_SETTINGS, make_retriever, project_settings, settings_key, settings_error
+from components.ingestion import job_status, chunking
+from components.documents import register_document, latest_document, document_vector_store, queue_missing_index
+from components.index_builder import build_vector_store
+from components.conversation import conversation_history, format_turns
+from components.pagination import page_limit, keyset_page
 from werkzeug.utils import secure_filename
 
 
@@ -29,10 +40,15 @@ HUGGINGFACEHUB_API_TOKEN = ""
 print(HUGGINGFACEHUB_API_TOKEN, HF_TOKEN)
 
 repo_id = "mistralai/Mistral-7B-Instruct-v0.2"
-UPLOAD_FOLDER = "./uploads"  # Folder to store uploaded PDFs
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)  # Create folder if it doesn't exist
 
-file_path = ''
+chain_factory = ChainFactory(repo_id=repo_id, api_key=HUGGINGFACEHUB_API_TOKEN)
+
+MILESTONE_BATCH_WORKERS = int(os.getenv("MILESTONE_BATCH_WORKERS", 4))  # Projects generated at once by a batch
+BATCH_BUSY_RETRIES = 3
+MAX_BATCH_PROJECTS = 200
+MAX_BATCH_MILESTONES = 20
+CHAT_PAGE_SIZE = 50  # Turns returned by the chat history endpoint
+MAX_CHAT_PAGE_SIZE = 200
 
 # @llm_bp.route('/upload', methods=['POST'])
 # def load_pdf(file_path):
@@ -77,10 +93,14 @@ def allowed_file(filename):
 
 
 @llm_bp.route('/upload', methods=['POST'])
-def upload_file():
+@llm_bp.route('/upload/<int:project_id>', methods=['POST'])
+def upload_file(project_id=None):
+    # The project comes from the URL or a project_id form field
+    if project_id is None: project_id = request.form.get('project_id', type=int)
+    if not project_id: return jsonify({"error": "project_id is required"}), 400
+    if not db.session.get(Project, project_id): return jsonify({"error": "Project not found"}), 404
+
     # Check if the request has a file part
-    global file_path
-    print(request)
     if 'document' not in request.files:
         return jsonify({"error": "No file part in the request"}), 400
 
@@ -92,55 +112,126 @@ def upload_file():
 
     # Validate the file type
     if file and allowed_file(file.filename):
-        # Secure the filename and save it to the upload folder
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
-
-        # You can now process the PDF if needed
+        # Store the file for the project, it is extracted, chunked and embedded once in the background
+        document, job = register_document(project_id, file, secure_filename(file.filename))
+        if request.accept_mimetypes.best == 'application/json':
+            status = job_status(job) if job else {"status": "completed"}
+            return jsonify({"message": "File uploaded successfully", "document_id": document.document_id, "ingestion": status}), 202
         return redirect("localhost:5173")
 
     return jsonify({"error": "Invalid file type. Only PDF files are allowed."}), 400
             
 
 
-def chunking(document_text):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100)
-    documents = text_splitter.create_documents([document_text])
-    return documents
+@llm_bp.route('/upload/status/<int:job_id>', methods=['GET'])
+def get_upload_status(job_id):
+    job = db.session.get(IngestionJob, job_id)
+    if not job: return jsonify({"error": "Ingestion job not found"}), 404
+    return jsonify(job_status(job)), 200
+
+@llm_bp.route('/retrieval/settings/<int:project_id>', methods=['GET', 'PUT'])
+@auth_required()
+@roles_accepted('Admin', 'Instructor')
+def retrieval_settings(project_id):
+    if not db.session.get(Project, project_id): return jsonify({"error": "Project not found"}), 404
+    settings = project_settings(project_id)
+    if request.method == 'GET': return jsonify({"settings": settings}), 200
+
+    body = request.get_json(silent=True) or {}
+    for name, value in body.items():
+        if name not in DEFAULT_RETRIEVAL_SETTINGS: return jsonify({"error": f"Unknown setting {name}"}), 400
+        expected = type(DEFAULT_RETRIEVAL_SETTINGS[name])
+        if expected is float and isinstance(value, int): value = float(value)
+        if not isinstance(value, expected) or isinstance(value, bool):
+            return jsonify({"error": f"{name} must be a {expected.__name__}"}), 400
+        settings[name] = value
+    error = settings_error(settings)
+    if error: return jsonify({"error": error}), 400
+
+    row = db.session.get(RetrievalSettings, project_id) or RetrievalSettings(project_id=project_id)
+    for name, value in settings.items(): setattr(row, name, value)
+    db.session.add(row)
+    db.session.commit()
+    # Build the index for new chunking settings before the next question needs it
+    document = latest_document(project_id)
+    job = queue_missing_index(document, settings) if document else None
+    return jsonify({"settings": settings, "ingestion": job_status(job) if job else None}), 200
+
+def embedding_model():
+    # Shared by every request, the model weights are loaded once per worker
+    return embedding_service
 
 def embeddings(documents):
-    embedding_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L12-v2", model_kwargs={"trust_remote_code": True})
-    vector_store = FAISS.from_documents(documents, embedding_model)
+    vector_store = build_vector_store(documents, embedding_model())
     return vector_store
 
 
 # The chain for the question and answer
 
-def create_llm_chain(vectorstore):
-    global HUGGINGFACEHUB_API_TOKEN
-    template = """Given the following user question answer the question. 
+ASK_TEMPLATE = """Given the following user question answer the question. 
+    Conversation: {history}
     Context: {context}
     Question: {question}
     """
-    prompt = PromptTemplate(template=template, input_variables=["context", "question"])
 
-    llm = HuggingFaceEndpoint(repo_id=repo_id, max_length=800,  api_key=HUGGINGFACEHUB_API_TOKEN)
-    llm.client.headers = {"Authorization": f"Bearer {HUGGINGFACEHUB_API_TOKEN}"}
-    
-    memory = ConversationBufferMemory(memory_key='chat_history', return_messages=True)
+CONVERSATION_SUMMARY_TEMPLATE = """Summarize the conversation between an instructor and an assistant in a few sentences.
+    Keep the facts, names and decisions a later question could refer to.
+    Summary so far: {context}
+    New turns: {question}
+    Summary:"""
+
+def create_llm(**kwargs):
+    # Clients are shared, each keeps a pool of open connections to the endpoint
+    return chain_factory.llm(**kwargs)
+
+
+# Streaming responses, as server sent events
+
+SUMMARY_QUESTION = "What is the summary of the document ?"
 
-    # Create a chain for question answering with a retriever from the vector store
-    conversation_chain = RetrievalQA.from_chain_type(
-    llm=llm,
-    chain_type = "stuff",
-    retriever=vectorstore.as_retriever(search_kwargs={"k": 2}),
-    chain_type_kwargs={
-        "prompt":prompt
-    },
-    memory=memory,
-    )
-    return conversation_chain
+def wants_stream():
+    return request.args.get('stream', '').lower() in ('1', 'true') or request.accept_mimetypes.best == 'text/event-stream'
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def retrieved_context(retriever, question):
+    # Same context the "stuff" chain builds from the retriever
+    return "\n\n".join(document.page_content for document in retriever.invoke(question))
+
+def stream_completion(tokens, on_complete):
+    """Forward tokens as token events while the LLM produces them.
+
+    When the stream ends on_complete gets the whole text and its result is sent
+    as the done event, errors after the stream started are sent as an error event.
+    """
+    def generate():
+        text = []
+        try:
+            for token in tokens:
+                text.append(token)
+                yield sse('token', {'token': token})
+            yield sse('done', on_complete(''.join(text)))
+        except Exception as e:
+            db.session.rollback()
+            yield sse('error', {'error': str(e)})
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def llm_unavailable(e):
+    response = jsonify({'error': str(e)})
+    if e.retry_after: response.headers['Retry-After'] = str(e.retry_after)
+    return response, e.status
+
+def create_llm_chain(vectorstore, settings=DEFAULT_RETRIEVAL_SETTINGS, history=""):
+    # Shared client, new retriever and memory for this request
+    return chain_factory.chain(vectorstore, ASK_TEMPLATE, retriever=make_retriever(vectorstore, settings),
+                               variables={"history": history or "None"}, max_length=800)
+
+def summarize_conversation(summary, turns):
+    # Runs on the LLM executor like the answers, once every CONVERSATION_TURNS questions
+    prompt = chain_factory.prompt(CONVERSATION_SUMMARY_TEMPLATE).format(context=summary or "None", question=format_turns(turns))
+    return llm_executor.run(lambda: create_llm(max_length=300).invoke(prompt))
 
 
 
@@ -151,56 +242,88 @@ def ask_question(instructor_id,project_id):
         # if 'file' not in request.files or 'question' not in request.form:
         #     return jsonify({'error': 'PDF file or question not provided'}), 400
 
-        global file_path
-        print(file_path)
-        
         body = request.get_json()
         user_question = body.get('question')
 
-        if file_path == '':
+        document = latest_document(project_id)
+        if not document:
             return jsonify({'error': 'No selected file'}), 400
 
-        # Process the PDF
-        pdf_reader = PdfReader(file_path)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + '\n'
-        
-        document_text = text
-        documents = chunking(document_text)
-        vector_store = embeddings(documents)
+        def answered(response):
+            saved = save_answer(instructor_id, project_id, user_question, response)
+            return {'response': response} if saved else {'response': response, 'message': 'Project not found'}
+
+        # The latest turns of this conversation and a summary of the ones before
+        history = conversation_history(project_id, instructor_id, summarize_conversation)
+
+        # Repeated questions about the same document skip retrieval and the LLM. Answers to follow-ups
+        # depend on the conversation, so they are only shared by conversations with the same history.
+        settings = project_settings(project_id)
+        cache_key = f"{document.content_hash}:{settings_key(settings)}"
+        if history: cache_key += f":{hashlib.sha256(history.encode()).hexdigest()}"
+        cached = answer_cache.get(cache_key, user_question)
+        if cached is not None:
+            if wants_stream(): return stream_completion([cached], answered)
+            if not save_answer(instructor_id, project_id, user_question, cached):
+                return jsonify({"message": "Project not found"}), 404
+            return jsonify({'response': cached}), 200
+
+        # Load the document's saved index instead of re-parsing and re-embedding the PDF
+        vector_store, job = document_vector_store(document, settings)
+        if vector_store is None and job.status == 'failed':
+            return jsonify({'error': 'Document could not be processed', 'ingestion': job_status(job)}), 422
+        if vector_store is None:
+            return jsonify({'error': 'Document is still being processed', 'ingestion': job_status(job)}), 409
+
+        if wants_stream():
+            prompt = chain_factory.prompt(ASK_TEMPLATE).format(
+                context=retrieved_context(make_retriever(vector_store, settings), user_question), question=user_question,
+                history=history or "None")
+            def on_complete(text):
+                response = parse_answer(text)
+                answer_cache.put(cache_key, user_question, response)
+                return answered(response)
+            return stream_completion(llm_executor.stream(lambda: create_llm(max_length=800).stream(prompt)), on_complete)
 
         # Create the conversation chain
-        conversation_chain = create_llm_chain(vector_store)
+        conversation_chain = create_llm_chain(vector_store, settings, history)
 
         # Get response from the conversation chain
         print(user_question)
-        response = conversation_chain.run(user_question)
-        response = response.split("Answer: ")
-        if len(response) > 1:
-            response = response[1]
+        # Runs on the LLM executor, refused with 429 when too many are waiting
+        response = parse_answer(llm_executor.run(lambda: conversation_chain.invoke({"query": user_question}))["result"])
+        answer_cache.put(cache_key, user_question, response)
         
-        # Dont store the summary in the chat history
-        if user_question == "What is the summary of the document ?": return jsonify({'response': response}), 200
-        # Save the chat history
-        project = ProjectInstructorAssignment.query.filter_by(instructor_id=instructor_id, project_id=project_id).first()
-        if not project: return jsonify({"message": "Project not found"}), 404
-        
-        chat_history = ChatHistory(project_id=project_id, instructor_id=instructor_id, message_text=user_question + "<END>" + response)
-        db.session.add(chat_history)
-        db.session.commit()
+        if not save_answer(instructor_id, project_id, user_question, response):
+            return jsonify({"message": "Project not found"}), 404
 
         # Return the response
         return jsonify({'response': response}), 200
+    except LLMUnavailable as e:
+        return llm_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def parse_answer(text):
+    response = text.split("Answer: ")
+    return response[1] if len(response) > 1 else text
+
+def save_answer(instructor_id, project_id, user_question, response):
+    """Store a question and its answer in the chat history, False if the instructor is not on the project."""
+    # Dont store the summary in the chat history
+    if user_question == SUMMARY_QUESTION: return True
+    project = ProjectInstructorAssignment.query.filter_by(instructor_id=instructor_id, project_id=project_id).first()
+    if not project: return False
+    
+    chat_history = ChatHistory(project_id=project_id, instructor_id=instructor_id, question=user_question, answer=response)
+    db.session.add(chat_history)
+    db.session.commit()
+    return True
+
 
 # The chain for generating the milestones
 
-def generate_milestone(vectorstore):
-    global HUGGINGFACEHUB_API_TOKEN
-    template = """ 
+MILESTONE_TEMPLATE = """ 
     You are helping the instructor generate tasks (milestones) to guide the students and maintain a check on their project progress. 
 
     1. You will get an input number of milestones in numbers example: 1,2,4,5....[X]. Where X is a number. 
@@ -227,31 +350,15 @@ def generate_milestone(vectorstore):
     Number of Milestones : {question}
 
     """
-    prompt = PromptTemplate(template=template, input_variables=["context", "question"])
-
-    llm = HuggingFaceEndpoint(repo_id=repo_id, api_key=HUGGINGFACEHUB_API_TOKEN)
-    llm.client.headers = {"Authorization": f"Bearer {HUGGINGFACEHUB_API_TOKEN}"}
-    
-    memory = ConversationBufferMemory(memory_key='chat_history', return_messages=True)
 
-    # Create a chain for question answering with a retriever from the vector store
-    conversation_chain = RetrievalQA.from_chain_type(
-    llm=llm,
-    chain_type = "stuff",
-    retriever=vectorstore.as_retriever(search_kwargs={"k": 2}),
-    chain_type_kwargs={
-        "prompt":prompt
-    },
-    memory=memory,
-    )
-    return conversation_chain
+def generate_milestone(vectorstore):
+    return chain_factory.chain(vectorstore, MILESTONE_TEMPLATE)
 
 
 
 @llm_bp.route('/milestone/<int:instructor_id>/<int:project_id>', methods=['POST'])
 def generate_milestones(instructor_id, project_id):
     try:
-        DELIMITER = "END"
         body = request.get_json()
         project_desc = body.get('description')
         number_of_milestones = body.get('numbermilestones')
@@ -259,74 +366,273 @@ def generate_milestones(instructor_id, project_id):
         if project_desc == '':
             return jsonify({'error': 'Enter the project Description'}), 400
 
-        
-        document_text = f"""Project Description : {project_desc}"""
-        documents = chunking(document_text)
-        vector_store = embeddings(documents)
-
-        # Create the conversation chain
-        conversation_chain = generate_milestone(vector_store)
+        if wants_stream():
+            # Check the project before the client waits on the stream
+            project = ProjectInstructorAssignment.query.filter_by(instructor_id=instructor_id, project_id=project_id).first()
+            if not project: return jsonify({"message": "Project not found"}), 404
+            vector_store = embeddings(chunking(f"""Project Description : {project_desc}"""))
+            prompt = chain_factory.prompt(MILESTONE_TEMPLATE).format(
+                context=retrieved_context(vector_store.as_retriever(search_kwargs={"k": 2}), str(number_of_milestones)), question=str(number_of_milestones))
+            tokens = llm_executor.stream(lambda: create_llm().stream(prompt))
+            parser = MilestoneParser()
+            pending = [project_desc]
+            def save(milestones):
+                # The Project Document milestone is saved with the first block, a failed stream saves nothing
+                if pending: save_milestones(project_id, pending.pop(), milestones)
+                else: add_milestones(project_id, milestones)
+            def on_complete(text):
+                save(parser.close())
+                return {'message': 'Milestones generated successfully', 'milestones': parser.parsed, 'incomplete': parser.incomplete}
+            return stream_completion(saved_while_streaming(tokens, parser, save), on_complete)
 
         # Get response from the conversation chain
         print(number_of_milestones)
-        string_response = conversation_chain.run(str(number_of_milestones))
-
-        response = string_response.split(DELIMITER)
-        titles = []
-        descriptions = []
-        for i in range(len(response)-1):
-            response[i] = response[i].split('Title: ')[1]
-            temp = response[i].split('Description: ')
-            titles.append(temp[0].split('\n')[0])
-            descriptions.append(temp[1].split('\n')[0])
-        
+        string_response = milestone_completion(project_desc, number_of_milestones)
+
         # Check if Project Document milestone exists
         project = ProjectInstructorAssignment.query.filter_by(instructor_id=instructor_id, project_id=project_id).first()
         if not project: return jsonify({"message": "Project not found"}), 404
-        project_id = project.project_id
-        
-        milestone = Milestone.query.filter_by(project_id=project_id, title="Project Document").first()
-        if not milestone:
-            milestone = Milestone(title="Project Document", description=project_desc, project_id=project_id, start_date=datetime.utcnow().date(), end_date=datetime.utcnow().date(), weightage=0)
-            db.session.add(milestone)
-            db.session.commit()
-        else:
-            milestone.description = project_desc
-            db.session.commit()
-        
-        for i in range(len(titles)):
-            milestone = Milestone(title=titles[i], description=descriptions[i], project_id=project_id, start_date=datetime.utcnow().date(), end_date=datetime.utcnow().date(), weightage=0)
-            db.session.add(milestone)
-            db.session.commit()
+        milestones, incomplete = parse_milestones(string_response)
+        save_milestones(project.project_id, project_desc, milestones)
         # Return the response 
-        return jsonify({'message': 'Milestones generated successfully'}), 200
+        return jsonify({'message': 'Milestones generated successfully', 'milestones': len(milestones), 'incomplete': incomplete}), 200
+    except LLMUnavailable as e:
+        return llm_unavailable(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+def save_milestones(project_id, project_desc, milestones):
+    """Store parsed milestones and the Project Document milestone of a project in one transaction."""
+    today = datetime.utcnow().date()
+    deadlines = len(milestones)
     
+    milestone = Milestone.query.filter_by(project_id=project_id, title="Project Document").first()
+    if not milestone:
+        db.session.add(Milestone(title="Project Document", description=project_desc, project_id=project_id, start_date=today, end_date=today, weightage=0))
+        deadlines += 1
+    else:
+        milestone.description = project_desc
+    
+    add_milestones(project_id, milestones, deadlines)
+
+def add_milestones(project_id, milestones, deadlines=None):
+    today = datetime.utcnow().date()
+    db.session.add_all([
+        Milestone(title=title, description=description, project_id=project_id, start_date=today, end_date=today, weightage=0)
+        for title, description in milestones
+    ])
+    deadlines = len(milestones) if deadlines is None else deadlines
+    if deadlines: record_daily_activity(today, deadlines=deadlines)
+    db.session.commit()
+
+def saved_while_streaming(tokens, parser, save):
+    """Pass tokens through, saving each milestone as soon as its block is complete."""
+    for token in tokens:
+        yield token
+        milestones = parser.feed(token)
+        if milestones: save(milestones)
+
+def milestone_completion(project_desc, number_of_milestones):
+    """Raw model output with the milestones of a project description."""
+    document_text = f"""Project Description : {project_desc}"""
+    conversation_chain = generate_milestone(embeddings(chunking(document_text)))
+    return llm_executor.run(lambda: conversation_chain.invoke({"query": str(number_of_milestones)}))["result"]
+
+def busy_retrying_completion(project_desc, number_of_milestones):
+    # Batch jobs wait for room on the LLM executor instead of failing
+    for attempt in range(BATCH_BUSY_RETRIES + 1):
+        try:
+            return milestone_completion(project_desc, number_of_milestones)
+        except LLMBusy as e:
+            if attempt == BATCH_BUSY_RETRIES: raise
+            time.sleep((e.retry_after or 1) * (attempt + 1))
+
+def batch_item_error(item, project_ids):
+    if not isinstance(item, dict): return "Each project must be an object"
+    if item.get('project_id') not in project_ids: return "Project not found"
+    if not isinstance(item.get('description'), str) or not item['description'].strip(): return "Enter the project Description"
+    number = item.get('numbermilestones')
+    if not isinstance(number, int) or isinstance(number, bool) or not 1 <= number <= MAX_BATCH_MILESTONES:
+        return f"numbermilestones must be between 1 and {MAX_BATCH_MILESTONES}"
+    return None
+
+def generate_milestone_batch(items, workers=MILESTONE_BATCH_WORKERS, on_result=None):
+    """Generate milestones for many projects.
+
+    Model calls run on a pool of worker threads, each project's milestones
+    are saved in one transaction as soon as its output arrives, and
+    on_result, when given, is called with the number of projects done.
+    Returns one result per item, in input order.
+    """
+    requested = [item.get('project_id') for item in items if isinstance(item, dict)]
+    project_ids = {project_id for (project_id,) in db.session.query(Project.project_id).filter(
+        Project.project_id.in_([project_id for project_id in requested if isinstance(project_id, int)]))}
+    results = [{"project_id": item.get('project_id') if isinstance(item, dict) else None} for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="milestone-batch") as pool:
+        futures = {}
+        for index, item in enumerate(items):
+            error = batch_item_error(item, project_ids)
+            if error:
+                results[index].update(status="invalid", error=error)
+                continue
+            futures[pool.submit(busy_retrying_completion, item['description'], item['numbermilestones'])] = index
+        # Invalid items are done already
+        done = len(items) - len(futures)
+        for future in as_completed(futures):
+            index = futures[future]
+            item = items[index]
+            try:
+                milestones, incomplete = parse_milestones(future.result())
+                save_milestones(item['project_id'], item['description'], milestones)
+                results[index].update(status="created", milestones=len(milestones), incomplete=incomplete)
+            except Exception as e:
+                db.session.rollback()
+                results[index].update(status="failed", error=str(e))
+            done += 1
+            if on_result: on_result(done)
+    return results
+
+def batch_job_status(job):
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "projects_total": len(job.projects),
+        "projects_done": job.projects_done,
+        "results": job.results,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }
+
+class MilestoneBatchQueue:
+    """Runs milestone batches in the background, one batch at a time.
+
+    Batches are rows of milestone_batch_jobs, so every web worker can report
+    their progress. Queued batches left by a restart are started by init_app,
+    running ones are failed since some of their projects may be saved already.
+    """
+
+    def __init__(self, workers=MILESTONE_BATCH_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="milestone-batch-queue")
+        self.workers = workers
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        with app.app_context():
+            MilestoneBatchJob.query.filter_by(status='running').update(
+                {MilestoneBatchJob.status: 'failed', MilestoneBatchJob.error: 'Interrupted by a restart'})
+            db.session.commit()
+            for (job_id,) in db.session.query(MilestoneBatchJob.job_id).filter_by(status='queued'):
+                self.executor.submit(self.run, job_id)
+
+    def enqueue(self, projects):
+        job = MilestoneBatchJob(projects=projects)
+        db.session.add(job)
+        db.session.commit()
+        self.executor.submit(self.run, job.job_id)
+        return job
+
+    def run(self, job_id):
+        with self.app.app_context():
+            # Claim the job, another worker may have taken it already
+            claimed = MilestoneBatchJob.query.filter_by(job_id=job_id, status='queued').update({MilestoneBatchJob.status: 'running'})
+            db.session.commit()
+            if not claimed: return
+            job = db.session.get(MilestoneBatchJob, job_id)
+            def progress(done):
+                job.projects_done = done
+                db.session.commit()
+            try:
+                job.results = generate_milestone_batch(job.projects, workers=self.workers, on_result=progress)
+                job.status = 'completed'
+            except Exception as e:
+                db.session.rollback()
+                job = db.session.get(MilestoneBatchJob, job_id)
+                job.status = 'failed'
+                job.error = str(e)
+            db.session.commit()
+
+milestone_batch_queue = MilestoneBatchQueue()
+
+@llm_bp.route('/milestone/batch', methods=['POST'])
+@auth_required()
+@roles_required('Admin')
+def generate_milestones_batch():
+    body = request.get_json(silent=True) or {}
+    projects = body.get('projects')
+    if not isinstance(projects, list) or not projects:
+        return jsonify({'error': 'projects must be a non empty list'}), 400
+    if len(projects) > MAX_BATCH_PROJECTS:
+        return jsonify({'error': f'At most {MAX_BATCH_PROJECTS} projects per batch'}), 400
+    # Up to MAX_BATCH_PROJECTS model calls, they run in the background while the status is polled
+    job = milestone_batch_queue.enqueue(projects)
+    return jsonify({'message': f'Milestones of {len(projects)} projects queued', 'batch': batch_job_status(job)}), 202
+
+@llm_bp.route('/milestone/batch/<int:job_id>', methods=['GET'])
+@auth_required()
+@roles_required('Admin')
+def get_milestone_batch_status(job_id):
+    job = db.session.get(MilestoneBatchJob, job_id)
+    if not job: return jsonify({"error": "Milestone batch not found"}), 404
+    return jsonify(batch_job_status(job)), 200
+
+@click.command('generate-milestones')
+@click.argument('projects_file', type=click.File())
+@click.option('--workers', default=MILESTONE_BATCH_WORKERS, show_default=True, help='Projects generated at once.')
+@with_appcontext
+def generate_milestones_command(projects_file, workers):
+    """Generate milestones for the projects listed in a JSON file.
+
+    The file holds a list of {"project_id", "description", "numbermilestones"} objects.
+    """
+    results = generate_milestone_batch(json.load(projects_file), workers=workers)
+    for result in results:
+        detail = f"{result['milestones']} milestones" if result['status'] == 'created' else result['error']
+        click.echo(f"Project {result['project_id']}: {result['status']} ({detail})")
+    failed = [result for result in results if result['status'] != 'created']
+    if failed:
+        raise click.ClickException(f"{len(failed)} of {len(results)} projects were not generated")
+
 
 @llm_bp.route('/chat/<int:instructor_id>/<int:project_id>', methods=['GET'])
 def get_chat_history(instructor_id, project_id):
     project = ProjectInstructorAssignment.query.filter_by(instructor_id=instructor_id, project_id=project_id).first()
     if not project: return jsonify({"message": "Project not found"}), 404
-    
-    chat_history = ChatHistory.query.filter_by(instructor_id=instructor_id, project_id=project_id).all()
-    print(chat_history)
-    if not chat_history: return jsonify({"response": []}), 200
+
+    # The latest limit turns, or the ones before the next_before cursor of a previous page
+    limit = page_limit(request.args.get('limit'), CHAT_PAGE_SIZE, MAX_CHAT_PAGE_SIZE)
+    if limit is None: return jsonify({"message": f"limit must be between 1 and {MAX_CHAT_PAGE_SIZE}"}), 400
+    query = ChatHistory.query.filter_by(project_id=project_id, instructor_id=instructor_id)
+    try:
+        chats, next_before = keyset_page(query, ChatHistory.message_timestamp, ChatHistory.chat_id, limit, request.args.get('before'))
+    except ValueError:
+        return jsonify({"message": "Invalid cursor"}), 400
+    chats.reverse()
 
     response = []
-    for chat in chat_history:
-        print(chat.message_text)
-        chat.message_text = chat.message_text.split("<END>")
-        print(chat.message_text)
+    for chat in chats:
         response.append({
             'id': chat.chat_id,
-            'text': chat.message_text[0],
+            'text': chat.question,
             'type': 'question'
         })
         response.append({
             'id': chat.chat_id,
-            'text': chat.message_text[1],
+            'text': chat.answer,
             'type': 'answer'
         })
 
-    return jsonify({"message": "Chat history retrieved successfully", "response": response}), 200
+    return jsonify({
+        "message": "Chat history retrieved successfully",
+        "response": response,
+        "next_before": next_before
+    }), 200
+
+
+@llm_bp.route('/llm/metrics', methods=['GET'])
+@auth_required()
+@roles_required('Admin')
+def get_llm_metrics():
+    return jsonify({"embedding": embedding_service.stats(), "answer_cache": answer_cache.stats(), "chains": chain_factory.stats(), "executor": llm_executor.stats()}), 200
@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 4))  # LLM calls running at once
+LLM_QUEUE_DEPTH = int(os.getenv("LLM_QUEUE_DEPTH", 8))  # LLM calls waiting for a slot before new ones are refused
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120))  # Seconds a call may wait and run in total
+LLM_RETRY_AFTER = int(os.getenv("LLM_RETRY_AFTER", 5))  # Seconds clients are told to wait when refused
+
+class LLMUnavailable(Exception):
+    status = 503
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMBusy(LLMUnavailable):
+    status = 429
+
+class LLMTimeout(LLMUnavailable):
+    status = 504
+
+class LLMExecutor:
+    """Runs blocking LLM calls on a bounded pool of worker threads.
+
+    The calls are the synchronous invoke and stream of the shared clients, so
+    they go through the keep-alive connection pool of the inference client.
+    At most concurrency calls run at once and at most queue_depth more wait
+    for a worker, anything beyond that is refused with LLMBusy straight away
+    so web workers are never tied up by a backlog. Callers stop waiting after
+    timeout seconds; a call that has not started by then is dropped, a
+    running one keeps its worker until the client returns.
+    """
+
+    def __init__(self, concurrency=LLM_CONCURRENCY, queue_depth=LLM_QUEUE_DEPTH, timeout=LLM_TIMEOUT, retry_after=LLM_RETRY_AFTER):
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.pool = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix="llm-executor")
+        self.lock = threading.Lock()
+        self.admitted = 0
+        self.running = 0
+        self.counters = {"completed": 0, "failed": 0, "cancelled": 0, "timeouts": 0, "rejected": 0}
+
+    def admit(self):
+        with self.lock:
+            if self.admitted >= self.concurrency + self.queue_depth:
+                self.counters["rejected"] += 1
+                raise LLMBusy("Too many questions are being answered, try again shortly", self.retry_after)
+            self.admitted += 1
+
+    def release(self, future):
+        if future.cancelled(): outcome = "cancelled"
+        elif future.exception(): outcome = "failed"
+        else: outcome = "completed"
+        with self.lock:
+            self.admitted -= 1
+            self.counters[outcome] += 1
+
+    def timed_out(self, future):
+        future.cancel()
+        with self.lock: self.counters["timeouts"] += 1
+        return LLMTimeout("The language model took too long to answer")
+
+    def limited(self, function):
+        with self.lock: self.running += 1
+        try:
+            return function()
+        finally:
+            with self.lock: self.running -= 1
+
+    def submit(self, function):
+        self.admit()
+        future = self.pool.submit(self.limited, function)
+        # Released when the call finishes, fails or is dropped before it starts
+        future.add_done_callback(self.release)
+        return future
+
+    def run(self, function, timeout=None):
+        """Wait for the result of function() run on a worker."""
+        future = self.submit(function)
+        try:
+            return future.result(timeout or self.timeout)
+        except FutureTimeout:
+            raise self.timed_out(future)
+
+    def stream(self, stream_function, timeout=None):
+        """Iterate the iterator stream_function() on a worker.
+
+        Admission happens on the call, so a busy executor refuses the request
+        before any response is started.
+        """
+        items = queue.Queue()
+        done = object()
+        stopped = threading.Event()
+
+        def pump():
+            iterator = stream_function()
+            try:
+                for item in iterator:
+                    if stopped.is_set(): break
+                    items.put(item)
+            finally:
+                # Closes the response when the reader went away or gave up
+                close = getattr(iterator, "close", None)
+                if close: close()
+
+        future = self.submit(pump)
+        future.add_done_callback(lambda future: items.put(done))
+        deadline = time.monotonic() + (timeout or self.timeout)
+
+        def generate():
+            try:
+                while True:
+                    try:
+                        item = items.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        raise self.timed_out(future)
+                    if item is done: break
+                    yield item
+                future.result()
+            finally:
+                # Stops the call when the client goes away mid stream
+                stopped.set()
+                future.cancel()
+        return generate()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["running"] = self.running
+            stats["waiting"] = self.admitted - self.running
+        stats["concurrency"] = self.concurrency
+        stats["queue_depth"] = self.queue_depth
+        stats["timeout"] = self.timeout
+        return stats
+
+llm_executor = LLMExecutor()
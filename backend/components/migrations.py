@@ -0,0 +1,36 @@
+from sqlalchemy import inspect, text
+from components.models import db, ChatHistory
+
+LEGACY_CHAT_DELIMITER = "<END>"  # Old rows stored question<END>answer in message_text
+
+def migrate_chat_history():
+    """Move chat_history from one message_text column to question and answer columns.
+
+    SQLite cannot drop or change columns in place, so the table is rebuilt in
+    one transaction: the old table is renamed, the new one created with its
+    indexes and the rows copied over, split on the delimiter, by a single
+    INSERT ... SELECT. Returns the number of rows migrated, or None when the
+    table is already up to date.
+    """
+    inspector = inspect(db.engine)
+    if not inspector.has_table(ChatHistory.__tablename__): return None
+    if "message_text" not in {column["name"] for column in inspector.get_columns(ChatHistory.__tablename__)}: return None
+
+    with db.engine.begin() as connection:
+        connection.execute(text("ALTER TABLE chat_history RENAME TO chat_history_legacy"))
+        ChatHistory.__table__.create(connection)
+        migrated = connection.execute(text("""
+            INSERT INTO chat_history (chat_id, project_id, instructor_id, question, answer, message_timestamp)
+            SELECT chat_id, project_id, instructor_id,
+                CASE WHEN instr(message_text, :delimiter) > 0
+                    THEN substr(message_text, 1, instr(message_text, :delimiter) - 1) ELSE message_text END,
+                CASE WHEN instr(message_text, :delimiter) > 0
+                    THEN substr(message_text, instr(message_text, :delimiter) + length(:delimiter)) ELSE '' END,
+                COALESCE(message_timestamp, CURRENT_TIMESTAMP)
+            FROM chat_history_legacy
+        """), {"delimiter": LEGACY_CHAT_DELIMITER}).rowcount
+        connection.execute(text("DROP TABLE chat_history_legacy"))
+    return migrated
+
+def run_migrations():
+    migrate_chat_history()
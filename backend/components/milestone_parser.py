@@ -0,0 +1,72 @@
+import re
+
+FIELD = re.compile(r"^(?:milestone\s*\d+\s*[:.)\-]?\s*\**\s*)?(title|description)\s*\**\s*[:\-]\s*\**\s*(.*)$", re.I)
+END = re.compile(r"(?:^|\s)\"?END\"?\.?$")
+DECORATION = " \t*#->\"'`"  # Bullets, markdown and quotes around the labels
+
+class MilestoneParser:
+    """Single pass parser for "*** Title: / *** Description: / END" blocks.
+
+    feed() accepts any piece of the model output, such as streamed tokens, and
+    returns the milestones completed by it as (title, description) tuples. Only
+    the unfinished last line is buffered. Unknown lines before a block are
+    ignored, a new title closes the previous block even without END, lines
+    after the description line continue it, and blocks missing a title or a
+    description are counted in incomplete instead of raising.
+    """
+
+    def __init__(self):
+        self.pending = []  # Pieces of the current, unfinished line
+        self.title = None
+        self.description = None
+        self.incomplete = 0
+        self.parsed = 0
+
+    def feed(self, text):
+        if '\n' not in text:
+            self.pending.append(text)
+            return []
+        lines = (''.join(self.pending) + text).split('\n')
+        self.pending = [lines.pop()]
+        completed = []
+        for line in lines:
+            self.line(line, completed)
+        return completed
+
+    def close(self):
+        """Parse what is left, a block missing only its END still counts."""
+        completed = []
+        self.line(''.join(self.pending), completed)
+        self.pending = []
+        self.finish(completed)
+        return completed
+
+    def line(self, line, completed):
+        text = line.strip().strip(DECORATION)
+        ended = END.search(text)
+        if ended: text = text[:ended.start()].strip().strip(DECORATION)
+        field = FIELD.match(text)
+        if field:
+            label, value = field.group(1).lower(), field.group(2).strip().strip(DECORATION)
+            if label == 'title':
+                self.finish(completed)
+                self.title = value
+            else:
+                self.description = value
+        elif text and self.description is not None:
+            self.description = f"{self.description} {text}"
+        if ended: self.finish(completed)
+
+    def finish(self, completed):
+        if self.title and self.description:
+            completed.append((self.title, self.description))
+            self.parsed += 1
+        elif self.title is not None or self.description is not None:
+            self.incomplete += 1
+        self.title = self.description = None
+
+def parse_milestones(text):
+    """Milestones in a whole model output, and the number of blocks that were incomplete."""
+    parser = MilestoneParser()
+    milestones = parser.feed(text) + parser.close()
+    return milestones, parser.incomplete
@@ -3,6 +3,7 @@ from flask_security import auth_required, roles_required, current_user
 from datetime import datetime, timedelta
 from components.extensions import db
 from components.models import Milestone, Project, MilestoneSubmission, User, ProjectInstructorAssignment, ProjectStudentAssignment
+from components.statistics import refresh_milestone_statistics, refresh_project_statistics, record_daily_activity
 from utils.helpers import handle_error
 import json
 
@@ -88,6 +89,10 @@ def update_milestone(milestone_id: int):
     if end_date < start_date:
         return jsonify({'message': 'End date cannot be before start date'}), 400
 
+    if end_date != milestone.end_date:
+        record_daily_activity(milestone.end_date, deadlines=-1)
+        record_daily_activity(end_date, deadlines=1)
+
     # Update milestone fields
     milestone.title = data['title'] if 'title' in data else milestone.title
     milestone.description = data['description'] if 'description' in data else milestone.description
@@ -99,6 +104,7 @@ def update_milestone(milestone_id: int):
         milestone.document_url = data['document_url']
 
     # Update the milestone in database
+    refresh_milestone_statistics(milestone.project_id, [milestone.milestone_id])
     db.session.commit()
     
     # Prepare response data
@@ -128,6 +134,9 @@ def delete_milestone(milestone_id):
             }), 404
             
         db.session.delete(milestone)
+        record_daily_activity(milestone.end_date, deadlines=-1)
+        db.session.flush()
+        refresh_project_statistics(milestone.project_id)
         db.session.commit()
         
         return jsonify({
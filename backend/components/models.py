@@ -44,7 +44,7 @@ class ProjectStudentAssignment(db.Model):
     __tablename__ = 'project_student_assignment'
     
     assignment_id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), nullable=False, index=True)
     student_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     github_url = db.Column(db.String(255), nullable=True)
     assigned_date = db.Column(DateTime, default=datetime.utcnow)
@@ -53,7 +53,7 @@ class ProjectInstructorAssignment(db.Model):
     __tablename__ = 'project_instructor_assignment'
     
     assignment_id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), nullable=False, index=True)
     instructor_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     assigned_date = db.Column(DateTime, default=datetime.utcnow)
 
@@ -83,9 +83,171 @@ class MilestoneSubmission(db.Model):
     
 class ChatHistory(db.Model):
     __tablename__ = 'chat_history'
+    __table_args__ = (
+        # Pages of a conversation are range scans of this index, chat_id breaks timestamp ties
+        db.Index('ix_chat_history_conversation', 'project_id', 'instructor_id', 'message_timestamp', 'chat_id'),
+    )
     
     chat_id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), nullable=False)
     instructor_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
-    message_text = db.Column(db.Text, nullable=False)
-    message_timestamp = db.Column(DateTime, default=datetime.utcnow)
+    question = db.Column(db.Text, nullable=False)
+    answer = db.Column(db.Text, nullable=False)
+    message_timestamp = db.Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ConversationSummary(db.Model):
+    __tablename__ = 'conversation_summaries'
+    
+    # Rolling summary of the turns of a conversation older than the ones quoted in the prompt
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), primary_key=True)
+    instructor_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    summary = db.Column(db.Text, nullable=False, default='')
+    summarized_timestamp = db.Column(DateTime, nullable=False) # Last turn included in the summary
+    summarized_chat_id = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Materialized statistics, maintained by components/statistics.py
+class ProjectStudentStatistics(db.Model):
+    __tablename__ = 'project_student_statistics'
+    
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    completed_milestones = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MilestoneStatistics(db.Model):
+    __tablename__ = 'milestone_statistics'
+    
+    milestone_id = db.Column(db.Integer, db.ForeignKey('milestones.milestone_id'), primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), nullable=False, index=True)
+    on_time_submissions = db.Column(db.Integer, nullable=False, default=0)
+    late_submissions = db.Column(db.Integer, nullable=False, default=0)
+    early_submissions = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DailyActivity(db.Model):
+    __tablename__ = 'daily_activity'
+    
+    date = db.Column(db.Date, primary_key=True)
+    submissions = db.Column(db.Integer, nullable=False, default=0)
+    deadlines = db.Column(db.Integer, nullable=False, default=0)
+
+class IngestionJob(db.Model):
+    __tablename__ = 'ingestion_jobs'
+    
+    job_id = db.Column(db.Integer, primary_key=True)
+    file_path = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True) # queued, running, completed, failed
+    pages_total = db.Column(db.Integer, nullable=False, default=0)
+    pages_done = db.Column(db.Integer, nullable=False, default=0)
+    chunks = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MilestoneBatchJob(db.Model):
+    __tablename__ = 'milestone_batch_jobs'
+    
+    job_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True) # queued, running, completed, failed
+    projects = db.Column(db.JSON, nullable=False) # [{"project_id", "description", "numbermilestones"}] as requested
+    projects_done = db.Column(db.Integer, nullable=False, default=0)
+    results = db.Column(db.JSON) # One result per project, in request order
+    error = db.Column(db.Text)
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ProjectDocument(db.Model):
+    __tablename__ = 'project_documents'
+    
+    document_id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False, index=True) # Key of the document's vector index
+    text = db.Column(db.Text) # Extracted text, filled in by ingestion
+    chunk_count = db.Column(db.Integer, nullable=False, default=0)
+    chunk_metadata = db.Column(db.JSON) # [{"start_index": ..., "length": ...}] per chunk
+    uploaded_at = db.Column(DateTime, default=datetime.utcnow)
+
+class Commit(db.Model):
+    __tablename__ = 'commits'
+    __table_args__ = (
+        # A student's history is a range scan of this index, newest first
+        db.Index('ix_commits_timeline', 'project_id', 'student_id', 'timestamp'),
+        db.UniqueConstraint('project_id', 'student_id', 'sha'),
+    )
+    
+    commit_id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
+    sha = db.Column(db.String(40), nullable=False)
+    author_name = db.Column(db.String(255), nullable=True)
+    timestamp = db.Column(DateTime, nullable=False) # Committer date, UTC
+    commit_url = db.Column(db.String(255), nullable=True)
+
+class RepositoryCache(db.Model):
+    __tablename__ = 'repository_cache'
+    
+    # Where the last GitHub fetch of a repository stopped, shared by every student linked to it
+    repository = db.Column(db.String(255), primary_key=True) # owner/repo in lower case
+    etag = db.Column(db.String(255), nullable=True) # Of the first page, unchanged repositories answer 304
+    last_sha = db.Column(db.String(40), nullable=True) # Newest commit fetched
+    last_commit_at = db.Column(DateTime, nullable=True)
+    fetched_at = db.Column(DateTime, nullable=False) # Last time GitHub confirmed the commits
+
+class CommitSyncState(db.Model):
+    __tablename__ = 'commit_sync_state'
+    
+    # The repository a student's rows in commits are a copy of
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    repository = db.Column(db.String(255), nullable=False, index=True) # owner/repo in lower case
+    synced_at = db.Column(DateTime, nullable=False)
+
+class CommitSyncRun(db.Model):
+    __tablename__ = 'commit_sync_runs'
+    
+    # One sync of every student repository, its report lists the failures
+    run_id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='running') # running, completed or failed
+    started_at = db.Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(DateTime, nullable=True)
+    report = db.Column(db.Text, nullable=True) # JSON
+
+# Commit analytics, maintained by components/commit_analytics.py after every sync
+class CommitDailyCount(db.Model):
+    __tablename__ = 'commit_daily_counts'
+    
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True) # UTC day
+    commits = db.Column(db.Integer, nullable=False, default=0)
+
+class CommitStatistics(db.Model):
+    __tablename__ = 'commit_statistics'
+    
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    total_commits = db.Column(db.Integer, nullable=False, default=0)
+    active_days = db.Column(db.Integer, nullable=False, default=0)
+    first_commit_at = db.Column(DateTime, nullable=True)
+    last_commit_at = db.Column(DateTime, nullable=True)
+    last_active_date = db.Column(db.Date, nullable=True)
+    latest_streak = db.Column(db.Integer, nullable=False, default=0) # Consecutive active days ending on last_active_date
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RetrievalSettings(db.Model):
+    __tablename__ = 'retrieval_settings'
+    
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.project_id'), primary_key=True)
+    search_type = db.Column(db.String(20), nullable=False, default='similarity') # similarity, mmr or hybrid
+    k = db.Column(db.Integer, nullable=False, default=2)
+    fetch_k = db.Column(db.Integer, nullable=False, default=20)
+    mmr_lambda = db.Column(db.Float, nullable=False, default=0.5)
+    keyword_weight = db.Column(db.Float, nullable=False, default=0.5)
+    chunk_size = db.Column(db.Integer, nullable=False, default=2000)
+    chunk_overlap = db.Column(db.Integer, nullable=False, default=100)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
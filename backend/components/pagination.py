@@ -0,0 +1,35 @@
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+
+def encode_cursor(timestamp, row_id):
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode()).decode()
+
+def decode_cursor(cursor):
+    """(timestamp, id) of a cursor, ValueError when it is not one."""
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    except (UnicodeError, ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    return datetime.fromisoformat(timestamp), int(row_id)
+
+def page_limit(value, default, maximum):
+    """The limit query parameter as an int, None when it is out of range."""
+    if value is None: return default
+    if not value.isdigit() or not 1 <= int(value) <= maximum: return None
+    return int(value)
+
+def keyset_page(query, timestamp_column, id_column, limit, before=None):
+    """The limit newest rows of query older than the before cursor, and the cursor of the next page.
+
+    Rows are ordered by (timestamp, id) so pages stay stable while new rows
+    arrive, and each page is a range scan of an index ending in those columns.
+    """
+    if before:
+        timestamp, row_id = decode_cursor(before)
+        query = query.filter(tuple_(timestamp_column, id_column) < tuple_(timestamp, row_id))
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit: return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfReader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PARALLEL_PAGE_THRESHOLD", 50))  # Larger PDFs are extracted on a process pool
+EXTRACTION_PROCESSES = int(os.getenv("EXTRACTION_PROCESSES", min(4, os.cpu_count() or 1)))
+PAGE_BATCH_SIZE = 8  # Pages extracted per process pool task
+PAGE_WINDOW = 4  # Page batches in flight at once, bounds the pages held in memory
+
+def page_count(file_path):
+    return len(PdfReader(file_path).pages)
+
+def extract_page_range(file_path, start, stop):
+    """Text of pages [start, stop), run inside the process pool."""
+    pdf_reader = PdfReader(file_path)
+    return [pdf_reader.pages[number].extract_text() or '' for number in range(start, stop)]
+
+def iter_pages(file_path, processes=EXTRACTION_PROCESSES, threshold=PARALLEL_PAGE_THRESHOLD,
+               batch_size=PAGE_BATCH_SIZE, window=PAGE_WINDOW):
+    """Yield the text of each page in order.
+
+    PDFs with at least threshold pages are extracted batch by batch on a
+    process pool, with at most window batches in flight.
+    """
+    total = page_count(file_path)
+    if total < threshold or processes <= 1:
+        pdf_reader = PdfReader(file_path)
+        for page in pdf_reader.pages:
+            yield page.extract_text() or ''
+        return
+
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for start in range(0, total, batch_size):
+            pending.append(pool.submit(extract_page_range, file_path, start, min(start + batch_size, total)))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def iter_chunks(pages, chunk_size=2000, chunk_overlap=100):
+    """Split a stream of page texts into chunk documents as the pages arrive.
+
+    Only the unfinished tail of the text is buffered between pages. Each
+    chunk records its start_index in the whole document text.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    buffer, offset = '', 0  # offset is the position of buffer in the document
+    for page in pages:
+        buffer += page + '\n'
+        if len(buffer) < 2 * chunk_size: continue
+        chunks = text_splitter.split_text(buffer)
+        if not chunks:
+            # Nothing but whitespace so far, no chunk starts in it
+            buffer, offset = '', offset + len(buffer)
+            continue
+        position = 0
+        for chunk in chunks[:-1]:
+            position = buffer.find(chunk, position)
+            yield Document(page_content=chunk, metadata={"start_index": offset + position})
+            position += 1
+        # The last chunk may continue on the next page, keep it in the buffer
+        tail = buffer.find(chunks[-1], position)
+        buffer, offset = buffer[tail:], offset + tail
+    position = 0
+    for chunk in text_splitter.split_text(buffer):
+        position = buffer.find(chunk, position)
+        yield Document(page_content=chunk, metadata={"start_index": offset + position})
+        position += 1
@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify, abort
 from flask_security import auth_required, roles_required, roles_accepted
 from datetime import datetime
-from components.models import Project, db, ProjectInstructorAssignment, ProjectStudentAssignment, Milestone, MilestoneSubmission
+from sqlalchemy import func
+from components.models import Project, db, User, ProjectInstructorAssignment, ProjectStudentAssignment, Milestone, MilestoneSubmission
 from components.extensions import datastore
+from components.statistics import materialized_project_statistics, delete_project_statistics
 
 # Define a Blueprint for project operations
 project_bp = Blueprint('project', __name__)
@@ -55,30 +57,47 @@ def create_project():
         "created_at": new_project.created_at
     }}), 201
 
+# Largest page of projects served at once with ?limit=
+MAX_PROJECT_PAGE_SIZE = 500
+
 # Route to read (get) all projects
+# Supports keyset pagination with ?after=<project_id>&limit=<n>
 @project_bp.route('/projects', methods=['GET'])
 @auth_required()
 @roles_required('Admin')
 def get_projects():
-    projects = Project.query.all()
-    # For each project, we need to get all instructor emails
-    for project in projects:
-        instructors = ProjectInstructorAssignment.query.filter_by(project_id=project.project_id).all()
-        instructors = [datastore.find_user(user_id=assignment.instructor_id) for assignment in instructors]
-        project.instructors = [instructor.email for instructor in instructors]
-        project.students = ProjectStudentAssignment.query.filter_by(project_id=project.project_id).count()
-    
+    after = request.args.get('after', type=int)
+    limit = request.args.get('limit', type=int)
+    if 'limit' in request.args and (not limit or not 1 <= limit <= MAX_PROJECT_PAGE_SIZE):
+        return jsonify({"error": f"Limit must be between 1 and {MAX_PROJECT_PAGE_SIZE}"}), 400
+
+    # Instructor emails and student counts are correlated subqueries, so they are
+    # only evaluated for the projects on the requested page
+    instructors = db.session.query(func.group_concat(User.email, ',')).select_from(ProjectInstructorAssignment).join(
+        User, User.user_id == ProjectInstructorAssignment.instructor_id
+    ).filter(ProjectInstructorAssignment.project_id == Project.project_id).correlate(Project).scalar_subquery()
+    students = db.session.query(func.count(ProjectStudentAssignment.assignment_id)).filter(
+        ProjectStudentAssignment.project_id == Project.project_id
+    ).correlate(Project).scalar_subquery()
+
+    query = db.session.query(Project, instructors, students).order_by(Project.project_id)
+    if after is not None: query = query.filter(Project.project_id > after)
+    if limit: query = query.limit(limit)
+    projects = query.all()
+
     # Convert projects to a list of dictionaries, and return
     project_list = [{
         "project_id": project.project_id,
         "title": project.title,
         "description": project.description,
-        "instructors": project.instructors,
-        "students": project.students,
+        "instructors": instructor_emails.split(',') if instructor_emails else [],
+        "students": student_count,
         "created_at": project.created_at
-    } for project in projects]
+    } for project, instructor_emails, student_count in projects]
 
-    return jsonify({"projects": project_list}), 200
+    # Cursor for the next page, None once the last page is reached
+    next_after = project_list[-1]["project_id"] if limit and len(project_list) == limit else None
+    return jsonify({"projects": project_list, "next_after": next_after}), 200
 
 # Route to update a project
 @project_bp.route('/projects/<int:project_id>', methods=['PUT'])
@@ -153,6 +172,7 @@ def delete_project(project_id):
     assignments = ProjectStudentAssignment.query.filter_by(project_id=project_id).all()
     for assignment in assignments:
         db.session.delete(assignment)
+    delete_project_statistics(project_id)
     db.session.commit()
 
     return jsonify({"message": "Project deleted successfully"}), 200
@@ -163,63 +183,7 @@ def delete_project(project_id):
 def get_project_statistics(instructor_id, project_id):
     projects = ProjectInstructorAssignment.query.filter_by(instructor_id=instructor_id, project_id=project_id).first()
     if not projects: return jsonify({"error": "No projects found"}), 404
-    # Total milestones
-    total_milestones = Milestone.query.filter_by(project_id=projects.project_id).count()
-    # Total students
-    total_students = ProjectStudentAssignment.query.filter_by(project_id=projects.project_id).count()
-    # All completetion rate
-    completion_rates = []
-    students = ProjectStudentAssignment.query.filter_by(project_id=projects.project_id).all()
-    students = [student.student_id for student in students]
-    milestones = Milestone.query.filter_by(project_id=projects.project_id).all()
-    milestones = [milestone.milestone_id for milestone in milestones]
-    for student in students:
-        submissions = MilestoneSubmission.query.filter_by(student_id=student).all()
-        count = 0
-        for submission in submissions:
-            if submission.milestone_id in milestones:
-                count += 1
-        completion_rates.append(round(count/total_milestones, 2) * 100)
-    # Average completion rate
-    average_completion_rate = sum(completion_rates) / len(completion_rates)
-    # Make buckets for completion rates
-    buckets = [0, 0, 0, 0, 0]
-    for rate in completion_rates:
-        if rate < 20:
-            buckets[0] += 1
-        elif rate < 40:
-            buckets[1] += 1
-        elif rate < 60:
-            buckets[2] += 1
-        elif rate < 80:
-            buckets[3] += 1
-        else:
-            buckets[4] += 1
-    # Submission made before, after, on deadline
-        on_time_submissions = 0
-        late_submissions = 0
-        early_submissions = 0
-        for student in students:
-            submissions = MilestoneSubmission.query.filter_by(student_id=student).all()
-            for submission in submissions:
-                if submission.milestone_id not in milestones: continue
-                milestone = Milestone.query.get(submission.milestone_id)
-                if not milestone: continue
-                submission.submission_date = submission.submission_date.date()
-                if submission.submission_date <= milestone.end_date:
-                    on_time_submissions += 1
-                else:
-                    late_submissions += 1
-                if submission.submission_date < milestone.start_date:
-                    early_submissions += 1
-        milestone_submission_stats = [on_time_submissions, late_submissions, early_submissions]
-    return jsonify({
-        "total_milestones": total_milestones,
-        "total_students": total_students,
-        "average_completion_rate": average_completion_rate,
-        "buckets": buckets,
-        "milestone_submission_stats": milestone_submission_stats
-    }), 200
+    return jsonify(materialized_project_statistics(projects.project_id)), 200
     
 @project_bp.route('/projects/statistics-1/<int:project_id>', methods=['GET'])
 @auth_required()
@@ -227,65 +191,7 @@ def get_project_statistics(instructor_id, project_id):
 def get_project_statistics_1(project_id):
     projects = Project.query.filter_by(project_id=project_id).first()
     if not projects: return jsonify({"error": "No projects found"}), 404
-    # Total milestones
-    total_milestones = Milestone.query.filter_by(project_id=projects.project_id).count()
-    # Total students
-    total_students = ProjectStudentAssignment.query.filter_by(project_id=projects.project_id).count()
-    # All completetion rate
-    completion_rates = []
-    students = ProjectStudentAssignment.query.filter_by(project_id=projects.project_id).all()
-    students = [student.student_id for student in students]
-    milestones = Milestone.query.filter_by(project_id=projects.project_id).all()
-    milestones = [milestone.milestone_id for milestone in milestones]
-    for student in students:
-        submissions = MilestoneSubmission.query.filter_by(student_id=student).all()
-        count = 0
-        for submission in submissions:
-            if submission.milestone_id in milestones:
-                count += 1
-        completion_rates.append(round(count/total_milestones, 2) * 100)
-    # Average completion rate
-    average_completion_rate = sum(completion_rates) / len(completion_rates)
-    # Make buckets for completion rates
-    buckets = [0, 0, 0, 0, 0]
-    for rate in completion_rates:
-        if rate < 20:
-            buckets[0] += 1
-        elif rate < 40:
-            buckets[1] += 1
-        elif rate < 60:
-            buckets[2] += 1
-        elif rate < 80:
-            buckets[3] += 1
-        else:
-            buckets[4] += 1
-    # Submission made before, after, on deadline
-        on_time_submissions = 0
-        late_submissions = 0
-        early_submissions = 0
-        for student in students:
-            submissions = MilestoneSubmission.query.filter_by(student_id=student).all()
-            for submission in submissions:
-                if submission.milestone_id not in milestones: continue
-                milestone = Milestone.query.get(submission.milestone_id)
-                if not milestone: continue
-                #print(type(submission.submission_date))
-                if isinstance(submission.submission_date, datetime):
-                    submission.submission_date = submission.submission_date.date()
-                if submission.submission_date <= milestone.end_date:
-                    on_time_submissions += 1
-                else:
-                    late_submissions += 1
-                if submission.submission_date < milestone.start_date:
-                    early_submissions += 1
-        milestone_submission_stats = [on_time_submissions, late_submissions, early_submissions]
-    return jsonify({
-        "total_milestones": total_milestones,
-        "total_students": total_students,
-        "average_completion_rate": average_completion_rate,
-        "buckets": buckets,
-        "milestone_submission_stats": milestone_submission_stats
-    }), 200
+    return jsonify(materialized_project_statistics(projects.project_id)), 200
     
 @project_bp.route('/projects/<int:instructor_id>', methods=['GET'])
 @auth_required()
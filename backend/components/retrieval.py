@@ -0,0 +1,124 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Any
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+from components.models import db, RetrievalSettings
+
+DEFAULT_RETRIEVAL_SETTINGS = {
+    "search_type": "similarity",  # similarity, mmr or hybrid
+    "k": 2,
+    "fetch_k": 20,  # Candidates considered by mmr and hybrid search
+    "mmr_lambda": 0.5,
+    "keyword_weight": 0.5,  # Share of the keyword ranking in hybrid search
+    "chunk_size": 2000,
+    "chunk_overlap": 100,
+}
+SEARCH_TYPES = ("similarity", "mmr", "hybrid")
+RRF_OFFSET = 60  # Reciprocal rank fusion constant
+
+def tokenize(text):
+    return [token for token in re.findall(r"\w+", text.lower()) if len(token) > 1]
+
+class BM25Index:
+    """Okapi BM25 keyword index over the chunks of one document.
+
+    Postings are computed once when the vector index is built and saved next
+    to it, so a query only walks the postings of its own terms.
+    """
+
+    def __init__(self, postings, lengths, k1=1.5, b=0.75):
+        self.postings = postings  # term -> [[chunk position, term frequency], ...]
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self.average_length = sum(lengths) / len(lengths) if lengths else 0
+        total = len(lengths)
+        self.idf = {term: math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5)) for term, entries in postings.items()}
+
+    @classmethod
+    def build(cls, texts):
+        postings, lengths = {}, []
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append([position, frequency])
+        return cls(postings, lengths)
+
+    def to_dict(self):
+        return {"postings": self.postings, "lengths": self.lengths, "k1": self.k1, "b": self.b}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["postings"], data["lengths"], data["k1"], data["b"])
+
+    def search(self, query, k):
+        """The k best (chunk position, score) pairs for query."""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None: continue
+            for position, frequency in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / self.average_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+class HybridRetriever(BaseRetriever):
+    """Fuses the vector and keyword rankings of the fetch_k best chunks by weighted reciprocal rank."""
+
+    vector_store: Any
+    keyword_index: Any
+    k: int = 2
+    fetch_k: int = 20
+    keyword_weight: float = 0.5
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        vector = np.asarray([self.vector_store.embedding_function.embed_query(query)], dtype=np.float32)
+        _, positions = self.vector_store.index.search(vector, self.fetch_k)
+        scores = {}
+        for rank, position in enumerate(int(position) for position in positions[0] if position >= 0):
+            scores[position] = (1 - self.keyword_weight) / (RRF_OFFSET + rank)
+        for rank, (position, _) in enumerate(self.keyword_index.search(query, self.fetch_k)):
+            scores[position] = scores.get(position, 0.0) + self.keyword_weight / (RRF_OFFSET + rank)
+        best = heapq.nlargest(self.k, scores.items(), key=lambda item: item[1])
+        return [self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[position]) for position, _ in best]
+
+def make_retriever(vector_store, settings=DEFAULT_RETRIEVAL_SETTINGS):
+    if settings["search_type"] == "mmr":
+        return vector_store.as_retriever(search_type="mmr", search_kwargs={
+            "k": settings["k"], "fetch_k": settings["fetch_k"], "lambda_mult": settings["mmr_lambda"]})
+    keyword_index = getattr(vector_store, "keyword_index", None)
+    if settings["search_type"] == "hybrid" and keyword_index is not None:
+        return HybridRetriever(vector_store=vector_store, keyword_index=keyword_index, k=settings["k"],
+                               fetch_k=settings["fetch_k"], keyword_weight=settings["keyword_weight"])
+    # Stores loaded without a keyword index fall back to similarity search
+    return vector_store.as_retriever(search_kwargs={"k": settings["k"]})
+
+def index_key(content_hash, chunk_size, chunk_overlap):
+    """Key of the index of a document chunked with the given settings."""
+    if (chunk_size, chunk_overlap) == (DEFAULT_RETRIEVAL_SETTINGS["chunk_size"], DEFAULT_RETRIEVAL_SETTINGS["chunk_overlap"]):
+        return content_hash
+    return f"{content_hash}-{chunk_size}-{chunk_overlap}"
+
+def settings_key(settings):
+    """Identifies everything in the settings that changes an answer."""
+    return "-".join(str(settings[name]) for name in sorted(DEFAULT_RETRIEVAL_SETTINGS))
+
+def project_settings(project_id):
+    settings = dict(DEFAULT_RETRIEVAL_SETTINGS)
+    row = db.session.get(RetrievalSettings, project_id)
+    if row: settings.update({name: getattr(row, name) for name in DEFAULT_RETRIEVAL_SETTINGS})
+    return settings
+
+def settings_error(settings):
+    if settings["search_type"] not in SEARCH_TYPES: return f"search_type must be one of {', '.join(SEARCH_TYPES)}"
+    if not 1 <= settings["k"] <= 20: return "k must be between 1 and 20"
+    if not settings["k"] <= settings["fetch_k"] <= 100: return "fetch_k must be between k and 100"
+    if not 0 <= settings["mmr_lambda"] <= 1: return "mmr_lambda must be between 0 and 1"
+    if not 0 <= settings["keyword_weight"] <= 1: return "keyword_weight must be between 0 and 1"
+    if not 200 <= settings["chunk_size"] <= 8000: return "chunk_size must be between 200 and 8000"
+    if not 0 <= settings["chunk_overlap"] <= settings["chunk_size"] // 2: return "chunk_overlap must be between 0 and half the chunk_size"
+    return None
@@ -0,0 +1,266 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, case, distinct, literal, and_, inspect
+from components.models import (
+    db, Project, ProjectStudentAssignment, Milestone, MilestoneSubmission,
+    ProjectStudentStatistics, MilestoneStatistics, DailyActivity, CommitDailyCount, CommitStatistics
+)
+from components.commit_analytics import rebuild_commit_analytics
+
+# Completion rate buckets: <20, <40, <60, <80, >=80 (percent)
+BUCKET_BOUNDS = [20, 40, 60, 80]
+
+def completion_bucket(rate):
+    """SQL expression mapping a completion rate to its bucket index."""
+    return case(*[(rate < bound, index) for index, bound in enumerate(BUCKET_BOUNDS)], else_=len(BUCKET_BOUNDS))
+
+def completion_rate(completed, total_milestones):
+    """SQL expression for a student's completion rate, rounded like the dashboards expect."""
+    if not total_milestones: return literal(0.0)
+    return func.round(func.coalesce(completed, 0) * 1.0 / total_milestones, 2) * 100
+
+def collect_buckets(rows):
+    """Turn (bucket, students, rate_sum) rows into a bucket list and the summed rate."""
+    buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+    rate_sum = 0
+    for index, students, total in rows:
+        buckets[index] = students
+        rate_sum += total or 0
+    return buckets, rate_sum
+
+def timing_columns():
+    """Summed on time, late and early counts for submissions joined to their milestone."""
+    submission_date = func.date(MilestoneSubmission.submission_date)
+    return [
+        func.coalesce(func.sum(case((submission_date <= Milestone.end_date, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((submission_date > Milestone.end_date, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((submission_date < Milestone.start_date, 1), else_=0)), 0)
+    ]
+
+def project_student_ids(project_id):
+    """Subquery of the students assigned to a project."""
+    return db.session.query(ProjectStudentAssignment.student_id).filter(
+        ProjectStudentAssignment.project_id == project_id)
+
+def completed_milestones(project_id):
+    """Query of (student_id, completed) for the milestones of a project."""
+    return db.session.query(
+        MilestoneSubmission.student_id.label('student_id'),
+        func.count(distinct(MilestoneSubmission.milestone_id)).label('completed')
+    ).join(
+        Milestone, Milestone.milestone_id == MilestoneSubmission.milestone_id
+    ).filter(
+        Milestone.project_id == project_id
+    ).group_by(MilestoneSubmission.student_id)
+
+def completion_statistics(project_id, total_milestones):
+    """Average completion rate and bucket counts for a project in a single grouped query."""
+    completed = completed_milestones(project_id).subquery()
+    rate = completion_rate(completed.c.completed, total_milestones)
+    bucket = completion_bucket(rate).label('bucket')
+
+    rows = db.session.query(
+        bucket, func.count().label('students'), func.sum(rate).label('rate_sum')
+    ).select_from(ProjectStudentAssignment).outerjoin(
+        completed, completed.c.student_id == ProjectStudentAssignment.student_id
+    ).filter(
+        ProjectStudentAssignment.project_id == project_id
+    ).group_by(bucket).all()
+
+    buckets, rate_sum = collect_buckets(rows)
+    students = sum(buckets)
+    average_completion_rate = rate_sum / students if students else 0
+    return average_completion_rate, buckets
+
+def submission_timing_statistics(*filters):
+    """[on time, late, early] submission counts for the milestones matching filters."""
+    on_time, late, early = db.session.query(*timing_columns()).select_from(MilestoneSubmission).join(
+        Milestone, Milestone.milestone_id == MilestoneSubmission.milestone_id
+    ).filter(*filters).one()
+    return [on_time, late, early]
+
+def project_statistics(project_id):
+    """Milestone, completion and submission timing statistics for a project."""
+    total_milestones = Milestone.query.filter_by(project_id=project_id).count()
+    total_students = ProjectStudentAssignment.query.filter_by(project_id=project_id).count()
+    average_completion_rate, buckets = completion_statistics(project_id, total_milestones)
+    # Only count submissions made by students assigned to the project
+    milestone_submission_stats = submission_timing_statistics(
+        Milestone.project_id == project_id,
+        MilestoneSubmission.student_id.in_(project_student_ids(project_id))
+    )
+    return {
+        "total_milestones": total_milestones,
+        "total_students": total_students,
+        "average_completion_rate": average_completion_rate,
+        "buckets": buckets,
+        "milestone_submission_stats": milestone_submission_stats
+    }
+
+# Materialized statistics
+# The counters are refreshed inside the caller's transaction, so they commit
+# (or roll back) together with the change that triggered them.
+
+def refresh_student_statistics(project_id, student_ids=None):
+    """Recompute completed milestone counters for a project's students (all of them when student_ids is None)."""
+    students = project_student_ids(project_id)
+    existing = ProjectStudentStatistics.query.filter_by(project_id=project_id)
+    if student_ids is not None:
+        students = students.filter(ProjectStudentAssignment.student_id.in_(student_ids))
+        existing = existing.filter(ProjectStudentStatistics.student_id.in_(student_ids))
+    assigned = {student_id for (student_id,) in students.distinct()}
+    completed = dict(completed_milestones(project_id).filter(
+        MilestoneSubmission.student_id.in_(list(assigned))).all())
+    existing = {row.student_id: row for row in existing}
+
+    for student_id, row in existing.items():
+        if student_id not in assigned: db.session.delete(row)
+    for student_id in assigned:
+        row = existing.get(student_id)
+        if not row:
+            row = ProjectStudentStatistics(project_id=project_id, student_id=student_id)
+            db.session.add(row)
+        row.completed_milestones = completed.get(student_id, 0)
+
+def refresh_milestone_statistics(project_id, milestone_ids=None):
+    """Recompute submission timing counters for a project's milestones (all of them when milestone_ids is None)."""
+    counts = db.session.query(Milestone.milestone_id, *timing_columns()).select_from(Milestone).outerjoin(
+        MilestoneSubmission, and_(
+            MilestoneSubmission.milestone_id == Milestone.milestone_id,
+            MilestoneSubmission.student_id.in_(project_student_ids(project_id))
+        )
+    ).filter(Milestone.project_id == project_id)
+    existing = MilestoneStatistics.query.filter_by(project_id=project_id)
+    if milestone_ids is not None:
+        counts = counts.filter(Milestone.milestone_id.in_(milestone_ids))
+        existing = existing.filter(MilestoneStatistics.milestone_id.in_(milestone_ids))
+    counts = {milestone_id: stats for milestone_id, *stats in counts.group_by(Milestone.milestone_id)}
+    existing = {row.milestone_id: row for row in existing}
+
+    for milestone_id, row in existing.items():
+        if milestone_id not in counts: db.session.delete(row)
+    for milestone_id, (on_time, late, early) in counts.items():
+        row = existing.get(milestone_id)
+        if not row:
+            row = MilestoneStatistics(milestone_id=milestone_id, project_id=project_id)
+            db.session.add(row)
+        row.on_time_submissions, row.late_submissions, row.early_submissions = on_time, late, early
+
+def refresh_project_statistics(project_id, student_ids=None, milestone_ids=None):
+    """Refresh the materialized counters touched by a change to a project."""
+    refresh_student_statistics(project_id, student_ids)
+    refresh_milestone_statistics(project_id, milestone_ids)
+
+def delete_project_statistics(project_id):
+    """Drop all materialized counters of a project."""
+    ProjectStudentStatistics.query.filter_by(project_id=project_id).delete()
+    MilestoneStatistics.query.filter_by(project_id=project_id).delete()
+
+def materialized_project_statistics(project_id):
+    """Same output as project_statistics, read from the materialized counters."""
+    total_milestones = Milestone.query.filter_by(project_id=project_id).count()
+    total_students = ProjectStudentAssignment.query.filter_by(project_id=project_id).count()
+    rate = completion_rate(ProjectStudentStatistics.completed_milestones, total_milestones)
+    bucket = completion_bucket(rate).label('bucket')
+
+    rows = db.session.query(bucket, func.count(), func.sum(rate)).filter(
+        ProjectStudentStatistics.project_id == project_id
+    ).group_by(bucket).all()
+    buckets, rate_sum = collect_buckets(rows)
+    # Students without a counter row have not completed anything yet
+    buckets[0] += max(total_students - sum(buckets), 0)
+    average_completion_rate = rate_sum / total_students if total_students else 0
+
+    on_time, late, early = db.session.query(
+        func.coalesce(func.sum(MilestoneStatistics.on_time_submissions), 0),
+        func.coalesce(func.sum(MilestoneStatistics.late_submissions), 0),
+        func.coalesce(func.sum(MilestoneStatistics.early_submissions), 0)
+    ).filter(MilestoneStatistics.project_id == project_id).one()
+    return {
+        "total_milestones": total_milestones,
+        "total_students": total_students,
+        "average_completion_rate": average_completion_rate,
+        "buckets": buckets,
+        "milestone_submission_stats": [on_time, late, early]
+    }
+
+# Daily rollup of submissions and milestone deadlines
+
+def record_daily_activity(day, submissions=0, deadlines=0):
+    """Adjust the rollup counters of a day."""
+    updated = DailyActivity.query.filter_by(date=day).update({
+        DailyActivity.submissions: DailyActivity.submissions + submissions,
+        DailyActivity.deadlines: DailyActivity.deadlines + deadlines
+    }, synchronize_session=False)
+    if not updated:
+        db.session.add(DailyActivity(date=day, submissions=submissions, deadlines=deadlines))
+
+def live_daily_activity():
+    """Submissions and deadlines per day, aggregated from the source tables."""
+    submission_day = func.date(MilestoneSubmission.submission_date, type_=db.Date)
+    submissions = dict(db.session.query(submission_day, func.count()).filter(
+        MilestoneSubmission.submission_date.isnot(None)).group_by(submission_day))
+    deadlines = dict(db.session.query(Milestone.end_date, func.count()).group_by(Milestone.end_date))
+    return {day: (submissions.get(day, 0), deadlines.get(day, 0)) for day in submissions.keys() | deadlines.keys()}
+
+def rebuild_daily_activity():
+    """Reconstruct the daily rollup from scratch."""
+    DailyActivity.query.delete()
+    db.session.add_all([
+        DailyActivity(date=day, submissions=submissions, deadlines=deadlines)
+        for day, (submissions, deadlines) in live_daily_activity().items()
+    ])
+
+def rebuild_statistics():
+    """Reconstruct the materialized counters of every project and the daily rollups from scratch."""
+    ProjectStudentStatistics.query.delete()
+    MilestoneStatistics.query.delete()
+    project_ids = [project_id for (project_id,) in db.session.query(Project.project_id)]
+    for project_id in project_ids:
+        refresh_project_statistics(project_id)
+    rebuild_daily_activity()
+    rebuild_commit_analytics()
+    db.session.commit()
+    return project_ids
+
+def verify_statistics():
+    """Project ids whose materialized counters disagree with the live aggregates."""
+    mismatches = []
+    for (project_id,) in db.session.query(Project.project_id):
+        live = project_statistics(project_id)
+        stored = materialized_project_statistics(project_id)
+        rate_difference = abs(live.pop("average_completion_rate") - stored.pop("average_completion_rate"))
+        if live != stored or rate_difference > 1e-6:
+            mismatches.append(project_id)
+    return mismatches
+
+def verify_daily_activity():
+    """Days whose rollup counters disagree with the live aggregates."""
+    live = live_daily_activity()
+    stored = {row.date: (row.submissions, row.deadlines) for row in DailyActivity.query}
+    return sorted(day for day in live.keys() | stored.keys() if live.get(day, (0, 0)) != stored.get(day, (0, 0)))
+
+def init_statistics():
+    """Create the materialized statistics tables, populating them when they are new."""
+    inspector = inspect(db.engine)
+    tables = [ProjectStudentStatistics.__table__, MilestoneStatistics.__table__, DailyActivity.__table__,
+              CommitDailyCount.__table__, CommitStatistics.__table__]
+    created = [table for table in tables if not inspector.has_table(table.name)]
+    for table in created:
+        table.create(db.engine)
+    if created and inspector.has_table(Project.__tablename__):
+        rebuild_statistics()
+
+@click.command('rebuild-statistics')
+@with_appcontext
+def rebuild_statistics_command():
+    """Rebuild the materialized statistics and verify them against the live aggregates."""
+    db.create_all()
+    project_ids = rebuild_statistics()
+    mismatches = verify_statistics()
+    if mismatches:
+        raise click.ClickException(f"Statistics mismatch for projects: {mismatches}")
+    mismatched_days = verify_daily_activity()
+    if mismatched_days:
+        raise click.ClickException(f"Daily activity mismatch for {[day.isoformat() for day in mismatched_days]}")
+    click.echo(f"Rebuilt statistics for {len(project_ids)} projects")
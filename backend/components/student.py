@@ -1,17 +1,105 @@
+import os
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_security import auth_required, roles_accepted
 import pandas as pd
 from io import StringIO
-from components.models import db, ProjectStudentAssignment, MilestoneSubmission, Milestone, ProjectInstructorAssignment
+from components.models import (
+    db, User, roles_users, ProjectStudentAssignment, MilestoneSubmission, Milestone, ProjectInstructorAssignment
+)
 from components.extensions import datastore, bcrypt
+from components.statistics import refresh_project_statistics
 
 student_bp = Blueprint('student', __name__)
 
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))  # Passwords hashed at once by bulk uploads
+
 # BULK UPLOAD FORMAT
 # student_id,email,username,password
 # S001,student1@example.com,student1,password123
 # S002,student2@example.com,student2,password123
 
+def read_students(content):
+    """The rows of a tab separated student file with blank cells as empty strings and duplicate emails marked."""
+    csv_data = pd.read_csv(StringIO(content), sep="\t", dtype=str, keep_default_na=False)
+    csv_data.columns = csv_data.columns.str.strip()
+    for column in ('email', 'username', 'password'):
+        if column not in csv_data: csv_data[column] = ''
+    csv_data['email'] = csv_data['email'].str.strip()
+    csv_data['username'] = csv_data['username'].str.strip()
+    csv_data['duplicate'] = csv_data['email'].ne('') & csv_data['email'].duplicated()
+    return csv_data
+
+def hash_passwords(passwords):
+    # bcrypt releases the GIL, so the hashes of a large file are computed in parallel
+    if not passwords: return []
+    with ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS) as executor:
+        return [hashed.decode('utf-8') for hashed in executor.map(bcrypt.generate_password_hash, passwords)]
+
+def import_students(project_id, csv_data):
+    """Create, update and assign the students of csv_data in one transaction, returns a result per row.
+
+    Existing users and assignments are fetched in one query each and new rows
+    are inserted in bulk, so the number of queries does not grow with the file.
+    """
+    emails = [email for email in csv_data['email'].unique() if email]
+    users = {user.email: user for user in User.query.filter(User.email.in_(emails))} if emails else {}
+    usernames = [username for username in csv_data['username'].unique() if username]
+    taken = dict(db.session.query(User.username, User.email).filter(User.username.in_(usernames))) if usernames else {}
+    assigned = {student_id for student_id, in db.session.query(ProjectStudentAssignment.student_id).filter(
+        ProjectStudentAssignment.project_id == project_id,
+        ProjectStudentAssignment.student_id.in_([user.user_id for user in users.values()]))}
+
+    results, new_users, updates, to_hash = [], [], [], []
+    for index, row in enumerate(csv_data.to_dict('records'), start=1):
+        email, username, password = row['email'], row['username'], row['password']
+        result = {'row': index, 'email': email}
+        results.append(result)
+        user = users.get(email)
+        error = None
+        if not email: error = 'Email is missing'
+        elif row['duplicate']: error = 'Email appears earlier in the file'
+        elif user is None and (not username or not password): error = 'Username and password are required for new students'
+        elif username and taken.get(username, email) != email: error = f'Username {username} is taken'
+        if error:
+            results[-1] = {**result, 'status': 'failed', 'error': error}
+            continue
+        if username: taken[username] = email
+        if user is None:
+            new_users.append({'email': email, 'username': username, 'active': True, 'fs_uniquifier': uuid.uuid4().hex})
+            to_hash.append((new_users[-1], password))
+            result['status'] = 'created'
+            continue
+        update = {'user_id': user.user_id}
+        if username and username != user.username: update['username'] = username
+        if password: to_hash.append((update, password))
+        if len(update) > 1 or password: updates.append(update)
+        result['student_id'] = user.user_id
+        result['status'] = 'already_assigned' if user.user_id in assigned else 'assigned'
+        result['updated'] = len(update) > 1 or bool(password)
+
+    for mapping, hashed in zip([mapping for mapping, _ in to_hash], hash_passwords([password for _, password in to_hash])):
+        mapping['password'] = hashed
+    db.session.bulk_update_mappings(User, updates)
+    db.session.bulk_insert_mappings(User, new_users, return_defaults=True)
+    created = {mapping['email']: mapping['user_id'] for mapping in new_users}
+    student_role = datastore.find_role('Student')
+    if created:
+        db.session.execute(roles_users.insert(), [{'user_id': user_id, 'role_id': student_role.id} for user_id in created.values()])
+    for result in results:
+        if result['status'] == 'created': result['student_id'] = created[result['email']]
+    now = datetime.utcnow()
+    db.session.bulk_insert_mappings(ProjectStudentAssignment, [
+        {'project_id': project_id, 'student_id': result['student_id'], 'assigned_date': now}
+        for result in results if result['status'] in ('created', 'assigned')
+    ])
+    db.session.flush()
+    refresh_project_statistics(project_id)
+    return results
+
 @student_bp.route('/students/bulk-upload/<int:instructor_id>/<int:project_id>', methods=['POST'])
 @auth_required()
 @roles_accepted('Admin', 'Instructor')  # Only admin and instructor can access
@@ -28,35 +116,20 @@ def bulk_upload_students(instructor_id, project_id):
             
         # Read CSV file
         file_content = file.stream.read().decode("UTF-8").strip()
-        #print("File content:\n", repr(file_content))
-        csv_data = pd.read_csv(StringIO(file_content), sep="\t")
-        for _, row in csv_data.iterrows():
-            # Check if student already exists
-            existing_student = datastore.find_user(email=row['email'])
-            
-            if existing_student:
-                # Update associated user if email or username provided
-                if 'username' in row and row['username']:
-                    existing_student.username = row['username']
-                if 'password' in row and row['password']:
-                    existing_student.password = bcrypt.generate_password_hash(row['password'])
-                # Check if student is already assigned to project
-                existing_assignment = ProjectStudentAssignment.query.filter_by(project_id=project_id, student_id=existing_student.user_id).first()
-                if existing_assignment: continue
-                assignment = ProjectStudentAssignment(project_id=project_id, student_id=existing_student.user_id)
-                db.session.add(assignment)
-                db.session.commit()
-            else:
-                # Create new user
-                new_user = datastore.create_user(email=row['email'], username=row['username'], password=bcrypt.generate_password_hash(row['password']))
-                new_user.roles.append(datastore.find_role('Student'))
-                db.session.add(new_user)
-                db.session.commit()
-                assignment = ProjectStudentAssignment(project_id=project_id, student_id=new_user.user_id)
-                db.session.add(assignment)
-                db.session.commit()
-                
-        return jsonify({'message': 'Students uploaded successfully'}), 200
+        csv_data = read_students(file_content)
+        if not csv_data['email'].ne('').any(): return jsonify({'error': 'The file has no email column or no students'}), 400
+        # Every row is imported, or none is when the import fails
+        results = import_students(project_id, csv_data)
+        db.session.commit()
+        counts = Counter(result['status'] for result in results)
+        return jsonify({
+            'message': 'Students uploaded successfully',
+            'created': counts['created'],
+            'assigned': counts['assigned'],
+            'already_assigned': counts['already_assigned'],
+            'failed': counts['failed'],
+            'results': results,
+        }), 200
         
     except Exception as e:
         db.session.rollback()
@@ -98,6 +171,8 @@ def delete_student(instructor_id, project_id):
         assignment = ProjectStudentAssignment.query.filter_by(project_id=project_id, student_id=student.user_id).first()
         if not assignment: return jsonify({'error': 'Student not assigned to project'}), 404
         db.session.delete(assignment)
+        db.session.flush()
+        refresh_project_statistics(project_id, student_ids=[student.user_id])
         db.session.commit()
         
         return jsonify({'message': 'Student deleted successfully'}), 200
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify, abort
 from flask_security import auth_required
 from datetime import datetime
-from components.models import db, MilestoneSubmission
+from components.models import db, MilestoneSubmission, Milestone
+from components.statistics import refresh_project_statistics, record_daily_activity
 
 # Define a Blueprint for project operations
 student_submission_bp = Blueprint('submission', __name__)
@@ -48,6 +49,11 @@ def submit_milestone():
     })
     # Add and commit to the database
     db.session.add(new_submission)
+    db.session.flush()
+    record_daily_activity(new_submission.submission_date.date(), submissions=1)
+    milestone = Milestone.query.get(milestone_id)
+    if milestone:
+        refresh_project_statistics(milestone.project_id, student_ids=[student_id], milestone_ids=[milestone.milestone_id])
     db.session.commit()
 
     # After committing, the 'submission_id' will be auto-generated
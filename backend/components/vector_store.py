@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from components.retrieval import BM25Index
+from components.index_builder import INDEX_MODE, build_vector_store, tune
+
+INDEX_FOLDER = os.getenv("INDEX_FOLDER", "./indexes")  # One sub folder per document hash
+INDEX_MEMORY_BUDGET = int(os.getenv("INDEX_MEMORY_BUDGET", 512 * 1024 * 1024))  # Bytes of resident indexes
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"
+KEYWORD_FILE = "bm25.json"
+
+def document_hash(file_path):
+    """SHA-256 of a file's content, used as the key of its vector index."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class VectorIndexStore:
+    """FAISS indexes saved on disk by document hash.
+
+    Indexes are built once, memory-mapped when loaded again, and kept in an
+    LRU that evicts the least recently used ones past the memory budget. A
+    BM25 keyword index over the same chunks is saved next to each one and
+    loaded as the vector store's keyword_index.
+    """
+
+    def __init__(self, folder=INDEX_FOLDER, memory_budget=INDEX_MEMORY_BUDGET, index_mode=INDEX_MODE):
+        self.folder = folder
+        self.memory_budget = memory_budget
+        self.index_mode = index_mode  # auto picks flat, HNSW or IVF-PQ by the number of chunks
+        self.resident = OrderedDict()  # hash -> (vector store, size in bytes)
+        self.lock = threading.RLock()
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, doc_hash):
+        return os.path.join(self.folder, doc_hash)
+
+    def has_index(self, doc_hash):
+        return os.path.exists(os.path.join(self.path(doc_hash), CHUNKS_FILE))
+
+    def resident_size(self):
+        return sum(size for _, size in self.resident.values())
+
+    def build(self, doc_hash, documents, embedding):
+        """Embed documents, any iterable of chunks, into a new index, save it under doc_hash and keep it resident."""
+        vector_store = build_vector_store(documents, embedding, self.index_mode)
+        vector_store.keyword_index = BM25Index.build([
+            vector_store.docstore.search(vector_store.index_to_docstore_id[position]).page_content
+            for position in range(len(vector_store.index_to_docstore_id))])
+        self.save(doc_hash, vector_store)
+        with self.lock:
+            self.remember(doc_hash, vector_store, self.disk_size(doc_hash))
+        return vector_store
+
+    def save(self, doc_hash, vector_store):
+        # Write into a temporary folder first so readers never see a half written index
+        target = self.path(doc_hash)
+        temporary = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(temporary, exist_ok=True)
+        faiss.write_index(vector_store.index, os.path.join(temporary, INDEX_FILE))
+        chunks = []
+        for position in range(vector_store.index.ntotal):
+            document = vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+            chunks.append({"page_content": document.page_content, "metadata": document.metadata})
+        with open(os.path.join(temporary, CHUNKS_FILE), "w") as file:
+            json.dump(chunks, file)
+        keyword_index = getattr(vector_store, "keyword_index", None) or BM25Index.build([chunk["page_content"] for chunk in chunks])
+        with open(os.path.join(temporary, KEYWORD_FILE), "w") as file:
+            json.dump(keyword_index.to_dict(), file)
+        if os.path.exists(target):
+            shutil.rmtree(temporary)  # Another worker saved the same document first
+        else:
+            os.replace(temporary, target)
+
+    def load(self, doc_hash, embedding):
+        """The vector store for doc_hash, or None when it has not been built."""
+        with self.lock:
+            if doc_hash in self.resident:
+                self.resident.move_to_end(doc_hash)
+                return self.resident[doc_hash][0]
+            if not self.has_index(doc_hash): return None
+            folder = self.path(doc_hash)
+            index = tune(faiss.read_index(os.path.join(folder, INDEX_FILE), faiss.IO_FLAG_MMAP))
+            with open(os.path.join(folder, CHUNKS_FILE)) as file:
+                chunks = json.load(file)
+            docstore = InMemoryDocstore({str(i): Document(**chunk) for i, chunk in enumerate(chunks)})
+            vector_store = FAISS(embedding, index, docstore, {i: str(i) for i in range(len(chunks))})
+            vector_store.keyword_index = self.load_keyword_index(folder, chunks)
+            self.remember(doc_hash, vector_store, self.disk_size(doc_hash))
+            return vector_store
+
+    def load_keyword_index(self, folder, chunks):
+        path = os.path.join(folder, KEYWORD_FILE)
+        if os.path.exists(path):
+            with open(path) as file:
+                return BM25Index.from_dict(json.load(file))
+        # Indexes saved before keyword search existed
+        keyword_index = BM25Index.build([chunk["page_content"] for chunk in chunks])
+        with open(f"{path}.{os.getpid()}.tmp", "w") as file:
+            json.dump(keyword_index.to_dict(), file)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+        return keyword_index
+
+    def get_or_build(self, doc_hash, documents, embedding):
+        """Load the index for doc_hash, building it from documents() when missing."""
+        vector_store = self.load(doc_hash, embedding)
+        if vector_store is None:
+            vector_store = self.build(doc_hash, documents(), embedding)
+        return vector_store
+
+    def disk_size(self, doc_hash):
+        folder = self.path(doc_hash)
+        return sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder))
+
+    def remember(self, doc_hash, vector_store, size):
+        self.resident[doc_hash] = (vector_store, size)
+        self.resident.move_to_end(doc_hash)
+        # Evict least recently used indexes, always keeping the newest one
+        while len(self.resident) > 1 and self.resident_size() > self.memory_budget:
+            self.resident.popitem(last=False)
+
+index_store = VectorIndexStore()
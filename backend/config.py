@@ -1,6 +1,15 @@
+import os
+
 class Config(object):
     DEBUG = False
     TESTING = False
+    # Admin dashboard window, overridable with ?days=
+    DASHBOARD_WINDOW_DAYS = 7
+    DASHBOARD_MAX_WINDOW_DAYS = 366
+    # Days of daily commit counts in the project commit analytics, overridable with ?days=
+    COMMIT_ANALYTICS_WINDOW_DAYS = 30
+    # Load the embedding model in the background at startup
+    EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "true").lower() == "true"
 
 
 class DevelopmentConfig(Config):
@@ -1,3 +1,9 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
 import pytest
 from app import create_app
 
@@ -62,4 +68,79 @@ def test_1(admin_setup_data):
     response = client.get('http://localhost:5000/projects', headers={'Authentication-Token': f'invalid{token}'})
     assert response.status_code != 200, f"Unexpected status code: {response.status_code}"
     # Check if the response is as expected, a valid json response
-    assert response.headers.get('Content-Type') != 'application/json', "Response is not JSON" # This should be true
\ No newline at end of file
+    assert response.headers.get('Content-Type') != 'application/json', "Response is not JSON" # This should be true
+
+class FakeGitHub:
+    """Local stand in for the GitHub commits API, repos maps owner/repo to its commits, newest first.
+
+    Supports the per_page, page and since parameters, Link header pagination,
+    ETags, rate limit headers and failing requests.
+    """
+
+    def __init__(self):
+        self.repos = {}
+        self.requests = []  # (path, headers) of every request
+        self.failures = {}  # owner/repo -> statuses answered before its commits
+        self.rate_limit = None  # Requests left, sent in the rate limit headers when set
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests.append((self.path, dict(self.headers)))
+                path = urlparse(self.path).path.split('/')
+                repository = '/'.join(path[2:4])
+                if fake.rate_limit is not None:
+                    limits = {'X-RateLimit-Remaining': max(fake.rate_limit - 1, 0), 'X-RateLimit-Reset': int(time.time()) + 3600}
+                    if fake.rate_limit == 0: return self.reply(403, {"message": "API rate limit exceeded"}, limits)
+                    fake.rate_limit -= 1
+                if fake.failures.get(repository):
+                    return self.reply(fake.failures[repository].pop(0), {"message": "Server Error"})
+                if path[1:2] != ['repos'] or path[4:] != ['commits'] or repository not in fake.repos:
+                    return self.reply(404, {"message": "Not Found"})
+                query = parse_qs(urlparse(self.path).query)
+                commits = fake.repos[repository]
+                if 'since' in query:
+                    commits = [commit for commit in commits if commit['commit']['committer']['date'] >= query['since'][0]]
+                per_page, page = int(query.get('per_page', ['30'])[0]), int(query.get('page', ['1'])[0])
+                data = commits[(page - 1) * per_page:page * per_page]
+                headers = {'ETag': '"' + hashlib.sha1(json.dumps([data, len(commits)]).encode()).hexdigest() + '"'}
+                if page * per_page < len(commits):
+                    following = {**{name: values[0] for name, values in query.items()}, 'page': page + 1}
+                    headers['Link'] = f'<{fake.url}{urlparse(self.path).path}?{urlencode(following)}>; rel="next"'
+                if fake.rate_limit is not None: headers.update(limits)
+                if self.headers.get('If-None-Match') == headers['ETag']:
+                    return self.reply(304, None, headers)
+                self.reply(200, data, headers)
+
+            def reply(self, status, data, headers={}):
+                body = json.dumps(data).encode() if data is not None else b''
+                self.send_response(status)
+                for name, value in headers.items(): self.send_header(name, value)
+                if status != 304:
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def add_commits(self, repository, count, start=0):
+        """Add count commits on top of the history of repository."""
+        commits = [{
+            "sha": f"{repository.replace('/', '-')}-{number}",
+            "html_url": f"https://github.com/{repository}/commit/{number}",
+            "commit": {"committer": {"name": "Student", "date": f"2024-11-{1 + number // 24:02d}T{number % 24:02d}:00:00Z"}},
+        } for number in range(start, start + count)]
+        self.repos[repository] = commits[::-1] + self.repos.get(repository, [])
+
+@pytest.fixture
+def github_server():
+    server = FakeGitHub()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
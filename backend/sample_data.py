@@ -1,6 +1,7 @@
 from app import app, db
 from components.extensions import datastore, bcrypt
 from components.models import Project, ProjectStudentAssignment, ProjectInstructorAssignment, Milestone, MilestoneSubmission, ChatHistory
+from components.statistics import rebuild_statistics
 from datetime import date, timedelta
 
 with app.app_context():
@@ -122,10 +123,14 @@ with app.app_context():
                 ChatHistory(
                     project_id=j,
                     instructor_id=instructor_id,
-                    message_text=f"Message {j} for Project {j} by Instructor {i}<END>Reply {j} for Project {j}",
+                    question=f"Message {j} for Project {j} by Instructor {i}",
+                    answer=f"Reply {j} for Project {j}",
                 )
             )
     db.session.add_all(chat_histories)
     db.session.commit()
 
+    # Populate the materialized statistics
+    rebuild_statistics()
+
 print("Database seeded with sufficient data points!")
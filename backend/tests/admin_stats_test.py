@@ -0,0 +1,47 @@
+import json
+from components.statistics import verify_daily_activity
+
+
+def test_admin_dashboard_statistics(admin_setup_data):
+    token,client=admin_setup_data
+    headers={'Authentication-Token': f'{token}'}
+
+    response = client.get("/admin/dashboard/statistics", headers=headers)
+    assert response.status_code == 200
+    data = response.get_json()["data"]
+    assert data["window_days"] == 7
+    assert len(data["daily_submissions"]) == 7
+    assert data["milestones_completed_this_week"] == sum(day["count"] for day in data["daily_submissions"])
+    assert len(data["milestone_submission_stats"]) == 3
+
+
+def test_admin_dashboard_statistics_window(admin_setup_data):
+    token,client=admin_setup_data
+    headers={'Authentication-Token': f'{token}'}
+
+    response = client.get("/admin/dashboard/statistics?days=30", headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()["data"]["daily_submissions"]) == 30
+
+    # Invalid windows
+    for days in ["0", "-3", "1000", "abc"]:
+        response = client.get(f"/admin/dashboard/statistics?days={days}", headers=headers)
+        assert response.status_code == 400
+
+
+def test_daily_activity_tracks_submissions(app, admin_setup_data):
+    token,client=admin_setup_data
+    headers={'Authentication-Token': f'{token}'}
+
+    response = client.get("/admin/dashboard/statistics", headers=headers)
+    before = response.get_json()["data"]["milestones_completed_this_week"]
+    response = client.post(
+        "/submitmilestone",
+        data=json.dumps({"milestone_id": 12, "student_id": 7, "document_url": "http://example.com/document.pdf"}),
+        content_type="application/json",headers=headers)
+    assert response.status_code == 201
+
+    response = client.get("/admin/dashboard/statistics", headers=headers)
+    assert response.get_json()["data"]["milestones_completed_this_week"] == before + 1
+    with app.app_context():
+        assert verify_daily_activity() == []
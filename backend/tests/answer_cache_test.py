@@ -0,0 +1,48 @@
+from components.answer_cache import AnswerCache, normalize_question
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class KeywordEmbedding:
+    """Questions about the same keyword get the same direction."""
+    def embed_query(self, text):
+        return [1.0, 0.1] if "summary" in text or "summarise" in text else [0.0, 1.0]
+
+
+def test_normalized_questions_share_an_entry():
+    cache = AnswerCache(similarity=0)
+    cache.put("doc", "What is the summary of the document ?", "A tracker")
+    assert normalize_question("  what is the SUMMARY of the document?") == "what is the summary of the document"
+    assert cache.get("doc", "what is the summary   of the document?") == "A tracker"
+    assert cache.get("other", "What is the summary of the document ?") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+
+
+def test_similar_question_reuses_answer():
+    cache = AnswerCache(similarity=0.95, embedding=KeywordEmbedding())
+    cache.put("doc", "What is the summary of the document ?", "A tracker")
+    assert cache.get("doc", "Please summarise the document") == "A tracker"
+    assert cache.get("doc", "Who are the users?") is None
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_entries_expire_and_least_recently_used_is_evicted():
+    clock = Clock()
+    cache = AnswerCache(max_entries=2, ttl=10, similarity=0, clock=clock)
+    cache.put("doc", "first", "1")
+    cache.put("doc", "second", "2")
+    cache.get("doc", "first")
+    cache.put("doc", "third", "3")
+    assert cache.get("doc", "second") is None
+    assert cache.get("doc", "first") == "1"
+    clock.now = 11
+    assert cache.get("doc", "third") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["expirations"] == 1
@@ -0,0 +1,28 @@
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from components.chains import ChainFactory
+
+TEMPLATE = """Context: {context}
+    Question: {question}
+    """
+
+
+def vector_store():
+    return FAISS.from_texts(["Students build a project tracker. It has dashboards."], DeterministicFakeEmbedding(size=16))
+
+
+def test_chains_share_client_but_not_memory():
+    factory = ChainFactory(backend="local")
+    store = vector_store()
+    first, second = factory.chain(store, TEMPLATE), factory.chain(store, TEMPLATE)
+    assert first.combine_documents_chain.llm_chain.llm is second.combine_documents_chain.llm_chain.llm
+    assert first.memory is not second.memory
+    assert factory.llm(max_length=800) is not factory.llm()
+    assert factory.stats() == {"clients_created": 2, "chains_built": 2, "backend": "local", "clients": 2}
+
+
+def test_local_backend_answers_offline():
+    factory = ChainFactory(backend="local")
+    assert factory.chain(vector_store(), TEMPLATE).run("What is built?") == "Answer: Students build a project tracker"
+    milestones = ''.join(factory.llm().stream("Number of Milestones : 2"))
+    assert milestones.count("*** Title:") == 2 and milestones.count("END") == 2
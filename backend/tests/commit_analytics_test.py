@@ -0,0 +1,51 @@
+from datetime import date
+from components.models import db, Commit, CommitSyncState, CommitDailyCount, CommitStatistics, Milestone, RepositoryCache
+from components.commit_sync import CommitSync
+from components.commit_analytics import streaks, project_commit_analytics, rebuild_commit_analytics
+
+
+def test_streaks():
+    days = [date(2024, 11, 1), date(2024, 11, 2), date(2024, 11, 3), date(2024, 11, 7), date(2024, 11, 8)]
+    assert streaks(days) == (2, 3)
+    assert streaks([]) == (0, 0)
+
+
+def test_sync_refreshes_the_commit_rollups(app, admin_setup_data, github_server):
+    token,client=admin_setup_data
+    # 24 commits on November 1st and 6 on the 2nd
+    github_server.add_commits("Risdorn/Walmart-Workshop", 30)
+    with app.app_context():
+        milestone = Milestone(project_id=1, title="Analytics checkpoint", start_date=date(2024, 11, 1), end_date=date(2024, 11, 1))
+        db.session.add(milestone)
+        db.session.commit()
+        milestone_id = milestone.milestone_id
+        try:
+            CommitSync(api_url=github_server.url).sync("https://github.com/Risdorn/Walmart-Workshop")
+            statistics = db.session.get(CommitStatistics, (1, 7))
+            assert (statistics.total_commits, statistics.active_days, statistics.latest_streak) == (30, 2, 2)
+
+            analytics = project_commit_analytics(1, date(2024, 11, 3), 7)
+            student = next(student for student in analytics["students"] if student["student_id"] == 7)
+            assert student["daily_commits"] == {"2024-11-01": 24, "2024-11-02": 6}
+            assert student["current_streak"] == 2
+            checkpoint = next(entry for entry in student["milestones"] if entry["milestone_id"] == milestone_id)
+            assert (checkpoint["commits_before_deadline"], checkpoint["commits_during"]) == (24, 24)
+            # Streaks end once a day passes without commits
+            assert next(s for s in project_commit_analytics(1, date(2024, 11, 5), 7)["students"] if s["student_id"] == 7)["current_streak"] == 0
+
+            CommitDailyCount.query.filter_by(project_id=1).delete()
+            rebuild_commit_analytics()
+            assert CommitDailyCount.query.filter_by(project_id=1, student_id=7).count() == 2
+
+            response = client.get('/commit_history/project/1/analytics?days=30', headers={'Authentication-Token': token})
+            assert response.status_code == 200
+            assert next(s for s in response.json["students"] if s["student_id"] == 7)["total_commits"] == 30
+            assert client.get('/commit_history/project/1/analytics?days=0', headers={'Authentication-Token': token}).status_code == 400
+        finally:
+            db.session.delete(db.session.get(Milestone, milestone_id))
+            Commit.query.filter_by(project_id=1, student_id=7).delete()
+            CommitSyncState.query.filter_by(project_id=1, student_id=7).delete()
+            CommitDailyCount.query.filter_by(project_id=1, student_id=7).delete()
+            CommitStatistics.query.filter_by(project_id=1, student_id=7).delete()
+            RepositoryCache.query.delete()
+            db.session.commit()
@@ -0,0 +1,89 @@
+import random
+import threading
+import pytest
+from components.models import db, Commit, CommitSyncState, CommitSyncRun, RepositoryCache
+from components.commit_sync import CommitSync
+from components.commit_scheduler import BulkCommitSync, CommitSyncScheduler
+
+
+@pytest.fixture
+def clean_commits(app):
+    yield
+    with app.app_context():
+        Commit.query.filter_by(project_id=1, student_id=7).delete()
+        CommitSyncState.query.filter_by(project_id=1, student_id=7).delete()
+        CommitSyncRun.query.delete()
+        RepositoryCache.query.delete()
+        db.session.commit()
+
+
+def test_bulk_sync_retries_with_jitter_and_reports_failures(app, github_server, clean_commits):
+    github_server.add_commits("ok/repo", 2)
+    github_server.add_commits("flaky/repo", 1)
+    github_server.failures["flaky/repo"] = [502, 503]
+    sleeps = []
+    bulk = BulkCommitSync(sync=CommitSync(api_url=github_server.url), workers=2, sleep=sleeps.append, rng=random.Random(0))
+    report = bulk.run(app, ["https://github.com/ok/repo", "https://github.com/flaky/repo", "https://github.com/missing/repo"])
+    assert (report["repositories"], report["synced"], report["failed"], report["new_commits"]) == (3, 2, 1, 3)
+    assert [(failure["repository"], failure["status"]) for failure in report["failures"]] == [("missing/repo", "failed")]
+    # The missing repository is not retried, the flaky one backs off within a doubling window
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 2 and 0 <= sleeps[1] <= 4
+
+
+def test_exhausted_rate_limit_defers_the_rest_of_the_run(app, github_server, clean_commits):
+    for name in ("first", "second", "third"): github_server.add_commits(f"{name}/repo", 1)
+    github_server.rate_limit = 2
+    sync = CommitSync(api_url=github_server.url)
+    bulk = BulkCommitSync(sync=sync, workers=1, reserve=0, sleep=lambda seconds: None)
+    report = bulk.run(app, [f"https://github.com/{name}/repo" for name in ("first", "second", "third")])
+    assert (report["synced"], report["deferred"]) == (2, 1)
+    assert report["failures"][0]["github_url"] == "https://github.com/third/repo"
+    assert len(github_server.requests) == 2
+    # Page views are not sent to GitHub either, they serve what is stored
+    assert sync.rate_limit_wait() > 0
+
+
+def test_scheduled_run_stores_its_report(app, admin_setup_data, github_server, clean_commits):
+    token,client=admin_setup_data
+    github_server.add_commits("ok/repo", 1)
+    scheduler = CommitSyncScheduler(bulk=BulkCommitSync(sync=CommitSync(api_url=github_server.url)))
+    scheduler.app = app
+    report = scheduler.run_once(repositories=["https://github.com/ok/repo", "https://github.com/missing/repo"])
+    assert (report["status"], report["synced"], report["failed"]) == ("completed", 1, 1)
+    # The next run is not due yet, unless forced
+    assert scheduler.run_once(repositories=[]) is None
+    assert scheduler.run_once(force=True, repositories=[])["repositories"] == 0
+
+    response = client.get('/commit_history/sync/report', headers={'Authentication-Token': token})
+    assert response.status_code == 200
+    assert response.json["run_id"] == report["run_id"] + 1
+
+
+def test_sync_commits_command(app, github_server, monkeypatch, clean_commits):
+    github_server.add_commits("Risdorn/Walmart-Workshop", 2)
+    scheduler = CommitSyncScheduler(bulk=BulkCommitSync(sync=CommitSync(api_url=github_server.url)))
+    scheduler.app = app
+    monkeypatch.setattr("components.commit_scheduler.commit_scheduler", scheduler)
+    result = app.test_cli_runner().invoke(args=['sync-commits'])
+    assert result.exit_code == 0, result.output
+    assert "Synced 1 of 1 repositories, 2 new commits, 0 failed, 0 deferred" in result.output
+
+
+def test_concurrent_claims_start_one_run(app, clean_commits):
+    scheduler = CommitSyncScheduler(interval=0)
+    for _ in range(5):
+        barrier = threading.Barrier(2)
+        claims = []
+        def claim():
+            with app.app_context():
+                barrier.wait()
+                run = scheduler.claim(force=True)
+                claims.append(run.run_id if run else None)
+        threads = [threading.Thread(target=claim) for _ in range(2)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        assert len([run_id for run_id in claims if run_id]) == 1
+        with app.app_context():
+            assert CommitSyncRun.query.count() == 1
+            CommitSyncRun.query.delete()
+            db.session.commit()
@@ -0,0 +1,246 @@
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+import pytest
+from components.models import (
+    db, Commit, CommitSyncState, CommitDailyCount, CommitStatistics, ProjectStudentAssignment, RepositoryCache
+)
+from components.commit_sync import CommitSync
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2024, 12, 1)
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clean_commits(app):
+    yield
+    with app.app_context():
+        for model in (Commit, CommitSyncState, CommitDailyCount, CommitStatistics, ProjectStudentAssignment):
+            model.query.filter(model.project_id >= 900).delete()
+        RepositoryCache.query.delete()
+        db.session.commit()
+
+def link(project_id, github_url, student_id=7):
+    db.session.add(ProjectStudentAssignment(project_id=project_id, student_id=student_id, github_url=github_url))
+    db.session.commit()
+
+def stored(project_id, student_id=7):
+    return Commit.query.filter_by(project_id=project_id, student_id=student_id).count()
+
+
+def test_first_sync_walks_every_page_and_later_ones_only_new_commits(app, github_server, clean_commits):
+    github_server.add_commits("paged/repo", 250)
+    clock = Clock()
+    sync = CommitSync(api_url=github_server.url, clock=clock)
+    with app.app_context():
+        link(900, "https://github.com/paged/repo")
+        assert sync.sync("https://github.com/paged/repo") == 250
+        assert stored(900) == 250
+        assert [parse_qs(urlparse(path).query).get('page', ['1'])[0] for path, _ in github_server.requests] == ['1', '2', '3']
+
+        github_server.add_commits("paged/repo", 3, start=250)
+        github_server.requests.clear()
+        assert sync.sync("https://github.com/paged/repo") == 3
+        path, headers = github_server.requests[0]
+        assert len(github_server.requests) == 1
+        assert parse_qs(urlparse(path).query)['since'] == ['2024-11-11T09:00:00Z']
+        assert stored(900) == 253
+
+        # Nothing new, once the ETag for the new since is known the request is conditional
+        assert sync.sync("https://github.com/paged/repo") == 0
+        assert 'If-None-Match' not in github_server.requests[-1][1]
+        assert sync.sync("https://github.com/paged/repo") == 0
+        assert github_server.requests[-1][1]['If-None-Match'] == db.session.get(RepositoryCache, "paged/repo").etag
+        assert stored(900) == 253
+
+
+def test_shared_repository_is_fetched_once_for_every_student(app, github_server, clean_commits):
+    github_server.add_commits("team/repo", 3)
+    sync = CommitSync(api_url=github_server.url)
+    with app.app_context():
+        link(905, "https://github.com/team/repo")
+        link(905, "https://github.com/Team/Repo.git", student_id=8)
+        assert sync.sync("https://github.com/team/repo") == 3
+        assert len(github_server.requests) == 1
+        assert (stored(905), stored(905, 8)) == (3, 3)
+        assert CommitStatistics.query.filter_by(project_id=905).count() == 2
+
+        # A student who links it later gets a copy, GitHub is only asked for the new commits
+        link(906, "https://github.com/team/repo")
+        github_server.add_commits("team/repo", 1, start=3)
+        assert sync.ensure_synced(906, 7, "https://github.com/team/repo")
+        assert len(github_server.requests) == 2
+        assert 'since' in parse_qs(urlparse(github_server.requests[-1][0]).query)
+        assert (stored(905), stored(905, 8), stored(906)) == (4, 4, 4)
+
+
+def test_sync_overlapping_another_stores_each_commit_once(app, github_server, clean_commits):
+    github_server.add_commits("race/repo", 3)
+    sync, other = CommitSync(api_url=github_server.url), CommitSync(api_url=github_server.url)
+    request, results = sync.cache.request, []
+
+    def request_while_another_syncs(*args, **kwargs):
+        # Another worker syncs the repository while this one waits for GitHub
+        def run():
+            with app.app_context():
+                results.append(other.sync("https://github.com/race/repo"))
+        if not results:
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join()
+        return request(*args, **kwargs)
+
+    sync.cache.request = request_while_another_syncs
+    with app.app_context():
+        link(907, "https://github.com/race/repo")
+        assert sync.sync("https://github.com/race/repo") == 3
+        assert results == [3] and stored(907) == 3
+        assert RepositoryCache.query.filter_by(repository="race/repo").count() == 1
+
+        # Copies onto rows a concurrent sync stored already keep each commit once
+        link(907, "https://github.com/race/repo", student_id=8)
+        sync.copy((907, 7), (907, 8))
+        sync.copy((907, 7), (907, 8))
+        db.session.commit()
+        assert stored(907, 8) == 3
+
+
+def test_concurrent_syncs_of_a_repository_take_turns(app, github_server, clean_commits):
+    github_server.add_commits("turns/repo", 3)
+    sync = CommitSync(api_url=github_server.url)
+    fetch, fetching, overlapped = sync.cache.fetch, threading.Semaphore(1), []
+    started = threading.Event()
+
+    def slow_fetch(repository, full=False):
+        if not fetching.acquire(blocking=False): overlapped.append(repository)
+        started.set()
+        try:
+            threading.Event().wait(0.2)
+            return fetch(repository, full)
+        finally:
+            fetching.release()
+
+    sync.cache.fetch = slow_fetch
+    results = []
+    def scheduled():
+        with app.app_context():
+            results.append(sync.sync("https://github.com/turns/repo"))
+
+    with app.app_context():
+        link(908, "https://github.com/turns/repo")
+        thread = threading.Thread(target=scheduled)
+        thread.start()
+        started.wait(5)
+        # A request for the history while the scheduled sync runs waits for it, then asks only for what is new
+        assert sync.ensure_synced(908, 7, "https://github.com/turns/repo")
+        thread.join()
+        assert overlapped == [] and results == [3]
+        assert stored(908) == 3
+        assert [parse_qs(urlparse(path).query).get('since') for path, _ in github_server.requests] == [None, ['2024-11-01T02:00:00Z']]
+
+
+def test_stale_history_is_served_while_syncing(app, github_server, clean_commits):
+    github_server.add_commits("stale/repo", 1)
+    clock = Clock()
+    sync = CommitSync(api_url=github_server.url, ttl=60, stale=600, clock=clock)
+    with app.app_context():
+        link(901, "https://github.com/stale/repo")
+        assert sync.ensure_synced(901, 7, "https://github.com/stale/repo")
+        assert sync.ensure_synced(901, 7, "https://github.com/stale/repo")
+        assert len(github_server.requests) == 1
+
+        github_server.add_commits("stale/repo", 1, start=1)
+        clock.now += timedelta(seconds=120)
+        assert sync.ensure_synced(901, 7, "https://github.com/stale/repo")
+        sync.executor.shutdown(wait=True)
+        db.session.expire_all()
+        assert stored(901) == 2
+
+
+def test_failed_sync_serves_the_stored_history(app, github_server, clean_commits):
+    github_server.add_commits("failing/repo", 1)
+    clock = Clock()
+    sync = CommitSync(api_url=github_server.url, ttl=60, stale=0, clock=clock)
+    with app.app_context():
+        link(902, "https://github.com/failing/repo")
+        link(904, "https://github.com/missing/repo")
+        assert not sync.ensure_synced(904, 7, "https://github.com/missing/repo")
+        assert sync.ensure_synced(902, 7, "https://github.com/failing/repo")
+        del github_server.repos["failing/repo"]
+        clock.now += timedelta(seconds=61)
+        assert sync.ensure_synced(902, 7, "https://github.com/failing/repo")
+        assert stored(902) == 1
+
+
+def test_new_repository_replaces_the_history(app, github_server, clean_commits):
+    github_server.add_commits("old/repo", 2)
+    github_server.add_commits("new/repo", 1)
+    sync = CommitSync(api_url=github_server.url)
+    with app.app_context():
+        link(903, "https://github.com/old/repo")
+        sync.sync("https://github.com/old/repo")
+        ProjectStudentAssignment.query.filter_by(project_id=903).update({"github_url": "https://github.com/new/repo"})
+        sync.sync("https://github.com/new/repo")
+        assert [commit.sha for commit in Commit.query.filter_by(project_id=903)] == ["new-repo-0"]
+
+
+def test_commit_history_is_paged_from_the_commits_table(app, admin_setup_data, github_server, monkeypatch):
+    token,client=admin_setup_data
+    headers={'Authentication-Token': token}
+    github_server.add_commits("Risdorn/Walmart-Workshop", 5)
+    monkeypatch.setattr("components.commit_history.commit_sync", CommitSync(api_url=github_server.url))
+    try:
+        first = client.get("/commit_history/7/1?limit=3", headers=headers).json
+        assert first["total_commits"] == 5
+        assert [commit["sha"] for commit in first["commit_history"]] == [
+            "Risdorn-Walmart-Workshop-4", "Risdorn-Walmart-Workshop-3", "Risdorn-Walmart-Workshop-2"]
+        second = client.get(f"/commit_history/7/1?limit=3&before={first['next_before']}", headers=headers).json
+        assert [commit["sha"] for commit in second["commit_history"]] == ["Risdorn-Walmart-Workshop-1", "Risdorn-Walmart-Workshop-0"]
+        assert second["next_before"] is None
+        assert len(github_server.requests) == 1
+        assert client.get("/commit_history/7/1?limit=0", headers=headers).status_code == 400
+    finally:
+        with app.app_context():
+            for model in (Commit, CommitSyncState, CommitDailyCount, CommitStatistics):
+                model.query.filter_by(project_id=1, student_id=7).delete()
+            RepositoryCache.query.delete()
+            db.session.commit()
+
+
+def test_project_commit_history_syncs_every_student_at_once(app, admin_setup_data, github_server, monkeypatch):
+    token,client=admin_setup_data
+    headers={'Authentication-Token': token}
+    github_server.add_commits("Risdorn/Walmart-Workshop", 3)
+    monkeypatch.setattr("components.commit_history.commit_sync", CommitSync(api_url=github_server.url))
+    with app.app_context():
+        assignment = ProjectStudentAssignment(project_id=1, student_id=8, github_url="https://github.com/missing/repo")
+        db.session.add(assignment)
+        db.session.commit()
+        assignment_id = assignment.assignment_id
+    try:
+        response = client.get("/commit_history/project/1?commits=2", headers=headers)
+        assert response.status_code == 200
+        students = {student["student_id"]: student for student in response.json["students"]}
+        assert (students[7]["sync"], students[7]["total_commits"]) == ("synced", 3)
+        assert [commit["sha"] for commit in students[7]["commits"]] == ["Risdorn-Walmart-Workshop-2", "Risdorn-Walmart-Workshop-1"]
+        assert (students[8]["sync"], students[8]["total_commits"]) == ("failed", 0)
+        assert "404" in students[8]["error"]
+
+        # Synced histories are fresh, only the failed one is asked again
+        github_server.requests.clear()
+        students = {student["student_id"]: student for student in client.get("/commit_history/project/1", headers=headers).json["students"]}
+        assert students[7]["sync"] == "fresh" and "commits" not in students[7]
+        assert [urlparse(path).path for path, _ in github_server.requests] == ["/repos/missing/repo/commits"]
+        assert client.get("/commit_history/project/1?commits=101", headers=headers).status_code == 400
+    finally:
+        with app.app_context():
+            db.session.delete(db.session.get(ProjectStudentAssignment, assignment_id))
+            for model in (Commit, CommitSyncState, CommitDailyCount, CommitStatistics):
+                model.query.filter_by(project_id=1).delete()
+            RepositoryCache.query.delete()
+            db.session.commit()
@@ -0,0 +1,73 @@
+import threading
+from datetime import datetime
+from components.models import db, ChatHistory, ConversationSummary
+from components.conversation import conversation_history
+
+
+def add_turns(numbers):
+    db.session.add_all([ChatHistory(project_id=1, instructor_id=999, question=f"Question {n}", answer=f"Answer {n}",
+                                    message_timestamp=datetime(2031, 1, 1, 12, n)) for n in numbers])
+    db.session.commit()
+
+def test_older_turns_are_folded_into_a_rolling_summary(app):
+    calls = []
+    def summarize(summary, turns):
+        calls.append((summary, [turn.question for turn in turns]))
+        return f"{summary} covered {turns[-1].question}".strip()
+
+    with app.app_context():
+        try:
+            add_turns(range(7))
+            history = conversation_history(1, 999, summarize, turns=2)
+            # Turns before the window are left out, the oldest half of the window is summarized
+            assert calls == [("", ["Question 3", "Question 4"])]
+            assert history == ("Summary of the earlier conversation: covered Question 4\n"
+                               "Instructor: Question 5\nAssistant: Answer 5\nInstructor: Question 6\nAssistant: Answer 6")
+
+            # The summary is reused until the window fills up again
+            conversation_history(1, 999, summarize, turns=2)
+            assert len(calls) == 1
+            add_turns([7, 8])
+            history = conversation_history(1, 999, summarize, turns=2)
+            assert calls[1] == ("covered Question 4", ["Question 5", "Question 6"])
+            assert history.startswith("Summary of the earlier conversation: covered Question 4 covered Question 6\nInstructor: Question 7")
+
+            # A failed summary quotes the whole window and keeps the old summary
+            add_turns([9, 10])
+            def failing(summary, turns): raise RuntimeError("model failed")
+            history = conversation_history(1, 999, failing, turns=2)
+            assert "Question 7" in history and "Question 10" in history
+            assert db.session.get(ConversationSummary, (1, 999)).summarized_chat_id == \
+                ChatHistory.query.filter_by(instructor_id=999, question="Question 6").one().chat_id
+        finally:
+            ChatHistory.query.filter_by(instructor_id=999).delete()
+            ConversationSummary.query.filter_by(instructor_id=999).delete()
+            db.session.commit()
+
+def test_concurrent_summaries_of_a_conversation_do_not_conflict(app):
+    def summarize(summary, turns):
+        # Another request for the same conversation saves its summary first
+        def other():
+            with app.app_context():
+                conversation_history(1, 999, lambda summary, turns: "other summary", turns=2)
+        thread = threading.Thread(target=other)
+        thread.start()
+        thread.join()
+        return "this summary"
+
+    with app.app_context():
+        try:
+            add_turns(range(4))
+            history = conversation_history(1, 999, summarize, turns=2)
+            assert history.startswith("Summary of the earlier conversation: this summary")
+            # Both folded the same turns, the summary saved first stands
+            db.session.expire_all()
+            assert db.session.get(ConversationSummary, (1, 999)).summary == "other summary"
+        finally:
+            ChatHistory.query.filter_by(instructor_id=999).delete()
+            ConversationSummary.query.filter_by(instructor_id=999).delete()
+            db.session.commit()
+
+def test_no_history_without_turns(app):
+    with app.app_context():
+        assert conversation_history(1, 999, lambda summary, turns: "unused") == ""
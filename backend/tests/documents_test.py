@@ -0,0 +1,49 @@
+import io
+from components.models import ProjectDocument
+from components.documents import latest_document
+
+PDF = "uploads/Milestone-1_User_stories.pdf"
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.jobs = []
+
+    def enqueue(self, file_path, content_hash):
+        self.jobs.append((file_path, content_hash))
+        return None
+
+
+def upload(client, url, data):
+    return client.post(url, data=data, content_type='multipart/form-data', headers={'Accept': 'application/json'})
+
+
+def test_upload_registers_project_document(app, admin_setup_data, monkeypatch, tmp_path):
+    token,client=admin_setup_data
+    queue = RecordingQueue()
+    monkeypatch.setattr("components.documents.ingestion_queue", queue)
+    monkeypatch.setattr("components.documents.UPLOAD_FOLDER", str(tmp_path))
+    content = open(PDF, "rb").read()
+
+    response = upload(client, "/upload/1", {'document': (io.BytesIO(content), 'spec.pdf')})
+    assert response.status_code == 202
+    first_id = response.get_json()["document_id"]
+    response = upload(client, "/upload", {'document': (io.BytesIO(content), 'copy.pdf'), 'project_id': '2'})
+    assert response.status_code == 202
+    second_id = response.get_json()["document_id"]
+
+    with app.app_context():
+        first, second = ProjectDocument.query.get(first_id), ProjectDocument.query.get(second_id)
+        assert latest_document(1).document_id == first_id
+        assert latest_document(2).document_id == second_id
+        # Same content is stored once and shares one index
+        assert first.content_hash == second.content_hash
+        assert first.file_path == second.file_path
+
+
+def test_upload_requires_project(admin_setup_data):
+    token,client=admin_setup_data
+    response = upload(client, "/upload", {'document': (io.BytesIO(b"%PDF"), 'spec.pdf')})
+    assert response.status_code == 400
+    response = upload(client, "/upload/999999", {'document': (io.BytesIO(b"%PDF"), 'spec.pdf')})
+    assert response.status_code == 404
@@ -0,0 +1,44 @@
+import threading
+import numpy as np
+from components.embedding import EmbeddingService
+
+
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size=None, convert_to_numpy=True):
+        self.batches.append(len(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts])
+
+
+def test_model_loaded_once_across_threads():
+    loads = []
+    def loader(name):
+        loads.append(name)
+        return FakeModel()
+    service = EmbeddingService(model_name="fake", loader=loader)
+    threads = [threading.Thread(target=service.embed_query, args=("question",)) for _ in range(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert loads == ["fake"]
+    assert service.stats()["model_loads"] == 1
+    assert service.stats()["queries"] == 8
+
+
+def test_embed_documents_in_batches():
+    service = EmbeddingService(model_name="fake", batch_size=4, loader=lambda name: FakeModel())
+    vectors = service.embed_documents([f"chunk {i}" for i in range(10)])
+    assert len(vectors) == 10
+    assert vectors[0] == [7.0, 1.0]
+    assert service.model.batches == [4, 4, 2]
+    stats = service.stats()
+    assert stats["batches"] == 3
+    assert stats["texts_encoded"] == 10
+
+
+def test_warm_up_loads_model():
+    service = EmbeddingService(model_name="fake", loader=lambda name: FakeModel())
+    assert not service.stats()["model_loaded"]
+    service.warm_up_in_background().join()
+    assert service.stats()["model_loaded"]
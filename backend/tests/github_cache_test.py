@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+import pytest
+from components.models import db, RepositoryCache
+from components.github_cache import CommitHistoryCache, GitHubError, parse_repository, repository_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2024, 12, 1)
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clean_cache(app):
+    yield
+    with app.app_context():
+        RepositoryCache.query.delete()
+        db.session.commit()
+
+
+def test_parse_repository():
+    assert parse_repository("https://github.com/Owner/Repo.git/") == "Owner/Repo"
+    assert parse_repository("repo") is None
+    assert repository_key("https://github.com/Owner/Repo.git/") == "owner/repo"
+
+
+def test_repository_is_cached_and_revalidated_with_etag(app, github_server, clean_cache):
+    github_server.add_commits("cached/repo", 2)
+    clock = Clock()
+    cache = CommitHistoryCache(api_url=github_server.url, ttl=60, stale=600, clock=clock)
+    with app.app_context():
+        assert cache.freshness("cached/repo") == "missing"
+        assert [item["sha"] for item in cache.fetch("cached/repo")] == ["cached-repo-1", "cached-repo-0"]
+        db.session.commit()
+        assert cache.freshness("Cached/Repo") == "fresh"
+
+        # An unchanged repository answers 304 to the ETag of the last fetch
+        assert cache.fetch("cached/repo") == []
+        assert cache.fetch("cached/repo") == []
+        path, headers = github_server.requests[-1]
+        assert headers["If-None-Match"] == db.session.get(RepositoryCache, "cached/repo").etag
+
+        clock.now += timedelta(seconds=120)
+        assert cache.freshness("cached/repo") == "stale"
+        clock.now += timedelta(seconds=600)
+        assert cache.freshness("cached/repo") == "expired"
+
+        # A full fetch starts over without the ETag
+        github_server.add_commits("cached/repo", 1, start=2)
+        assert len(cache.fetch("cached/repo", full=True)) == 3
+        assert "If-None-Match" not in github_server.requests[-1][1]
+
+
+def test_missing_repository_raises(app, github_server, clean_cache):
+    cache = CommitHistoryCache(api_url=github_server.url)
+    with app.app_context():
+        with pytest.raises(GitHubError) as error:
+            cache.fetch("missing/repo")
+        assert error.value.status == 404
+        db.session.rollback()
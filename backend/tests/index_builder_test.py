@@ -0,0 +1,56 @@
+import faiss
+import numpy as np
+import pytest
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.documents import Document
+from components.index_builder import INDEX_MODES, build_index, build_vector_store, choose_mode, factory_string
+from components.vector_store import VectorIndexStore
+
+
+def vectors(count=2000, dimension=32):
+    generator = np.random.default_rng(0)
+    return generator.normal(size=(count, dimension)).astype(np.float32)
+
+
+def test_mode_follows_corpus_size():
+    assert choose_mode(100, "auto") == "flat"
+    assert choose_mode(100000, "auto") == "hnsw"
+    assert choose_mode(1000000, "auto") == "ivfpq"
+    assert choose_mode(100, "ivfsq8") == "ivfsq8"
+    assert factory_string("ivfpq", 1000000, 384) == "IVF4000,PQ48x8"
+
+
+@pytest.mark.parametrize("mode", INDEX_MODES)
+def test_every_mode_finds_stored_vectors(mode):
+    data = vectors()
+    index = build_index(data, mode)
+    _, found = index.search(data[:50], 10)
+    recall = np.mean([position in row for position, row in enumerate(found)])
+    assert recall >= (0.5 if mode == "ivfpq" else 0.9)
+    # Vectors can be reconstructed, which maximal marginal relevance search needs
+    assert index.reconstruct(3).shape == (32,)
+
+
+def test_chunks_are_embedded_in_batches_as_they_are_read():
+    class CountingEmbedding(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            batches.append(len(texts))
+            return super().embed_documents(texts)
+    batches = []
+    documents = (Document(page_content=f"chunk {number}") for number in range(25))
+    vector_store = build_vector_store(documents, CountingEmbedding(size=16), "flat", batch_size=10)
+    assert batches == [10, 10, 5]
+    assert vector_store.index.ntotal == 25
+    assert vector_store.docstore.search(vector_store.index_to_docstore_id[24]).page_content == "chunk 24"
+
+
+def test_saved_quantized_index_is_loaded_and_tuned(tmp_path):
+    embedding = DeterministicFakeEmbedding(size=32)
+    documents = [Document(page_content=f"chunk {number}") for number in range(400)]
+    VectorIndexStore(folder=str(tmp_path), index_mode="ivfsq8").build("doc", documents, embedding)
+
+    vector_store = VectorIndexStore(folder=str(tmp_path)).load("doc", embedding)
+    ivf = faiss.extract_index_ivf(vector_store.index)
+    assert ivf.nprobe > 1
+    assert vector_store.similarity_search("chunk 7", k=1)[0].page_content == "chunk 7"
+    assert len(vector_store.max_marginal_relevance_search("chunk 7", k=3, fetch_k=10)) == 3
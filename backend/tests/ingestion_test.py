@@ -0,0 +1,71 @@
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from components.models import db, IngestionJob, ProjectDocument, RetrievalSettings
+from components.retrieval import index_key
+from components.vector_store import VectorIndexStore, document_hash
+from components.ingestion import IngestionQueue
+from components.pdf_extraction import iter_pages
+
+PDF = "uploads/Milestone-1_User_stories.pdf"
+
+
+def test_ingest_document_in_background(app, tmp_path):
+    store = VectorIndexStore(folder=str(tmp_path))
+    queue = IngestionQueue(workers=1, store=store, embedding=DeterministicFakeEmbedding(size=16))
+    queue.app = app
+    content_hash = document_hash(PDF)
+    with app.app_context():
+        job = queue.enqueue(PDF, content_hash)
+        job_id = job.job_id
+    queue.executor.shutdown(wait=True)
+
+    with app.app_context():
+        job = db.session.get(IngestionJob, job_id)
+        assert job.status == 'completed', job.error
+        assert job.pages_total == job.pages_done == 8
+        assert job.chunks > 0
+    assert store.has_index(content_hash)
+
+
+def test_failed_ingestion_is_reported(app, tmp_path):
+    queue = IngestionQueue(workers=1, store=VectorIndexStore(folder=str(tmp_path)), embedding=DeterministicFakeEmbedding(size=16))
+    queue.app = app
+    with app.app_context():
+        job_id = queue.enqueue(str(tmp_path / "missing.pdf"), "missing").job_id
+    queue.executor.shutdown(wait=True)
+    with app.app_context():
+        job = db.session.get(IngestionJob, job_id)
+        assert job.status == 'failed'
+        assert job.error
+
+
+def test_upload_status_not_found(admin_setup_data):
+    token,client=admin_setup_data
+    response = client.get("/upload/status/999999")
+    assert response.status_code == 404
+
+
+def test_ingestion_builds_index_for_project_chunking(app, tmp_path):
+    store = VectorIndexStore(folder=str(tmp_path))
+    queue = IngestionQueue(workers=1, store=store, embedding=DeterministicFakeEmbedding(size=16))
+    queue.app = app
+    content_hash = document_hash(PDF)
+    with app.app_context():
+        db.session.merge(RetrievalSettings(project_id=3, chunk_size=500, chunk_overlap=50))
+        db.session.add(ProjectDocument(project_id=3, filename="spec.pdf", file_path=PDF, content_hash=content_hash))
+        db.session.commit()
+        job_id = queue.enqueue(PDF, content_hash).job_id
+    queue.executor.shutdown(wait=True)
+
+    with app.app_context():
+        job = db.session.get(IngestionJob, job_id)
+        assert job.status == 'completed'
+        # Text and chunk offsets are collected while the chunks stream into the index
+        document = ProjectDocument.query.filter_by(project_id=3, content_hash=content_hash).first()
+        assert document.text == ''.join(page + '\n' for page in iter_pages(PDF, processes=1))
+        assert document.chunk_count == job.chunks == len(document.chunk_metadata)
+        last = document.chunk_metadata[-1]
+        assert document.text[last["start_index"]:last["start_index"] + last["length"]].strip()
+    assert store.has_index(content_hash)
+    assert store.has_index(index_key(content_hash, 500, 50))
+    assert len(store.load(index_key(content_hash, 500, 50), DeterministicFakeEmbedding(size=16)).index_to_docstore_id) > \
+        len(store.load(content_hash, DeterministicFakeEmbedding(size=16)).index_to_docstore_id)
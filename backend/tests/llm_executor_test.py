@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from components.chains import configure_http_pool
+from components.llm_executor import LLMExecutor, LLMBusy, LLMTimeout
+
+
+def test_calls_beyond_concurrency_and_queue_are_refused():
+    executor = LLMExecutor(concurrency=1, queue_depth=1, timeout=5)
+    release = threading.Event()
+
+    def blocked():
+        release.wait()
+        return "done"
+
+    running, waiting = executor.submit(blocked), executor.submit(blocked)
+    with pytest.raises(LLMBusy):
+        executor.submit(blocked)
+    release.set()
+    assert running.result() == waiting.result() == "done"
+    stats = executor.stats()
+    assert stats["rejected"] == 1 and stats["completed"] == 2 and stats["waiting"] == 0
+
+
+def test_slow_call_times_out():
+    executor = LLMExecutor(concurrency=1, queue_depth=1, timeout=0.05)
+    with pytest.raises(LLMTimeout):
+        executor.run(lambda: time.sleep(0.2))
+    # The worker is free again once the call returns
+    assert executor.run(lambda: "ok", timeout=1) == "ok"
+    assert executor.stats()["timeouts"] == 1
+
+
+def test_stream_yields_items_in_order():
+    executor = LLMExecutor(concurrency=1, queue_depth=0)
+    assert list(executor.stream(lambda: iter(["a", "b", "c"]))) == ["a", "b", "c"]
+
+
+def test_stream_times_out_between_items():
+    executor = LLMExecutor(concurrency=1, queue_depth=0, timeout=0.1)
+
+    def tokens():
+        yield "a"
+        time.sleep(0.5)
+        yield "b"
+
+    stream = executor.stream(tokens)
+    assert next(stream) == "a"
+    with pytest.raises(LLMTimeout):
+        next(stream)
+
+
+def test_calls_share_the_pooled_inference_client():
+    import huggingface_hub
+    connections = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            connections.append(self.client_address)
+            self.rfile.read(int(self.headers['Content-Length']))
+            body = json.dumps([{"generated_text": "Answer: pooled"}]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    try:
+        configure_http_pool(size=2)
+        executor = LLMExecutor(concurrency=1, queue_depth=0)
+        url = f"http://127.0.0.1:{server.server_port}/generate"
+        for _ in range(3):
+            # The synchronous client the endpoint uses, called on an executor worker
+            assert executor.run(lambda: huggingface_hub.get_session().post(url, json={"inputs": "Hi"})).status_code == 200
+        # Every call went over the same keep-alive connection
+        assert len(connections) == 3 and len(set(connections)) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
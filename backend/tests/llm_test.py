@@ -1,7 +1,16 @@
 import pytest
 from flask import Flask
-from components.llm import ask_question  
+from components.llm import ask_question, MilestoneBatchQueue
 import io
+import json
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from langchain_core.language_models import FakeStreamingListLLM
+from datetime import datetime
+from components.models import db, ChatHistory, Milestone, MilestoneBatchJob
+from components.statistics import refresh_project_statistics
+from components.answer_cache import AnswerCache
+from components.llm_executor import LLMExecutor
 
 
 def test_ask_question_no_file_or_question(admin_setup_data):
@@ -71,4 +80,199 @@ def test_ask_question_exception(client, mocker):
     }
     response = client.post('/ask', data=data)
     assert response.status_code == 500
-    assert response.json == {'error': 'Mocked exception'}
\ No newline at end of file
+    assert response.json == {'error': 'Mocked exception'}
+
+def stream_events(response):
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+def fake_vector_store():
+    return FAISS.from_texts(["Students build a project tracker."], DeterministicFakeEmbedding(size=16))
+
+def test_ask_question_streams_tokens_and_saves_chat(app, admin_setup_data, monkeypatch):
+    token,client=admin_setup_data
+    monkeypatch.setattr("components.llm.answer_cache", AnswerCache(similarity=0))
+    monkeypatch.setattr("components.llm.latest_document", lambda project_id: type('Document', (), {'content_hash': 'streamed-document'})())
+    monkeypatch.setattr("components.llm.document_vector_store", lambda document, settings=None: (fake_vector_store(), None))
+    monkeypatch.setattr("components.llm.create_llm", lambda **kwargs: FakeStreamingListLLM(responses=["Answer: A tracker"]))
+
+    response = client.post('/ask/2/1?stream=1', json={'question': 'What do students build?'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = stream_events(response)
+    assert ''.join(data['token'] for event, data in events if event == 'token') == "Answer: A tracker"
+    assert events[-1] == ('done', {'response': 'A tracker'})
+    with app.app_context():
+        chat = ChatHistory.query.filter_by(instructor_id=2, project_id=1).order_by(ChatHistory.chat_id.desc()).first()
+        assert (chat.question, chat.answer) == ("What do students build?", "A tracker")
+
+@pytest.fixture
+def clean_milestones(app):
+    with app.app_context():
+        last = db.session.query(db.func.max(Milestone.milestone_id)).scalar() or 0
+    yield
+    with app.app_context():
+        Milestone.query.filter(Milestone.milestone_id > last).delete()
+        refresh_project_statistics(1)
+        db.session.commit()
+
+def test_generate_milestones_streams_and_saves_milestones(app, admin_setup_data, monkeypatch, clean_milestones):
+    token,client=admin_setup_data
+    output = "*** Title: Design\n*** Description: Draw the screens\nEND"
+    monkeypatch.setattr("components.llm.embedding_model", lambda: DeterministicFakeEmbedding(size=16))
+    monkeypatch.setattr("components.llm.create_llm", lambda **kwargs: FakeStreamingListLLM(responses=[output]))
+
+    response = client.post('/milestone/2/1', json={'description': 'A tracker', 'numbermilestones': 1},
+                           headers={'Accept': 'text/event-stream'})
+    events = stream_events(response)
+    assert events[-1] == ('done', {'message': 'Milestones generated successfully', 'milestones': 1, 'incomplete': 0})
+    with app.app_context():
+        assert Milestone.query.filter_by(project_id=1, title="Design", description="Draw the screens").first()
+
+def test_failed_milestone_stream_saves_nothing(app, admin_setup_data, monkeypatch, clean_milestones):
+    token,client=admin_setup_data
+    class FailingLLM:
+        def stream(self, prompt):
+            raise RuntimeError("model failed")
+            yield
+    monkeypatch.setattr("components.llm.embedding_model", lambda: DeterministicFakeEmbedding(size=16))
+    monkeypatch.setattr("components.llm.create_llm", lambda **kwargs: FailingLLM())
+    with app.app_context():
+        before = Milestone.query.filter_by(project_id=1).count()
+
+    response = client.post('/milestone/2/1', json={'description': 'A tracker', 'numbermilestones': 1},
+                           headers={'Accept': 'text/event-stream'})
+    assert stream_events(response) == [('error', {'error': 'model failed'})]
+    with app.app_context():
+        assert Milestone.query.filter_by(project_id=1).count() == before
+
+def test_repeated_question_is_answered_from_cache(app, admin_setup_data, monkeypatch):
+    token,client=admin_setup_data
+    calls = []
+    class Chain:
+        def invoke(self, inputs):
+            calls.append(inputs["query"])
+            return {"result": "Answer: A tracker"}
+    document = type('Document', (), {'content_hash': 'cached-document'})()
+    monkeypatch.setattr("components.llm.answer_cache", AnswerCache(similarity=0))
+    monkeypatch.setattr("components.llm.latest_document", lambda project_id: document)
+    monkeypatch.setattr("components.llm.document_vector_store", lambda document, settings=None: (fake_vector_store(), None))
+    monkeypatch.setattr("components.llm.create_llm_chain", lambda vector_store, settings=None, history="": Chain())
+    monkeypatch.setattr("components.llm.conversation_history", lambda project_id, instructor_id, summarize: "")
+
+    for question in ["What is the summary of the document ?", "what is the summary of the document?"]:
+        response = client.post('/ask/2/1', json={'question': question})
+        assert response.status_code == 200
+        assert response.json == {'response': 'A tracker'}
+    assert len(calls) == 1
+
+def test_follow_ups_are_not_answered_from_another_conversation(app, admin_setup_data, monkeypatch):
+    token,client=admin_setup_data
+    prompts = []
+    class Chain:
+        def __init__(self, history):
+            self.history = history
+        def invoke(self, inputs):
+            prompts.append((self.history, inputs["query"]))
+            return {"result": f"Answer: Expanding on {self.history}"}
+    document = type('Document', (), {'content_hash': 'follow-up-document'})()
+    histories = iter(["Instructor: Which tools?\nAssistant: Flask and Vue", "Instructor: Who grades?\nAssistant: The TA"])
+    monkeypatch.setattr("components.llm.answer_cache", AnswerCache(similarity=0))
+    monkeypatch.setattr("components.llm.latest_document", lambda project_id: document)
+    monkeypatch.setattr("components.llm.document_vector_store", lambda document, settings=None: (fake_vector_store(), None))
+    monkeypatch.setattr("components.llm.conversation_history", lambda project_id, instructor_id, summarize: next(histories))
+    monkeypatch.setattr("components.llm.create_llm_chain", lambda vector_store, settings=None, history="": Chain(history))
+
+    answers = [client.post('/ask/2/1', json={'question': 'Can you expand on the second point?'}).json['response']
+               for _ in range(2)]
+    assert [history for history, question in prompts] == [
+        "Instructor: Which tools?\nAssistant: Flask and Vue", "Instructor: Who grades?\nAssistant: The TA"]
+    assert answers[0] != answers[1]
+
+def test_ask_question_is_refused_when_llm_executor_is_full(admin_setup_data, monkeypatch):
+    token,client=admin_setup_data
+    document = type('Document', (), {'content_hash': 'busy-document'})()
+    monkeypatch.setattr("components.llm.answer_cache", AnswerCache(similarity=0))
+    monkeypatch.setattr("components.llm.llm_executor", LLMExecutor(concurrency=0, queue_depth=0, retry_after=7))
+    monkeypatch.setattr("components.llm.latest_document", lambda project_id: document)
+    monkeypatch.setattr("components.llm.document_vector_store", lambda document, settings=None: (fake_vector_store(), None))
+
+    response = client.post('/ask/2/1', json={'question': 'Who are the users?'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '7'
+
+def test_batch_generates_milestones_per_project(app, admin_setup_data, monkeypatch, clean_milestones):
+    token,client=admin_setup_data
+    headers={'Authentication-Token': token}
+    def completion(description, number):
+        if description == "broken": raise RuntimeError("model failed")
+        return ''.join(f"*** Title: {description} {n}\n*** Description: Step {n}\nEND\n" for n in range(number))
+    monkeypatch.setattr("components.llm.milestone_completion", completion)
+    queue = MilestoneBatchQueue(workers=2)
+    queue.app = app
+    monkeypatch.setattr("components.llm.milestone_batch_queue", queue)
+
+    response = client.post('/milestone/batch', headers=headers, json={'projects': [
+        {'project_id': 1, 'description': 'Batch tracker', 'numbermilestones': 2},
+        {'project_id': 2, 'description': 'broken', 'numbermilestones': 1},
+        {'project_id': 999999, 'description': 'Missing', 'numbermilestones': 1},
+        {'project_id': 2, 'description': '', 'numbermilestones': 1},
+    ]})
+    # The batch is queued, its results are read from the status endpoint
+    assert response.status_code == 202
+    job_id = response.json['batch']['job_id']
+    queue.executor.shutdown(wait=True)
+    status = client.get(f'/milestone/batch/{job_id}', headers=headers).json
+    assert (status['status'], status['projects_total'], status['projects_done']) == ('completed', 4, 4)
+    results = status['results']
+    assert [result['status'] for result in results] == ['created', 'failed', 'invalid', 'invalid']
+    assert results[0]['milestones'] == 2
+    assert results[1]['error'] == 'model failed'
+    with app.app_context():
+        assert Milestone.query.filter(Milestone.project_id == 1, Milestone.title.like('Batch tracker %')).count() == 2
+        db.session.delete(db.session.get(MilestoneBatchJob, job_id))
+        db.session.commit()
+    assert client.get('/milestone/batch/999999', headers=headers).status_code == 404
+
+def test_generate_milestones_command(app, tmp_path, monkeypatch, clean_milestones):
+    monkeypatch.setattr("components.llm.milestone_completion",
+                        lambda description, number: "*** Title: Command\n*** Description: From the CLI\nEND")
+    projects = tmp_path / "projects.json"
+    projects.write_text(json.dumps([{'project_id': 1, 'description': 'CLI tracker', 'numbermilestones': 1}]))
+    result = app.test_cli_runner().invoke(args=['generate-milestones', str(projects)])
+    assert result.exit_code == 0, result.output
+    assert "Project 1: created (1 milestones)" in result.output
+
+def test_chat_history_is_paged_newest_first(app, admin_setup_data):
+    token,client=admin_setup_data
+    with app.app_context():
+        chats = [ChatHistory(project_id=1, instructor_id=2, question=f"Page question {n}", answer=f"Page answer {n}",
+                             message_timestamp=datetime(2030, 1, 1, 12, n)) for n in range(3)]
+        db.session.add_all(chats)
+        db.session.commit()
+        ids = [chat.chat_id for chat in chats]
+    try:
+        first = client.get('/chat/2/1?limit=2').json
+        assert [item['text'] for item in first['response']] == [
+            "Page question 1", "Page answer 1", "Page question 2", "Page answer 2"]
+        second = client.get(f"/chat/2/1?limit=1&before={first['next_before']}").json
+        assert [item['text'] for item in second['response']] == ["Page question 0", "Page answer 0"]
+        assert client.get('/chat/2/1?limit=0').status_code == 400
+        assert client.get('/chat/2/1?before=nonsense').status_code == 400
+    finally:
+        with app.app_context():
+            ChatHistory.query.filter(ChatHistory.chat_id.in_(ids)).delete()
+            db.session.commit()
+
+def test_ask_prompt_includes_the_conversation(monkeypatch):
+    from components.llm import create_llm_chain
+    from components.chains import ChainFactory
+    monkeypatch.setattr("components.llm.chain_factory", ChainFactory("local"))
+    chain = create_llm_chain(fake_vector_store(), history="Instructor: Who grades?\nAssistant: The TA")
+    prompt = chain.combine_documents_chain.llm_chain.prompt.format(context="Tracker", question="When?")
+    assert "Conversation: Instructor: Who grades?\nAssistant: The TA" in prompt
+    assert "Conversation: None" in create_llm_chain(fake_vector_store()).combine_documents_chain.llm_chain.prompt.format(
+        context="Tracker", question="When?")
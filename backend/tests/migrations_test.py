@@ -0,0 +1,28 @@
+import sqlite3
+from flask import Flask
+from components.models import db, ChatHistory
+from components.migrations import migrate_chat_history
+
+
+def test_legacy_chat_history_is_split_into_question_and_answer(tmp_path):
+    database = tmp_path / "legacy.db"
+    connection = sqlite3.connect(database)
+    connection.execute("CREATE TABLE chat_history (chat_id INTEGER PRIMARY KEY, project_id INTEGER NOT NULL, "
+                       "instructor_id INTEGER NOT NULL, message_text TEXT, message_timestamp DATETIME)")
+    connection.executemany("INSERT INTO chat_history VALUES (?, ?, ?, ?, ?)", [
+        (1, 1, 2, "What is due?<END>The report", "2024-12-08 21:02:26.100558"),
+        (2, 1, 2, "No answer yet", None),
+    ])
+    connection.commit()
+    connection.close()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{database}"
+    db.init_app(app)
+    with app.app_context():
+        assert migrate_chat_history() == 2
+        assert migrate_chat_history() is None
+        chats = ChatHistory.query.order_by(ChatHistory.chat_id).all()
+        assert [(chat.question, chat.answer) for chat in chats] == [("What is due?", "The report"), ("No answer yet", "")]
+        assert chats[1].message_timestamp is not None
+        db.engine.dispose()
@@ -0,0 +1,46 @@
+from components.milestone_parser import MilestoneParser, parse_milestones
+
+OUTPUT = '''Sure! Here are the milestones:
+
+*** Title: Requirements
+*** Description: Gather user stories
+and define the scope.
+*** "END"
+**Title:** Design
+**Description:** Draw the screens END
+Milestone 3: Title - Build
+*** Description: Write the code
+*** Title: Missing description
+END
+*** Title: Deploy
+*** Description: Ship it'''
+
+EXPECTED = [
+    ("Requirements", "Gather user stories and define the scope."),
+    ("Design", "Draw the screens"),
+    ("Build", "Write the code"),
+    ("Deploy", "Ship it"),
+]
+
+
+def test_noisy_output_is_parsed_with_partial_results():
+    milestones, incomplete = parse_milestones(OUTPUT)
+    assert milestones == EXPECTED
+    assert incomplete == 1
+
+
+def test_streamed_tokens_complete_milestones_as_they_arrive():
+    parser = MilestoneParser()
+    completed_at = []
+    for position, character in enumerate(OUTPUT):
+        for milestone in parser.feed(character):
+            completed_at.append((position, milestone))
+    completed_at += [(len(OUTPUT), milestone) for milestone in parser.close()]
+    assert [milestone for position, milestone in completed_at] == EXPECTED
+    # The first block is complete as soon as its END line is
+    assert completed_at[0][0] == OUTPUT.index('*** "END"') + len('*** "END"')
+
+
+def test_output_without_milestones():
+    assert parse_milestones("I cannot help with that.") == ([], 0)
+    assert parse_milestones("*** Title: Only a title") == ([], 1)
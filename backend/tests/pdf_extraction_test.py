@@ -0,0 +1,32 @@
+from components.pdf_extraction import iter_pages, iter_chunks, page_count
+
+PDF = "uploads/Milestone-1_User_stories.pdf"
+
+
+def test_parallel_extraction_keeps_page_order():
+    sequential = list(iter_pages(PDF, processes=1))
+    parallel = list(iter_pages(PDF, processes=2, threshold=1, batch_size=3, window=2))
+    assert len(sequential) == page_count(PDF) == 8
+    assert parallel == sequential
+
+
+def test_incremental_chunks_point_into_document_text():
+    pages = list(iter_pages(PDF, processes=1))
+    text = ''.join(page + '\n' for page in pages)
+    documents = list(iter_chunks(iter(pages), chunk_size=300, chunk_overlap=30))
+    assert len(documents) > 1
+    for document in documents:
+        assert len(document.page_content) <= 300
+        start = document.metadata["start_index"]
+        assert text[start:start + len(document.page_content)] == document.page_content
+    # Every word of the document ends up in some chunk
+    chunked = ' '.join(document.page_content for document in documents).split()
+    assert set(text.split()) <= set(chunked)
+
+
+def test_blank_pages_are_skipped():
+    pages = [" " * 700, "\n" * 700, "Only page."]
+    documents = list(iter_chunks(iter(pages), chunk_size=300, chunk_overlap=30))
+    text = ''.join(page + '\n' for page in pages)
+    assert [document.page_content for document in documents] == ["Only page."]
+    assert text[documents[0].metadata["start_index"]:].startswith("Only page.")
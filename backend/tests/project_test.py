@@ -1,6 +1,7 @@
 from datetime import datetime
 import json
-from components.models import Project, db
+from components.models import Project, ProjectStudentAssignment, Milestone, MilestoneSubmission, db
+from components.statistics import project_statistics
 
 project_id = None
 
@@ -103,3 +104,76 @@ def test_delete_project(admin_setup_data):
     # Invalid project ID
     response = client.delete("/projects/999", headers=headers)
     assert response.status_code == 404
+
+
+def naive_project_statistics(project_id):
+    # Reference implementation: walk every student's submissions in Python
+    milestones = {m.milestone_id: m for m in Milestone.query.filter_by(project_id=project_id).all()}
+    students = [a.student_id for a in ProjectStudentAssignment.query.filter_by(project_id=project_id).all()]
+    rates, stats = [], [0, 0, 0]
+    for student in students:
+        submissions = [s for s in MilestoneSubmission.query.filter_by(student_id=student).all() if s.milestone_id in milestones]
+        completed = len({s.milestone_id for s in submissions})
+        rates.append(round(completed / len(milestones), 2) * 100 if milestones else 0)
+        for submission in submissions:
+            milestone = milestones[submission.milestone_id]
+            date = submission.submission_date.date()
+            stats[0 if date <= milestone.end_date else 1] += 1
+            if date < milestone.start_date: stats[2] += 1
+    buckets = [0, 0, 0, 0, 0]
+    for rate in rates:
+        buckets[min(int(rate // 20), 4)] += 1
+    average = sum(rates) / len(rates) if rates else 0
+    return average, buckets, stats
+
+
+def test_project_statistics_matches_naive(app):
+    with app.app_context():
+        for project in Project.query.all():
+            stats = project_statistics(project.project_id)
+            average, buckets, timing = naive_project_statistics(project.project_id)
+            assert stats["buckets"] == buckets
+            assert stats["milestone_submission_stats"] == timing
+            assert abs(stats["average_completion_rate"] - average) < 1e-6
+            assert sum(stats["buckets"]) == stats["total_students"]
+
+
+def test_get_project_statistics_1(admin_setup_data):
+    token,client=admin_setup_data
+    headers={'Authentication-Token': f'{token}'}
+
+    response = client.get("/projects/statistics-1/1", headers=headers)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data["buckets"]) == 5
+    assert len(data["milestone_submission_stats"]) == 3
+
+    response = client.get("/projects/statistics-1/999", headers=headers)
+    assert response.status_code == 404
+
+
+def test_get_projects_pagination(app, admin_setup_data):
+    token,client=admin_setup_data
+    headers={'Authentication-Token': f'{token}'}
+
+    response = client.get("/projects", headers=headers)
+    assert response.status_code == 200
+    all_projects = response.get_json()["projects"]
+    assert response.get_json()["next_after"] is None
+
+    # Walk the pages with the keyset cursor
+    paged, after = [], None
+    while True:
+        url = "/projects?limit=2" + (f"&after={after}" if after is not None else "")
+        data = client.get(url, headers=headers).get_json()
+        paged += data["projects"]
+        after = data["next_after"]
+        if after is None: break
+    assert [p["project_id"] for p in paged] == [p["project_id"] for p in all_projects]
+
+    with app.app_context():
+        for project in all_projects:
+            assert project["students"] == ProjectStudentAssignment.query.filter_by(project_id=project["project_id"]).count()
+
+    response = client.get("/projects?limit=0", headers=headers)
+    assert response.status_code == 400
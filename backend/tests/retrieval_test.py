@@ -0,0 +1,72 @@
+import pytest
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from components.models import db, RetrievalSettings
+from components.retrieval import BM25Index, HybridRetriever, make_retriever, index_key, DEFAULT_RETRIEVAL_SETTINGS
+from components.vector_store import VectorIndexStore
+
+CHUNKS = [
+    "Students submit milestone reports before the deadline.",
+    "Instructors review GitHub commit histories every week.",
+    "Administrators upload bulk enrolment data at the start of the semester.",
+    "The dashboard shows progress for every team.",
+]
+
+
+def test_bm25_ranks_keyword_matches_first():
+    keyword_index = BM25Index.from_dict(BM25Index.build(CHUNKS).to_dict())
+    results = keyword_index.search("bulk enrolment upload", 2)
+    assert results[0][0] == 2
+    assert keyword_index.search("nothing matches", 2) == []
+
+
+def test_saved_index_keeps_keyword_index_for_hybrid_search(tmp_path):
+    embedding = DeterministicFakeEmbedding(size=16)
+    VectorIndexStore(folder=str(tmp_path)).build("doc", [Document(page_content=chunk) for chunk in CHUNKS], embedding)
+    vector_store = VectorIndexStore(folder=str(tmp_path)).load("doc", embedding)
+
+    settings = dict(DEFAULT_RETRIEVAL_SETTINGS, search_type="hybrid", k=1, fetch_k=4, keyword_weight=0.9)
+    retriever = make_retriever(vector_store, settings)
+    assert isinstance(retriever, HybridRetriever)
+    assert [document.page_content for document in retriever.invoke("GitHub commit histories")] == [CHUNKS[1]]
+    mmr = make_retriever(vector_store, dict(settings, search_type="mmr", k=3))
+    assert len(mmr.invoke("progress")) == 3
+
+
+def test_hybrid_search_without_keyword_index_falls_back_to_similarity():
+    vector_store = FAISS.from_texts(CHUNKS, DeterministicFakeEmbedding(size=16))
+    retriever = make_retriever(vector_store, dict(DEFAULT_RETRIEVAL_SETTINGS, search_type="hybrid", k=1))
+    assert not isinstance(retriever, HybridRetriever)
+    assert len(retriever.invoke("GitHub commit histories")) == 1
+
+
+def test_default_chunking_keeps_document_hash_as_index_key():
+    assert index_key("abc", 2000, 100) == "abc"
+    assert index_key("abc", 500, 50) == "abc-500-50"
+
+
+@pytest.fixture
+def restore_settings(app):
+    with app.app_context():
+        row = db.session.get(RetrievalSettings, 1)
+        saved = {column.name: getattr(row, column.name) for column in RetrievalSettings.__table__.columns} if row else None
+    yield
+    with app.app_context():
+        RetrievalSettings.query.filter_by(project_id=1).delete()
+        if saved: db.session.add(RetrievalSettings(**saved))
+        db.session.commit()
+
+
+def test_update_retrieval_settings(admin_setup_data, restore_settings):
+    token,client=admin_setup_data
+    headers={'Authentication-Token': token}
+    response = client.put('/retrieval/settings/1', headers=headers, json={'search_type': 'hybrid', 'k': 4, 'chunk_size': 1000, 'chunk_overlap': 100})
+    assert response.status_code == 200
+    settings = client.get('/retrieval/settings/1', headers=headers).json['settings']
+    assert (settings['search_type'], settings['k'], settings['chunk_size'], settings['chunk_overlap']) == ('hybrid', 4, 1000, 100)
+
+    assert client.put('/retrieval/settings/1', headers=headers, json={'k': 'many'}).status_code == 400
+    assert client.put('/retrieval/settings/1', headers=headers, json={'chunk_overlap': 900}).status_code == 400
+    assert client.put('/retrieval/settings/1', headers=headers, json={'top_p': 1}).status_code == 400
+    assert client.get('/retrieval/settings/999999', headers=headers).status_code == 404
@@ -0,0 +1,56 @@
+from io import BytesIO
+from components.models import db, User, ProjectStudentAssignment, roles_users
+from components.statistics import refresh_project_statistics
+
+
+def upload(client, token, content):
+    return client.post('/students/bulk-upload/2/1', headers={'Authentication-Token': token},
+                       data={'document': (BytesIO(content.encode()), 'students.tsv')}, content_type='multipart/form-data')
+
+
+def test_bulk_upload_reports_every_row(app, admin_setup_data):
+    token,client=admin_setup_data
+    content = "\n".join([
+        "email\tusername\tpassword",
+        "bulk1@example.com\tbulk1\tBulk@12",
+        "bulk2@example.com\tbulk2\tBulk@12",
+        "student1@gmail.com\tStudent1\t",
+        "bulk1@example.com\tbulk1again\tBulk@12",
+        "bulk3@example.com\t\t",
+        "bulk4@example.com\tbulk2\tBulk@12",
+    ])
+    try:
+        response = upload(client, token, content)
+        assert response.status_code == 200, response.get_json()
+        data = response.get_json()
+        assert (data['created'], data['already_assigned'], data['failed']) == (2, 1, 3)
+        statuses = [(result['row'], result['status']) for result in data['results']]
+        assert statuses == [(1, 'created'), (2, 'created'), (3, 'already_assigned'), (4, 'failed'), (5, 'failed'), (6, 'failed')]
+        assert data['results'][2]['updated'] is False
+
+        # New students can log in and are assigned to the project
+        response = client.post('/login_user', json={'email': 'bulk1@example.com', 'password': 'Bulk@12'})
+        assert response.status_code == 200
+        assert response.get_json()['role'] == 'Student'
+        with app.app_context():
+            ids = [user.user_id for user in User.query.filter(User.email.in_(['bulk1@example.com', 'bulk2@example.com']))]
+            assert ProjectStudentAssignment.query.filter(ProjectStudentAssignment.project_id == 1,
+                                                         ProjectStudentAssignment.student_id.in_(ids)).count() == 2
+
+        # Uploading the same file again changes nothing
+        data = upload(client, token, content).get_json()
+        assert (data['created'], data['assigned'], data['already_assigned']) == (0, 0, 3)
+    finally:
+        with app.app_context():
+            ids = [user.user_id for user in User.query.filter(User.email.like('bulk%@example.com'))]
+            ProjectStudentAssignment.query.filter(ProjectStudentAssignment.student_id.in_(ids)).delete()
+            db.session.execute(roles_users.delete().where(roles_users.c.user_id.in_(ids)))
+            User.query.filter(User.user_id.in_(ids)).delete()
+            refresh_project_statistics(1)
+            db.session.commit()
+
+
+def test_bulk_upload_without_emails(admin_setup_data):
+    token,client=admin_setup_data
+    response = upload(client, token, "username\tpassword\nbulk5\tBulk@12")
+    assert response.status_code == 400
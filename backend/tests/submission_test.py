@@ -1,6 +1,7 @@
 import json
 from datetime import datetime
 from components.models import db, MilestoneSubmission
+from components.statistics import project_statistics, materialized_project_statistics, verify_statistics
 
 def test_submit_milestone(admin_setup_data):
     # Test valid submission
@@ -33,4 +34,19 @@ def test_submit_milestone(admin_setup_data):
     response_data = response.get_json()
     assert response_data["message"] == "Missing required fields "
 
-  
\ No newline at end of file
+
+def test_submit_milestone_updates_statistics(app, admin_setup_data):
+    token,client=admin_setup_data
+    headers={'Authentication-Token': f'{token}'}
+    with app.app_context():
+        before = materialized_project_statistics(1)
+    response = client.post(
+        "/submitmilestone",
+        data=json.dumps({"milestone_id": 11, "student_id": 7, "document_url": "http://example.com/document.pdf"}),
+        content_type="application/json",headers=headers)
+    assert response.status_code == 201
+    with app.app_context():
+        after = materialized_project_statistics(1)
+        assert after == project_statistics(1)
+        assert sum(after["milestone_submission_stats"][:2]) == sum(before["milestone_submission_stats"][:2]) + 1
+        assert verify_statistics() == []
@@ -0,0 +1,50 @@
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.documents import Document
+from components.vector_store import VectorIndexStore, document_hash
+
+embedding = DeterministicFakeEmbedding(size=16)
+documents = [Document(page_content=f"Chunk number {i} of the project document") for i in range(20)]
+
+
+def test_document_hash(tmp_path):
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"same content")
+    second.write_bytes(b"same content")
+    assert document_hash(first) == document_hash(second)
+    second.write_bytes(b"other content")
+    assert document_hash(first) != document_hash(second)
+
+
+def test_build_and_reload(tmp_path):
+    store = VectorIndexStore(folder=str(tmp_path))
+    assert store.load("doc", embedding) is None
+    built = store.build("doc", documents, embedding)
+    assert store.has_index("doc")
+
+    # A fresh store (another worker) memory-maps the saved index
+    reloaded = VectorIndexStore(folder=str(tmp_path)).load("doc", embedding)
+    query = documents[3].page_content
+    assert [d.page_content for d in reloaded.similarity_search(query, k=2)] == \
+        [d.page_content for d in built.similarity_search(query, k=2)]
+
+
+def test_get_or_build_only_builds_once(tmp_path):
+    store = VectorIndexStore(folder=str(tmp_path))
+    calls = []
+    def load_documents():
+        calls.append(1)
+        return documents
+    store.get_or_build("doc", load_documents, embedding)
+    store.get_or_build("doc", load_documents, embedding)
+    VectorIndexStore(folder=str(tmp_path)).get_or_build("doc", load_documents, embedding)
+    assert len(calls) == 1
+
+
+def test_lru_memory_budget(tmp_path):
+    store = VectorIndexStore(folder=str(tmp_path), memory_budget=1)
+    for name in ["a", "b", "c"]:
+        store.build(name, documents, embedding)
+    # Only the most recently used index stays resident past the budget
+    assert list(store.resident) == ["c"]
+    store.load("a", embedding)
+    assert list(store.resident) == ["a"]
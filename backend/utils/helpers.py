@@ -1,4 +1,5 @@
 from flask import jsonify
+from sqlalchemy import inspect
 
 def generate_response(data=None, message=None, status=200):
     response = {}
@@ -9,4 +10,12 @@ def generate_response(data=None, message=None, status=200):
     return jsonify(response), status
 
 def handle_error(e):
-    return jsonify({'message': str(e)}), 400
\ No newline at end of file
+    return jsonify({'message': str(e)}), 400
+
+def create_missing_indexes(db):
+    """Create indexes declared on the models that an existing database does not have yet."""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name): continue
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)